@@ -29,6 +29,9 @@ export default function PatientDetailsPage() {
     visits,
     loading: visitsLoading,
     error: visitsError,
+    hasMore: hasMoreVisits,
+    loadingMore: loadingMoreVisits,
+    loadMore: loadMoreVisits,
   } = usePatientVisits(id);
 
   if (loading || !patient) {
@@ -330,6 +333,18 @@ export default function PatientDetailsPage() {
                   </div>
                 </Card>
               ))}
+
+              {hasMoreVisits && (
+                <div className="flex justify-center">
+                  <Button
+                    variant="outline"
+                    onClick={loadMoreVisits}
+                    disabled={loadingMoreVisits}
+                  >
+                    {loadingMoreVisits ? "Loading..." : "Load more visits"}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
@@ -24,7 +24,6 @@ import {
 } from "@/components/ui/select";
 import { usePatientDetails } from "@/hooks/usePatientDetails";
 import { updatePatient } from "@/lib/api/patient";
-import { usePatientVisits } from "@/hooks/usePatientVisits";
 
 export default function EditPatientPage() {
   const router = useRouter();
@@ -32,7 +31,6 @@ export default function EditPatientPage() {
   const id = params.id as string;
 
   const { patient, loading, error } = usePatientDetails(id);
-  const { visits } = usePatientVisits(id);
 
   const [formData, setFormData] = useState({
     first_name: "",
@@ -32,65 +32,26 @@ import {
 import { Button } from "@/components/ui/button";
 import { Filter, MoreHorizontal, Plus, Search } from "lucide-react";
 
-function getLastVisitDate(visits: Visit[] | undefined): string {
-  if (!visits || visits.length === 0) return "Never";
-  const latest = visits.reduce((a, b) =>
-    new Date(b.start_time) > new Date(a.start_time) ? b : a
-  );
-  return new Date(latest.start_time).toLocaleDateString();
-}
-
-function getVisitStatus(visits: Visit[] | undefined): string {
-  if (!visits || visits.length === 0) return "Discharged";
-  const latest = visits.reduce((a, b) =>
-    new Date(b.start_time) > new Date(a.start_time) ? b : a
-  );
-  switch (latest.status) {
-    case "in_progress":
-      return "Active";
-    case "referred":
-      return "Referred";
-    case "completed":
-    case "discharged":
-      return "Discharged";
-    case "scheduled":
-      return "Scheduled";
-    default:
-      return "Unknown";
-  }
-}
-
 // 🔁 Types
-import type { Patient, Visit } from "@/lib/api/patient";
+import type { PatientListItem } from "@/lib/api/patient";
 
 // 🔁 API
 import { getAllPatients } from "@/lib/api/patient";
-import { getPatientVisits } from "@/lib/api/visit";
 
 export default function PatientsPage() {
-  const [patients, setPatients] = useState<Patient[]>([]);
+  const [patients, setPatients] = useState<PatientListItem[]>([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState("");
+  const [next, setNext] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     async function loadPatients() {
       try {
-        const patientList = await getAllPatients(); // GET /api/patients/
-        const updatedPatients = await Promise.all(
-          patientList.map(async (patient) => {
-            const visits = await getPatientVisits(patient.id.toString()); // GET /api/visits/?patient=ID
-            const sorted = visits.sort(
-              (a, b) =>
-                new Date(b.start_time).getTime() -
-                new Date(a.start_time).getTime()
-            );
-            return {
-              ...patient,
-              visits: sorted,
-            };
-          })
-        );
-        setPatients(updatedPatients);
+        // GET /api/patients/ – each row already carries its latest visit
+        const page = await getAllPatients();
+        setPatients(page.results);
+        setNext(page.next);
       } catch (err) {
         console.error("Error loading patients", err);
       } finally {
@@ -101,6 +62,21 @@ export default function PatientsPage() {
     loadPatients();
   }, []);
 
+  // ➕ Append the next page of the registry
+  async function loadMore() {
+    if (!next || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await getAllPatients(next);
+      setPatients((current) => [...current, ...page.results]);
+      setNext(page.next);
+    } catch (err) {
+      console.error("Error loading patients", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   if (loading) {
     return <div>Loading...</div>;
   }
@@ -162,13 +138,8 @@ export default function PatientsPage() {
               </TableHeader>
               <TableBody>
                 {filteredPatients.map((patient) => {
-                  // 📆 Get latest visit
-                  const sortedVisits = [...(patient.visits || [])].sort(
-                    (a, b) =>
-                      new Date(b.start_time).getTime() -
-                      new Date(a.start_time).getTime()
-                  );
-                  const latestVisit = sortedVisits[0];
+                  // 📆 Latest visit (computed server-side)
+                  const latestVisit = patient.last_visit;
 
                   // 🟢 Status mapping logic
                   const getStatusFromLatestVisit = () => {
@@ -277,6 +248,14 @@ export default function PatientsPage() {
               </TableBody>
             </Table>
           </div>
+
+          {next && (
+            <div className="flex justify-center pt-4">
+              <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? "Loading..." : "Load more"}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>
@@ -32,6 +32,9 @@ export default function QueuePage() {
     error,
     stats,
     refetch,
+    hasMore,
+    loadingMore,
+    loadMore,
 
     addToQueue,
     updateQueueStatus,
@@ -256,6 +259,15 @@ export default function QueuePage() {
               />
             </TabsContent>
           </Tabs>
+
+          {/* ➕ Next page of the board */}
+          {hasMore && (
+            <div className="flex justify-center pt-4">
+              <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? "Loading..." : "Load more"}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
 
@@ -5,12 +5,15 @@ export function usePatientVisits(patientId: string) {
   const [visits, setVisits] = useState<Visit[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [next, setNext] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     async function load() {
       try {
-        const data = await getPatientVisits(patientId); // ✅ Directly fetch filtered visits
-        setVisits(data);
+        const page = await getPatientVisits(patientId); // ✅ Directly fetch filtered visits
+        setVisits(page.results);
+        setNext(page.next);
       } catch (err: any) {
         console.error("Error loading visits:", err.message);
         setError(err.message || "Failed to load visits");
@@ -22,5 +25,21 @@ export function usePatientVisits(patientId: string) {
     load();
   }, [patientId]);
 
-  return { visits, loading, error };
+  // ➕ Append the next page of older visits
+  const loadMore = async () => {
+    if (!next || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await getPatientVisits(patientId, next);
+      setVisits((current) => [...current, ...page.results]);
+      setNext(page.next);
+    } catch (err: any) {
+      console.error("Error loading visits:", err.message);
+      setError(err.message || "Failed to load visits");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  return { visits, loading, error, hasMore: next !== null, loadingMore, loadMore };
 }
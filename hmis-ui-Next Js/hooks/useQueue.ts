@@ -10,6 +10,7 @@ import {
   updateQueueEntry,
   deleteQueueEntry,
   getQueueStats,
+  toQueuePatient,
 } from "@/lib/api/queue";
 
 // 🔁 Types
@@ -37,6 +38,9 @@ interface UseQueueReturn {
   error: Error | null;
   stats: QueueStats | null;
   refetch: () => Promise<void>;
+  hasMore: boolean;
+  loadingMore: boolean;
+  loadMore: () => Promise<void>;
 
   addToQueue: (
     visitId: string,
@@ -62,35 +66,29 @@ export function useQueue(
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<Error | null>(null);
   const [stats, setStats] = useState<QueueStats | null>(null);
+  const [next, setNext] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  // Existing fetchData logic unchanged...
+  // 📄 A visit's entries come whole; board lists come a page at a time
+  const fetchBoardPage = (pageUrl?: string | null) =>
+    department
+      ? getQueueByDepartment(department, pageUrl)
+      : getAllQueuePatients(pageUrl);
 
   const fetchData = async () => {
     try {
       setLoading(true);
-      let data: QueuePatient[] = [];
 
       if (visitId) {
         const result = await getQueueForVisit(visitId);
-        data = result.map((entry) => ({
-          id: entry.id,
-          name: `${entry.visit.patient.first_name} ${entry.visit.patient.last_name}`,
-          avatar: "/placeholder.svg",
-          department: entry.department,
-          doctor: entry.assigned_to?.email || "Unassigned",
-          priority: entry.priority,
-          status: entry.status,
-          waitTime: 0,
-          arrivalTime: "",
-        }));
-      } else if (department) {
-        data = await getQueueByDepartment(department);
+        setQueue(result.map(toQueuePatient));
+        setNext(null);
       } else {
-        data = await getAllQueuePatients();
+        const page = await fetchBoardPage();
+        setQueue(page.results);
+        setNext(page.next);
       }
 
-      setQueue(data);
-
       const statsData = await getQueueStats();
 
       const enhancedStats = {
@@ -113,6 +111,21 @@ export function useQueue(
     fetchData();
   }, [department, visitId]);
 
+  // ➕ Append the next page of the board
+  const loadMore = async () => {
+    if (!next || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchBoardPage(next);
+      setQueue((current) => [...current, ...page.results]);
+      setNext(page.next);
+    } catch (err: any) {
+      setError(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // ✅ Update Priority
   const updatePriority = async (
     id: string,
@@ -169,6 +182,9 @@ export function useQueue(
     error,
     stats,
     refetch: fetchData,
+    hasMore: next !== null,
+    loadingMore,
+    loadMore,
 
     addToQueue,
     updateQueueStatus,
@@ -0,0 +1,49 @@
+// lib/api/pagination.ts
+
+// List endpoints are cursor-paginated: { next, previous, results }
+export interface Page<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+/**
+ * 📄 Fetches one page of a list endpoint; pass `page.next` to get the following one
+ */
+export async function fetchPage<T>(
+  url: string,
+  token: string | null,
+  errorMessage: string
+): Promise<Page<T>> {
+  const res = await fetch(url, {
+    headers: {
+      Authorization: `Bearer ${token}`,
+    },
+  });
+
+  if (!res.ok) throw new Error(errorMessage);
+
+  return res.json();
+}
+
+/**
+ * 🔁 Fetches every page of a list endpoint by following `next`.
+ * Only for lists that are small and needed whole (e.g. one visit's queue
+ * entries); screens over whole tables page with `fetchPage` instead.
+ */
+export async function fetchAllPages<T>(
+  url: string,
+  token: string | null,
+  errorMessage: string
+): Promise<T[]> {
+  const items: T[] = [];
+  let nextUrl: string | null = url;
+
+  while (nextUrl) {
+    const page: Page<T> = await fetchPage<T>(nextUrl, token, errorMessage);
+    items.push(...page.results);
+    nextUrl = page.next;
+  }
+
+  return items;
+}
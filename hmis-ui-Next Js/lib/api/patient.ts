@@ -1,5 +1,7 @@
 // lib/api/patient.ts
 const API_URL = process.env.NEXT_PUBLIC_API_URL;
+import { fetchPage } from "./pagination";
+import type { Page } from "./pagination";
 
 export type Patient = {
   id: number;
@@ -26,6 +28,14 @@ export type Patient = {
   visits: VisitSummary[];
 };
 
+// Flat registry row returned by GET /api/patients/ (full history is on the detail)
+export type PatientListItem = Pick<
+  Patient,
+  "id" | "mrn" | "first_name" | "last_name" | "age" | "gender" | "phone" | "email" | "mode_of_payment"
+> & {
+  last_visit: { id: number; start_time: string; status: string } | null;
+};
+
 export type VisitSummary = {
   id: number;
   start_time: string;
@@ -142,27 +152,21 @@ export async function getPatientDetails(id: string): Promise<Patient> {
 }
 
 /**
- * Fetches list of all patients with their visits
+ * Fetches one page of the patient registry (one row per patient, including
+ * the latest visit); pass the previous page's `next` for more
  */
-export async function getAllPatients(): Promise<Patient[]> {
+export async function getAllPatients(
+  pageUrl?: string | null
+): Promise<Page<PatientListItem>> {
   const token = localStorage.getItem("auth_tokens")
     ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
     : null;
 
-  const res = await fetch(`${API_URL}/api/patients/`, {
-    headers: {
-      Authorization: `Bearer ${token}`,
-    },
-  });
-
-  if (!res.ok) throw new Error("Failed to load patients");
-
-  const data = await res.json();
-
-  return data.map((p: any) => ({
-    ...p,
-    visits: p.visits || [], // Ensure visits is always an array
-  }));
+  return fetchPage<PatientListItem>(
+    pageUrl || `${API_URL}/api/patients/`,
+    token,
+    "Failed to load patients"
+  );
 }
 
 /**
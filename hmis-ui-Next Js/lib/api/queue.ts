@@ -1,17 +1,17 @@
 // lib/api/queue.ts
 const API_URL = process.env.NEXT_PUBLIC_API_URL;
+import { fetchAllPages, fetchPage } from "./pagination";
+import type { Page } from "./pagination";
 
 // 🔁 Types
-import type { QueueEntry, QueuePatient, QueueStatus } from "../types/queue";
+import type {
+  QueueBoardEntry,
+  QueueEntry,
+  QueuePatient,
+  QueueStatus,
+} from "../types/queue";
 
 // 💡 Helper functions
-function calculateWaitTime(arrivalTimeString: string): number {
-  const arrivalTime = new Date(arrivalTimeString);
-  const now = new Date();
-  const diffMs = now.getTime() - arrivalTime.getTime();
-  return Math.floor(diffMs / 60000);
-}
-
 function formatArrival(arrivalTimeString: string): string {
   const arrivalTime = new Date(arrivalTimeString);
   return arrivalTime.toLocaleTimeString("en-US", {
@@ -21,85 +21,94 @@ function formatArrival(arrivalTimeString: string): string {
   });
 }
 
-/**
- * 🔁 Get all queue entries
- */
-export async function getAllQueuePatients(): Promise<QueuePatient[]> {
-  const token = localStorage.getItem("auth_tokens")
-    ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
-    : null;
-
-  const res = await fetch(`${API_URL}/api/queue/`, {
-    headers: {
-      Authorization: `Bearer ${token}`,
-    },
-  });
-
-  if (!res.ok) throw new Error("Failed to load queue");
-
-  const data: QueueEntry[] = await res.json();
-
-  return data.map((entry) => ({
+export function toQueuePatient(entry: QueueBoardEntry): QueuePatient {
+  return {
     id: entry.id,
-    name: `${entry.visit.patient.first_name} ${entry.visit.patient.last_name}`,
+    name: entry.patient.full_name,
     avatar: "/placeholder.svg",
     department: entry.department,
     doctor: entry.assigned_to?.email || "Unassigned",
     priority: entry.priority,
     status: entry.status,
-    waitTime: calculateWaitTime(entry.arrival_time),
+    waitTime: entry.wait_minutes,
     arrivalTime: formatArrival(entry.arrival_time),
-  }));
+    expectedStart: entry.predicted_start
+      ? formatArrival(entry.predicted_start)
+      : undefined,
+  };
 }
 
 /**
- * 🔁 Get queue entries filtered by department
+ * 🔁 Get one page of queue entries (pass the previous page's `next` for more)
+ */
+export async function getAllQueuePatients(
+  pageUrl?: string | null
+): Promise<Page<QueuePatient>> {
+  const token = localStorage.getItem("auth_tokens")
+    ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
+    : null;
+
+  const page = await fetchPage<QueueBoardEntry>(
+    pageUrl || `${API_URL}/api/queue/`,
+    token,
+    "Failed to load queue"
+  );
+
+  return { ...page, results: page.results.map(toQueuePatient) };
+}
+
+/**
+ * 🔁 Get one page of queue entries filtered by department
  */
 export async function getQueueByDepartment(
-  department: string
-): Promise<QueuePatient[]> {
+  department: string,
+  pageUrl?: string | null
+): Promise<Page<QueuePatient>> {
   const token = localStorage.getItem("auth_tokens")
     ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
     : null;
 
-  const res = await fetch(`${API_URL}/api/queue?department=${department}`, {
-    headers: {
-      Authorization: `Bearer ${token}`,
-    },
-  });
+  const page = await fetchPage<QueueBoardEntry>(
+    pageUrl || `${API_URL}/api/queue/?department=${encodeURIComponent(department)}`,
+    token,
+    `Failed to load queue for ${department}`
+  );
 
-  if (!res.ok) throw new Error(`Failed to load queue for ${department}`);
+  return { ...page, results: page.results.map(toQueuePatient) };
+}
 
-  const data: QueueEntry[] = await res.json();
+/**
+ * 🔁 Get all queue entries for a specific visit (a short list, fetched whole)
+ */
+export async function getQueueForVisit(
+  visitId: string
+): Promise<QueueBoardEntry[]> {
+  const token = localStorage.getItem("auth_tokens")
+    ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
+    : null;
 
-  return data.map((entry) => ({
-    id: entry.id,
-    name: `${entry.visit.patient.first_name} ${entry.visit.patient.last_name}`,
-    avatar: "/placeholder.svg",
-    department: entry.department,
-    doctor: entry.assigned_to?.email || "Unassigned",
-    priority: entry.priority,
-    status: entry.status,
-    waitTime: calculateWaitTime(entry.arrival_time),
-    arrivalTime: formatArrival(entry.arrival_time),
-  }));
+  return fetchAllPages<QueueBoardEntry>(
+    `${API_URL}/api/visits/${visitId}/queue/`,
+    token,
+    "Failed to load visit queue"
+  );
 }
 
 /**
- * 🔁 Get all queue entries for a specific visit
+ * 🔍 Full queue entry (embedded visit detail) for an opened card
  */
-export async function getQueueForVisit(visitId: string): Promise<QueueEntry[]> {
+export async function getQueueEntry(id: string): Promise<QueueEntry> {
   const token = localStorage.getItem("auth_tokens")
     ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
     : null;
 
-  const res = await fetch(`${API_URL}/api/visits/${visitId}/queue`, {
+  const res = await fetch(`${API_URL}/api/queue/${id}/`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
   });
 
-  if (!res.ok) throw new Error("Failed to load visit queue");
+  if (!res.ok) throw new Error("Failed to load queue entry");
 
   return await res.json();
 }
@@ -198,3 +207,55 @@ export async function getQueueStats() {
 
   return await res.json();
 }
+
+/**
+ * 📣 Call the next patient of a department (claims it for the current user)
+ * Returns null when nobody is waiting.
+ */
+export async function callNextPatient(
+  department: string
+): Promise<QueueEntry | null> {
+  const token = localStorage.getItem("auth_tokens")
+    ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
+    : null;
+
+  const res = await fetch(`${API_URL}/api/queue/call-next/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${token}`,
+    },
+    body: JSON.stringify({ department }),
+  });
+
+  if (res.status === 404) return null;
+  if (!res.ok) throw new Error(`Failed to call next patient for ${department}`);
+
+  return await res.json();
+}
+
+/**
+ * 🔀 Transfer a patient to the next department
+ * Without a department the backend routing rules pick it.
+ */
+export async function transferQueueEntry(
+  id: string,
+  options: { department?: string; priority?: string; notes?: string } = {}
+): Promise<{ ok: boolean; entry?: QueueBoardEntry; detail?: string }> {
+  const token = localStorage.getItem("auth_tokens")
+    ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
+    : null;
+
+  const res = await fetch(`${API_URL}/api/queue/${id}/transfer/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${token}`,
+    },
+    body: JSON.stringify(options),
+  });
+
+  const result = await res.json().catch(() => ({ detail: "Unknown error" }));
+  if (!res.ok) return { ok: false, detail: result.detail };
+  return { ok: true, entry: result.entry };
+}
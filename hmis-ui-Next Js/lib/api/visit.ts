@@ -1,5 +1,7 @@
 // lib/api/visit.ts
 const API_URL = process.env.NEXT_PUBLIC_API_URL;
+import { fetchPage } from "./pagination";
+import type { Page } from "./pagination";
 
 //patient type
 
@@ -133,29 +135,31 @@ export type Note = {
 };
 
 /**
- * Fetches visits for a specific patient
+ * Fetches one page of a patient's visits (pass the previous page's `next` for more)
  */
-export async function getPatientVisits(patientId: string): Promise<Visit[]> {
+export async function getPatientVisits(
+  patientId: string,
+  pageUrl?: string | null
+): Promise<Page<Visit>> {
   const token = localStorage.getItem("auth_tokens")
     ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
     : null;
 
-  const res = await fetch(`${API_URL}/api/visits/?patient=${patientId}`, {
-    headers: {
-      Authorization: `Bearer ${token}`,
-    },
-  });
-
-  if (!res.ok) throw new Error("Failed to load patient visits");
-
-  const data = await res.json();
+  const page = await fetchPage<Visit>(
+    pageUrl || `${API_URL}/api/visits/?patient=${patientId}`,
+    token,
+    "Failed to load patient visits"
+  );
 
   // 🔁 Ensure we're handling both cases: patient as object or ID
-  return data.map((visit: Visit) => ({
-    ...visit,
-    patient:
-      typeof visit.patient === "object" ? visit.patient.id : visit.patient,
-  }));
+  return {
+    ...page,
+    results: page.results.map((visit: Visit) => ({
+      ...visit,
+      patient:
+        typeof visit.patient === "object" ? visit.patient.id : visit.patient,
+    })),
+  };
 }
 /**
  * Fetches single visit by ID
@@ -256,18 +260,19 @@ export async function deleteVisit(id: string): Promise<boolean> {
   return res.ok;
 }
 
-export async function getAllVisits(): Promise<Visit[]> {
+/**
+ * Fetches one page of visits (pass the previous page's `next` for more)
+ */
+export async function getAllVisits(
+  pageUrl?: string | null
+): Promise<Page<Visit>> {
   const token = localStorage.getItem("auth_tokens")
     ? JSON.parse(localStorage.getItem("auth_tokens") as string).access
     : null;
 
-  const res = await fetch(`${API_URL}/api/visits/`, {
-    headers: {
-      Authorization: `Bearer ${token}`,
-    },
-  });
-
-  if (!res.ok) throw new Error("Failed to load visits");
-
-  return await res.json();
+  return fetchPage<Visit>(
+    pageUrl || `${API_URL}/api/visits/`,
+    token,
+    "Failed to load visits"
+  );
 }
@@ -16,6 +16,41 @@ export type QueuePatient = {
   status: QueueStatus;
   waitTime: number; // minutes
   arrivalTime: string; // e.g., "09:15 AM"
+  expectedStart?: string; // e.g., "09:40 AM", while waiting
+};
+
+// 🗂 Compact card returned by GET /api/queue/ (full detail: GET /api/queue/:id/)
+export type QueueBoardEntry = {
+  id: number;
+  visit: number;
+  visit_number: string;
+  visit_type: string;
+  department: string;
+  priority: "Normal" | "Urgent" | "Emergency";
+  status: QueueStatus;
+  arrival_time: string; // ISO datetime
+  start_time: string | null;
+  wait_minutes: number;
+  predicted_start: string | null; // ISO datetime, Waiting entries only
+  assigned_to: {
+    id: number;
+    email: string;
+    role: string;
+  } | null;
+  patient: {
+    id: number;
+    mrn: string;
+    full_name: string;
+    first_name: string;
+    last_name: string;
+    date_of_birth: string; // ISO date string
+    gender: string;
+    blood_group: string | null;
+    phone: string | null;
+    age: number;
+    allergies: { allergen: string; severity: string }[];
+    chronic_conditions: string[];
+  };
 };
 
 export type QueueEntry = {
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve with an ASGI server (e.g. ``uvicorn core.asgi:application``) for the
+streaming endpoints: /api/queue/events/ (live queue board, ``queues.streams``).
 """
 
 import os
@@ -0,0 +1,90 @@
+# core/etag.py
+"""
+Conditional GET for aggregate resources.
+
+Each aggregate (a visit, a patient) carries a ``version`` counter that is
+bumped by signals on every write to it or its children. ``retrieve`` first
+reads just that counter; when it matches the client's ``If-None-Match`` the
+view answers 304 without touching child tables or running serializers.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(resource, pk, version, request):
+    """Weak ETag from the aggregate version plus the query string (?fields= etc.)."""
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.items()))
+    digest = hashlib.md5(query.encode()).hexdigest()[:8]
+    version = '.'.join(str(v) for v in version) if isinstance(version, (tuple, list)) else version
+    return f'W/"{resource}-{pk}-{version}-{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    if header.strip() == '*':
+        return True
+    # weak comparison: ignore W/ prefixes
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()}
+    return etag.removeprefix('W/') in candidates
+
+
+class VersionedModelMixin:
+    """
+    Model mixin for aggregates with a ``version`` column. The version only
+    moves through ``touch()`` (an ``F() + 1`` update); a plain ``save()`` never
+    writes it, so a stale instance can't put an old version back and make a
+    changed resource match a client's ETag again.
+    """
+    version_field = 'version'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name != self.version_field]
+        super().save(*args, **kwargs)
+
+
+class ConditionalRetrieveMixin:
+    """
+    ViewSet mixin. ``get_resource_version(pk)`` returns the version (or tuple
+    of versions) of the object the view would retrieve, or None if it is not
+    visible; by default it reads ``version_field`` through ``get_queryset()``.
+    Set ``etag_resource`` to a short name.
+    """
+    etag_resource = None
+    version_field = 'version'
+
+    def get_resource_version(self, pk):
+        return (
+            self.get_queryset().prefetch_related(None).order_by()
+            .filter(pk=pk).values_list(self.version_field, flat=True).first()
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(pk)
+        except ValidationError:
+            raise Http404  # "abc" is no id; a 404 as before, not a 500 from the lookup
+        version = self.get_resource_version(pk)
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)  # 404 as usual
+
+        etag = make_etag(self.etag_resource or self.basename, pk, version, request)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = self.build_retrieve_response(request, *args, **kwargs)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def build_retrieve_response(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
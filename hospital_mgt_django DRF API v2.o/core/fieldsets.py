@@ -0,0 +1,114 @@
+# core/fieldsets.py
+"""
+Sparse fieldsets for read endpoints.
+
+    ?fields=id,status,patient            -> patient rendered as its id only
+    ?fields=id,status&expand=patient     -> patient rendered in full
+    ?fields=id,patient.first_name        -> patient pruned to first_name
+
+Without ``?fields=`` the serializer is left untouched (``?expand=`` is then a
+no-op, everything is already expanded). Pruning happens on the bound serializer,
+so the query planner in ``core.prefetch`` only joins/prefetches what is left.
+Names the serializer doesn't have are a 400, so a typo never reads as empty data.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_fieldset(value):
+    """``"id,patient.first_name"`` -> ``{'id': {}, 'patient': {'first_name': {}}}``"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if not part:
+                break
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _child(serializer):
+    return serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+
+
+def _collapse(field):
+    """Replace a nested serializer with primary keys of the same relation."""
+    many = isinstance(field, serializers.ListSerializer)
+    kwargs = {'read_only': True, 'many': many}
+    if field.source != field.field_name:
+        kwargs['source'] = field.source
+    return serializers.PrimaryKeyRelatedField(**kwargs)
+
+
+def unknown_fields(serializer, tree, prefix=''):
+    """Dotted paths in ``tree`` that ``serializer`` can't render (``['patient.nope']``)."""
+    target = _child(serializer)
+    unknown = []
+    for name, sub_tree in tree.items():
+        field = target.fields.get(name)
+        if field is None:
+            unknown.append(f'{prefix}{name}')
+        elif sub_tree and isinstance(field, serializers.BaseSerializer):
+            unknown += unknown_fields(field, sub_tree, f'{prefix}{name}.')
+        elif sub_tree:
+            # a plain value has no sub-fields
+            unknown += [f'{prefix}{name}.{sub}' for sub in sub_tree]
+    return unknown
+
+
+def prune_serializer(serializer, fields, expand=None):
+    """Drop every field not named in ``fields``; collapse unexpanded relations to ids."""
+    expand = expand or {}
+    target = _child(serializer)
+    keep = set(fields) | set(expand)
+
+    for name in list(target.fields):
+        if name not in keep:
+            target.fields.pop(name)
+
+    for name in keep:
+        field = target.fields.get(name)
+        if not isinstance(field, serializers.BaseSerializer):
+            continue
+        sub_fields = fields.get(name)
+        sub_expand = expand.get(name, {})
+        if sub_fields:
+            prune_serializer(field, sub_fields, sub_expand)
+        elif name in expand:
+            if sub_expand:
+                # expand=patient.allergies keeps patient's scalars and expands allergies
+                scalars = {n: {} for n, f in _child(field).fields.items()
+                           if not isinstance(f, serializers.BaseSerializer)}
+                prune_serializer(field, scalars, sub_expand)
+        elif _child(field).source == '*' or field.source == '*':
+            continue  # rendered from this same object: no relation to collapse to ids
+        else:
+            target.fields[name] = _collapse(field)
+    return serializer
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin honouring ``?fields=`` / ``?expand=`` on safe (read) requests.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return serializer
+
+        fields = parse_fieldset(request.query_params.get(self.fields_query_param))
+        if fields:
+            expand = parse_fieldset(request.query_params.get(self.expand_query_param))
+            errors = {
+                param: f"Unknown field(s): {', '.join(unknown)}."
+                for param, tree in ((self.fields_query_param, fields), (self.expand_query_param, expand))
+                if (unknown := unknown_fields(serializer, tree))
+            }
+            if errors:
+                raise ValidationError(errors)
+            prune_serializer(serializer, fields, expand)
+        return serializer
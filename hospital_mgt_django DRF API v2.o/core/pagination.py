@@ -0,0 +1,199 @@
+# core/pagination.py
+"""
+Keyset (cursor) pagination used for every list endpoint.
+
+Pages are addressed by an opaque cursor holding the ordering-key values of the
+last row served, so fetching page N is an index seek (``WHERE (key, id) < (...)``)
+rather than an ``OFFSET`` scan and costs the same as page 1.
+
+The ordering keys come from, in order of preference:
+    1. the queryset's explicit ``order_by`` (``get_queryset`` / ``OrderingFilter``)
+    2. ``view.keyset_ordering``
+    3. the model's ``Meta.ordering``
+    4. the primary key
+The primary key is always appended as a tie-breaker, so keys such as
+``start_time`` / ``arrival_time`` / ``ordered_at`` need not be unique, but they
+must be non-null local fields; any other ordering is rejected with a 400
+rather than silently paged by primary key.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError as APIValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(payload):
+    """Dump ``payload`` (JSON-able plus datetimes/decimals) to an opaque url-safe token."""
+    def default(value):
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()  # full precision, unlike DjangoJSONEncoder
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        raise TypeError(f'{type(value).__name__} is not cursor-serializable')
+
+    raw = json.dumps(payload, default=default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of ``encode_cursor``; raises ``NotFound`` for tampered tokens."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+        raise NotFound('Invalid cursor.')
+    if not isinstance(payload, dict):
+        raise NotFound('Invalid cursor.')
+    return payload
+
+
+def keyset_filter(ordering, values):
+    """
+    Build the lexicographic "after this row" predicate for ``ordering``
+    (e.g. ``['-start_time', '-id']``) and the matching row ``values``.
+    """
+    condition = Q()
+    for index, key in enumerate(ordering):
+        name = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    return condition
+
+
+def _reverse(ordering):
+    return [key[1:] if key.startswith('-') else f'-{key}' for key in ordering]
+
+
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset, view):
+        model = queryset.model
+        pk_name = model._meta.pk.name
+        candidates = (
+            list(queryset.query.order_by)
+            or list(getattr(view, 'keyset_ordering', ()))
+            or list(model._meta.ordering)
+        )
+
+        ordering, self.fields = [], {}
+        for key in candidates:
+            name = key.lstrip('-') if isinstance(key, str) else None
+            if name == 'pk':
+                name = pk_name
+            try:
+                field = model._meta.get_field(name) if name and '__' not in name else None
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete or field.null:
+                # expressions, related lookups and nullable keys can't be seeked on
+                raise APIValidationError({
+                    'ordering': [f'Cannot page by "{key}"; order by a non-null field of {model._meta.model_name}.'],
+                })
+            ordering.append(f'-{field.name}' if key.startswith('-') else field.name)
+            self.fields[field.name] = field
+
+        if pk_name not in self.fields:
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append(f'-{pk_name}' if descending else pk_name)
+            self.fields[pk_name] = model._meta.pk
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset, view)
+        page_size = self.get_page_size(request)
+
+        token = request.query_params.get(self.cursor_query_param)
+        cursor = decode_cursor(token) if token else {}
+        position = cursor.get('p')
+        self.reverse = bool(cursor.get('r'))
+
+        ordering = _reverse(self.ordering) if self.reverse else self.ordering
+        if position is not None:
+            values = self._parse_position(position)
+            queryset = queryset.filter(keyset_filter(ordering, values))
+
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.page = rows
+        # Walking forward there is a previous page iff we arrived via a cursor;
+        # walking backward the mirror holds.
+        self.has_next = has_more if not self.reverse else position is not None
+        self.has_previous = position is not None if not self.reverse else has_more
+        return rows
+
+    def _parse_position(self, position):
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Invalid cursor.')
+        try:
+            return [
+                self.fields[key.lstrip('-')].to_python(value)
+                for key, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+
+    def _position(self, row):
+        return [getattr(row, self.fields[key.lstrip('-')].attname) for key in self.ordering]
+
+    def _link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        token = encode_cursor({'p': self._position(row), 'r': int(reverse)})
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
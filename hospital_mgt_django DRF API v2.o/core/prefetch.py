@@ -0,0 +1,145 @@
+# core/prefetch.py
+"""
+Serializer-driven query planner.
+
+Walks a serializer's (already bound) fields and works out which relations the
+response is going to touch, then turns that into a ``select_related`` /
+``Prefetch`` chain so a nested payload is served in a constant number of
+queries regardless of how many children each row has.
+
+    queryset = plan_queryset(Visit.objects.all(), VisitDetailSerializer())
+
+* nested serializers on a forward FK / one-to-one  -> ``select_related``
+* ``many=True`` serializers on a reverse FK / M2M  -> ``Prefetch`` with its own
+  planned queryset (so grandchildren are batched too)
+* non-pk related fields (``StringRelatedField`` ...)  -> ``select_related``, plus
+  whatever the related model lists in ``str_select_related`` for its ``__str__``
+* dotted sources (``source='visit.patient.mrn'``) -> the relations along the path,
+  joined if every hop is single-valued, prefetched otherwise
+* ``SerializerMethodField`` and other ``source='*'`` fields can't be inspected;
+  a serializer declares what they read in ``Meta.plan_select_related`` /
+  ``Meta.plan_prefetch_related`` (lookups relative to its model)
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField
+
+
+def _relation_path(model, source):
+    """
+    The relation fields along a (possibly dotted) ``source``, stopping at the
+    first hop that is not a relation: ``'visit.patient.mrn'`` -> [visit, patient].
+    """
+    path = []
+    if not source or source == '*':
+        return path
+    for part in source.split('.'):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation:
+            break
+        path.append(field)
+        model = field.related_model
+    return path
+
+
+def _is_single(field):
+    # forward FK / one-to-one and reverse one-to-one can all be joined
+    return field.many_to_one or field.one_to_one
+
+
+def _walk(serializer, model, prefix, select, prefetch):
+    meta = getattr(serializer, 'Meta', None)
+    select.extend(f'{prefix}{lookup}' for lookup in getattr(meta, 'plan_select_related', ()))
+    prefetch.extend(f'{prefix}{lookup}' for lookup in getattr(meta, 'plan_prefetch_related', ()))
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        parts = field.source.split('.')
+        path = _relation_path(model, field.source)
+        if not path:
+            continue
+        lookup = prefix + '__'.join(parts[:len(path)])
+        relation = path[-1]
+        single = all(_is_single(hop) for hop in path)
+
+        if len(path) < len(parts):
+            # a plain attribute read across relations ('visit.visit_number')
+            (select if single else prefetch).append(lookup)
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+            if isinstance(child, serializers.ModelSerializer):
+                related_model = relation.related_model
+                queryset = plan_queryset(related_model._default_manager.all(), child)
+                prefetch.append(Prefetch(lookup, queryset=queryset))
+            else:
+                prefetch.append(lookup)
+
+        elif isinstance(field, serializers.ModelSerializer):
+            if single:
+                select.append(lookup)
+                _walk(field, relation.related_model, f'{lookup}__', select, prefetch)
+            else:
+                prefetch.append(Prefetch(lookup, queryset=plan_queryset(
+                    relation.related_model._default_manager.all(), field
+                )))
+
+        elif isinstance(field, ManyRelatedField):
+            prefetch.append(lookup)
+
+        elif isinstance(field, RelatedField) and not isinstance(field, PrimaryKeyRelatedField):
+            # StringRelatedField / SlugRelatedField etc. read the related row
+            if single:
+                select.append(lookup)
+                for dependency in getattr(relation.related_model, 'str_select_related', ()):
+                    select.append(f'{lookup}__{dependency}')
+
+        elif len(path) > 1 and all(_is_single(hop) for hop in path[:-1]):
+            # dotted PrimaryKeyRelatedField: the id is a column of the row before the last hop
+            select.append(prefix + '__'.join(parts[:len(path) - 1]))
+
+
+def get_query_plan(serializer):
+    """
+    Return ``(select_related, prefetch_related)`` lookups for a serializer
+    instance (or class). The serializer's ``Meta.model`` is the root model.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    select, prefetch = [], []
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is not None:
+        _walk(serializer, model, '', select, prefetch)
+    # a plain lookup next to a Prefetch of the same path would be rejected by Django
+    planned = {p.prefetch_to for p in prefetch if isinstance(p, Prefetch)}
+    prefetch = [p for p in prefetch if isinstance(p, Prefetch) or p not in planned]
+    return list(dict.fromkeys(select)), list(dict.fromkeys(prefetch))
+
+
+def plan_queryset(queryset, serializer):
+    """Apply the query plan for ``serializer`` to ``queryset``."""
+    select, prefetch = get_query_plan(serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class QueryPlanMixin:
+    """
+    ViewSet mixin: ``self.plan_queryset(qs)`` optimizes ``qs`` for whatever
+    serializer the current action is going to render with.
+    """
+
+    def plan_queryset(self, queryset):
+        return plan_queryset(queryset, self.get_serializer())
@@ -54,6 +54,8 @@ INSTALLED_APPS = [
     'pharmacy',
     'diagnoses',
     'queues.apps.QueuesConfig',
+    'identifiers',
+    'fhir',
 ]
 
 MIDDLEWARE = [
@@ -94,6 +96,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # concurrent writers wait for the lock instead of failing with "database is locked"
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        # file-backed test DB so threaded tests get real locking (not shared-cache table locks)
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -149,7 +159,10 @@ CORS_ALLOW_ALL_ORIGINS = True
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # Keyset pagination on every list endpoint (?cursor=<opaque>&page_size=<n>)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 # JWT Settings
@@ -184,6 +197,13 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
+# Live queue board events (queues.events, queues.streams)
+# GET /api/queue/events/ streams queue changes as server-sent events. Off by
+# default: it needs the ASGI server (core.asgi) and, with the default in-memory
+# broker, a single worker process. Set QUEUE_EVENTS = True in such a deployment.
+QUEUE_EVENTS = False
+QUEUE_EVENTS_QUERY_TOKEN = False  # also accept ?access_token= (EventSource); see queues.streams
+
 # core/settings.py (enable debug logging)
 # LOGGING = {
 #     'version': 1,
@@ -32,7 +32,9 @@ from visits.views import (
     ProcedureViewSet,
     ReferralViewSet,
     FollowUpViewSet,
-    NoteViewSet
+    NoteViewSet,
+    VitalSignsBulkView,
+    VitalSignsTrendView,
 )
 from queues.views import QueViewSet
 
@@ -82,6 +84,8 @@ urlpatterns = [
     path('api/', include(patient_router.urls)),
     path('api/', include(medication_router.urls)),
     path('api/', include(visit_router.urls)),
+    path('api/vitals/bulk/', VitalSignsBulkView.as_view(), name='vitals-bulk'),
+    path('api/vitals/trend/', VitalSignsTrendView.as_view(), name='vitals-trend'),
     
     # 🧪 Laboratory Module     
     path('', include('laboratory.urls')),  # Includes /api/lab/* routes
@@ -89,5 +93,8 @@ urlpatterns = [
     
     path('api/', include('queues.urls')), 
 
+    # 🔥 FHIR Bulk Data export
+    path('', include('fhir.urls')),
+
 
 ]
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ExportJob
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'requested_by', 'since', 'transaction_time', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('output', 'progress', 'error')
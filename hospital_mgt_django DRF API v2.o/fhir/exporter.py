@@ -0,0 +1,115 @@
+# fhir/exporter.py
+"""
+Runs ``$export`` jobs: one NDJSON file per resource type under
+``FHIR_EXPORT_DIR/<job id>/``.
+
+Every table is streamed with ``.iterator(chunk_size=...)`` — a server-side
+cursor on PostgreSQL — and written line by line, so memory use does not grow
+with the registry. Jobs run on a background thread started after the
+kick-off request commits; ``run_fhir_exports`` picks up jobs left behind by a
+restart.
+"""
+import json
+import logging
+import shutil
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ExportJob
+from .resources import RESOURCE_TYPES
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+# how often (in rows) a running job checks whether it was cancelled
+CANCEL_CHECK_EVERY = 10000
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_dir(job_id=None):
+    base = Path(getattr(settings, 'FHIR_EXPORT_DIR', Path(settings.BASE_DIR) / 'exports'))
+    return base / str(job_id) if job_id else base
+
+
+def _write_type(job, resource_type, path):
+    queryset, since_filter, to_resource = RESOURCE_TYPES[resource_type]
+    rows = queryset()
+    if job.since:
+        rows = rows.filter(since_filter(job.since))
+    count = 0
+    with open(path, 'w', encoding='utf-8') as handle:
+        for obj in rows.order_by('pk').iterator(chunk_size=CHUNK_SIZE):
+            handle.write(json.dumps(to_resource(obj), separators=(',', ':')))
+            handle.write('\n')
+            count += 1
+            if count % CANCEL_CHECK_EVERY == 0:
+                if ExportJob.objects.filter(pk=job.pk, status='cancelled').exists():
+                    raise ExportCancelled
+                ExportJob.objects.filter(pk=job.pk).update(progress=f'{resource_type}: {count}')
+    return count
+
+
+def run_export(job_id):
+    """Run one accepted job to completion (in the calling thread)."""
+    claimed = ExportJob.objects.filter(pk=job_id, status='accepted').update(
+        status='in_progress', transaction_time=timezone.now()
+    )
+    if not claimed:
+        return  # already running elsewhere, finished or cancelled
+    job = ExportJob.objects.get(pk=job_id)
+    directory = export_dir(job.pk)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    output = []
+    try:
+        for resource_type in job.resource_types:
+            filename = f'{resource_type}.ndjson'
+            count = _write_type(job, resource_type, directory / filename)
+            output.append({'type': resource_type, 'file': filename, 'count': count})
+            ExportJob.objects.filter(pk=job.pk).update(output=output, progress=f'{resource_type}: done')
+    except ExportCancelled:
+        shutil.rmtree(directory, ignore_errors=True)
+        return
+    except Exception as exc:
+        # a cancel that removed the directory mid-write surfaces here too; it stays cancelled
+        failed = ExportJob.objects.filter(pk=job.pk, status='in_progress').update(
+            status='failed', error=str(exc), finished_at=timezone.now()
+        )
+        if failed:
+            logger.exception("FHIR export %s failed", job.pk)
+        shutil.rmtree(directory, ignore_errors=True)  # never leave partial files behind
+        return
+    ExportJob.objects.filter(pk=job.pk, status='in_progress').update(
+        status='completed', output=output, progress='', finished_at=timezone.now()
+    )
+
+
+def _run_in_thread(job_id):
+    try:
+        run_export(job_id)
+    finally:
+        connection.close()
+
+
+def start_export(job):
+    """Run ``job`` on a background thread once the current transaction commits."""
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True, name=f'fhir-export-{job.pk}').start()
+    )
+
+
+def delete_export(job):
+    """Cancel a running job, or forget a finished one together with its files."""
+    running = ExportJob.objects.filter(pk=job.pk, status__in=['accepted', 'in_progress']).update(
+        status='cancelled', finished_at=timezone.now()
+    )
+    if not running:
+        ExportJob.objects.filter(pk=job.pk).delete()
+    shutil.rmtree(export_dir(job.pk), ignore_errors=True)
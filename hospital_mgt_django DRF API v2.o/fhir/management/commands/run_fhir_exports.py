@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from fhir.exporter import run_export
+from fhir.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = 'Runs FHIR $export jobs that are still waiting (e.g. after a server restart)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', help='Run only this job id')
+        parser.add_argument(
+            '--restart-stale', action='store_true',
+            help='Also re-run jobs left in progress by a process that died',
+        )
+
+    def handle(self, *args, **options):
+        jobs = ExportJob.objects.all()
+        if options['job']:
+            jobs = jobs.filter(pk=options['job'])
+        if options['restart_stale']:
+            jobs.filter(status='in_progress').update(status='accepted', output=[], progress='')
+        pending = list(jobs.filter(status='accepted').order_by('created_at').values_list('pk', flat=True))
+        self.stdout.write(f"ℹ️ {len(pending)} export jobs to run.")
+        for job_id in pending:
+            run_export(job_id)
+            job = ExportJob.objects.get(pk=job_id)
+            self.stdout.write(f"… {job_id}: {job.status} {job.error}".rstrip())
+        self.stdout.write(self.style.SUCCESS("✔ Done."))
@@ -0,0 +1,38 @@
+import uuid
+
+from django.db import models
+from django.utils import timezone
+from users.models import User
+
+
+class ExportJob(models.Model):
+    """One FHIR Bulk Data ``$export`` request and its NDJSON output files."""
+    STATUS_CHOICES = (
+        ('accepted', 'Accepted'),
+        ('in_progress', 'In Progress'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    )
+
+    # the status URL is handed out to the client, so it shouldn't be guessable
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='fhir_exports')
+    request_url = models.TextField()
+    resource_types = models.JSONField(default=list)
+    since = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='accepted')
+    # when the export started; clients pass it as the next incremental _since
+    transaction_time = models.DateTimeField(default=timezone.now)
+    # [{"type": "Patient", "file": "Patient.ndjson", "count": 123}]
+    output = models.JSONField(default=list)
+    progress = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"$export {self.id} ({self.status})"
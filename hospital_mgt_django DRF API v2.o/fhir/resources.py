@@ -0,0 +1,232 @@
+# fhir/resources.py
+"""
+FHIR R4 representations of the clinical tables, one mapper per resource type.
+
+``RESOURCE_TYPES`` maps the FHIR type to ``(queryset, since, to_resource)``:
+the base queryset (with the joins the mapper reads; ``subject_id`` is the
+patient id of visit-level rows), a function building the
+``_since`` filter, and the row -> resource dict function. ``_since`` reads
+each table's ``updated_at`` (``auto_now``), so edits are exported as well as
+new rows; visit-level rows also follow their visit's ``updated_at``, since
+their subject is the visit's patient (re-pointed by a patient merge).
+"""
+from django.db.models import F, Q
+
+from patients.models import Patient
+from visits.models import Visit, VitalSigns, Diagnosis, Prescription, LabTestOrder
+
+MRN_SYSTEM = 'urn:hms:mrn'
+VISIT_NUMBER_SYSTEM = 'urn:hms:visit-number'
+ACCESSION_SYSTEM = 'urn:hms:accession-number'
+ICD10_SYSTEM = 'http://hl7.org/fhir/sid/icd-10'
+LOINC_SYSTEM = 'http://loinc.org'
+UCUM_SYSTEM = 'http://unitsofmeasure.org'
+
+GENDERS = {'M': 'male', 'F': 'female', 'O': 'other'}
+
+ENCOUNTER_STATUS = {
+    'scheduled': 'planned',
+    'in_progress': 'in-progress',
+    'admitted': 'in-progress',
+    'completed': 'finished',
+    'referred': 'finished',
+    'discharged': 'finished',
+    'cancelled': 'cancelled',
+}
+# visit type -> v3 ActCode
+ENCOUNTER_CLASS = {'IPD': ('IMP', 'inpatient encounter'), 'ER': ('EMER', 'emergency')}
+AMBULATORY = ('AMB', 'ambulatory')
+
+SERVICE_REQUEST_STATUS = {
+    'pending': 'active',
+    'in_progress': 'active',
+    'completed': 'completed',
+    'cancelled': 'revoked',
+}
+
+# vital sign column -> (LOINC code, display, UCUM unit)
+VITAL_COMPONENTS = {
+    'systolic_bp': ('8480-6', 'Systolic blood pressure', 'mm[Hg]'),
+    'diastolic_bp': ('8462-4', 'Diastolic blood pressure', 'mm[Hg]'),
+    'heart_rate': ('8867-4', 'Heart rate', '/min'),
+    'respiratory_rate': ('9279-1', 'Respiratory rate', '/min'),
+    'oxygen_saturation': ('2708-6', 'Oxygen saturation in Arterial blood', '%'),
+    'temperature': ('8310-5', 'Body temperature', 'Cel'),
+    'weight': ('29463-7', 'Body weight', 'kg'),
+    'height': ('8302-2', 'Body height', 'cm'),
+    'bmi': ('39156-5', 'Body mass index (BMI) [Ratio]', 'kg/m2'),
+}
+
+
+def _instant(value):
+    return value.isoformat() if value else None
+
+
+def _ref(resource_type, pk):
+    return {'reference': f'{resource_type}/{pk}'}
+
+
+def _compact(resource):
+    # FHIR forbids empty values: drop None, '' and empty lists/dicts
+    return {k: v for k, v in resource.items() if v not in (None, '', [], {})}
+
+
+# -----------------------------
+# MAPPERS
+# -----------------------------
+
+def patient_resource(p):
+    telecom = []
+    if p.phone:
+        telecom.append({'system': 'phone', 'value': p.phone})
+    if p.email:
+        telecom.append({'system': 'email', 'value': p.email})
+    contact = []
+    if p.emergency_contact_name or p.emergency_contact_phone:
+        contact.append(_compact({
+            'name': {'text': p.emergency_contact_name} if p.emergency_contact_name else None,
+            'telecom': [{'system': 'phone', 'value': p.emergency_contact_phone}] if p.emergency_contact_phone else None,
+        }))
+    return _compact({
+        'resourceType': 'Patient',
+        'id': str(p.pk),
+        'meta': {'lastUpdated': _instant(p.updated_at)},
+        'identifier': [{'system': MRN_SYSTEM, 'value': p.mrn}],
+        'name': [{'family': p.last_name, 'given': [p.first_name]}],
+        'gender': GENDERS.get(p.gender, 'unknown'),
+        'birthDate': p.date_of_birth.isoformat(),
+        'telecom': telecom,
+        'address': [{'text': p.address}] if p.address else None,
+        'contact': contact,
+    })
+
+
+def encounter_resource(v):
+    code, display = ENCOUNTER_CLASS.get(v.visit_type, AMBULATORY)
+    return _compact({
+        'resourceType': 'Encounter',
+        'id': str(v.pk),
+        'identifier': [{'system': VISIT_NUMBER_SYSTEM, 'value': v.visit_number}],
+        'status': ENCOUNTER_STATUS.get(v.status, 'unknown'),
+        'class': {'system': 'http://terminology.hl7.org/CodeSystem/v3-ActCode', 'code': code, 'display': display},
+        'type': [{'text': v.get_visit_type_display()}],
+        'subject': _ref('Patient', v.patient_id),
+        'period': _compact({'start': _instant(v.start_time), 'end': _instant(v.end_time)}),
+        'reasonCode': [{'text': v.reason_for_visit}] if v.reason_for_visit else None,
+    })
+
+
+def observation_resource(r):
+    components = []
+    for field, (code, display, unit) in VITAL_COMPONENTS.items():
+        value = getattr(r, field)
+        if value is not None:
+            components.append({
+                'code': {'coding': [{'system': LOINC_SYSTEM, 'code': code, 'display': display}]},
+                'valueQuantity': {'value': float(value), 'unit': unit, 'system': UCUM_SYSTEM, 'code': unit},
+            })
+    return _compact({
+        'resourceType': 'Observation',
+        'id': str(r.pk),
+        'status': 'final',
+        'category': [{'coding': [{
+            'system': 'http://terminology.hl7.org/CodeSystem/observation-category',
+            'code': 'vital-signs',
+        }]}],
+        'code': {'coding': [{'system': LOINC_SYSTEM, 'code': '85353-1', 'display': 'Vital signs panel'}]},
+        'subject': _ref('Patient', r.subject_id),
+        'encounter': _ref('Encounter', r.visit_id),
+        'effectiveDateTime': _instant(r.recorded_at),
+        'component': components,
+    })
+
+
+def condition_resource(d):
+    coding = [{'system': ICD10_SYSTEM, 'code': d.code}] if d.code else None
+    return _compact({
+        'resourceType': 'Condition',
+        'id': str(d.pk),
+        'category': [{'coding': [{
+            'system': 'http://terminology.hl7.org/CodeSystem/condition-category',
+            'code': 'encounter-diagnosis',
+        }]}],
+        'code': _compact({'coding': coding, 'text': d.condition}),
+        'subject': _ref('Patient', d.subject_id),
+        'encounter': _ref('Encounter', d.visit_id),
+        'recordedDate': _instant(d.diagnosed_at),
+        'note': [{'text': d.notes}] if d.notes else None,
+    })
+
+
+def medication_request_resource(p):
+    drug = p.drug
+    return _compact({
+        'resourceType': 'MedicationRequest',
+        'id': str(p.pk),
+        'status': 'completed' if p.is_dispensed else 'active',
+        'intent': 'order',
+        'medicationCodeableConcept': {
+            'text': f'{drug.name} {drug.strength} {drug.form}' if drug else 'Unknown medication',
+        },
+        'subject': _ref('Patient', p.subject_id),
+        'encounter': _ref('Encounter', p.visit_id),
+        'authoredOn': _instant(p.prescribed_at),
+        'reasonReference': [_ref('Condition', p.diagnosis_id)] if p.diagnosis_id else None,
+        'dosageInstruction': [_compact({
+            'text': f'{p.dosage} {p.frequency} for {p.duration_days} days',
+            'patientInstruction': p.instructions,
+        })],
+        'dispenseRequest': {'quantity': {'value': p.quantity}},
+    })
+
+
+def service_request_resource(o):
+    return _compact({
+        'resourceType': 'ServiceRequest',
+        'id': str(o.pk),
+        'identifier': [{'system': ACCESSION_SYSTEM, 'value': o.accession_number}],
+        'status': SERVICE_REQUEST_STATUS.get(o.status, 'unknown'),
+        'intent': 'order',
+        'priority': o.priority,
+        'category': [{'coding': [{'system': 'http://snomed.info/sct', 'code': '108252007', 'display': 'Laboratory procedure'}]}],
+        'code': {'text': o.test_type.name} if o.test_type else None,
+        'subject': _ref('Patient', o.patient_id),
+        'encounter': _ref('Encounter', o.visit_id),
+        'authoredOn': _instant(o.ordered_at),
+        'note': [{'text': o.notes}] if o.notes else None,
+    })
+
+
+# type -> (queryset, _since filter, mapper); order is the default export order
+RESOURCE_TYPES = {
+    'Patient': (
+        lambda: Patient.objects.all(),
+        lambda since: Q(updated_at__gte=since),
+        patient_resource,
+    ),
+    'Encounter': (
+        lambda: Visit.objects.all(),
+        lambda since: Q(updated_at__gte=since),
+        encounter_resource,
+    ),
+    'Observation': (
+        lambda: VitalSigns.objects.annotate(subject_id=F('visit__patient_id')),
+        lambda since: Q(updated_at__gte=since) | Q(visit__updated_at__gte=since),
+        observation_resource,
+    ),
+    'Condition': (
+        lambda: Diagnosis.objects.annotate(subject_id=F('visit__patient_id')),
+        lambda since: Q(updated_at__gte=since) | Q(visit__updated_at__gte=since),
+        condition_resource,
+    ),
+    'MedicationRequest': (
+        lambda: Prescription.objects.select_related('drug').annotate(subject_id=F('visit__patient_id')),
+        lambda since: Q(updated_at__gte=since) | Q(visit__updated_at__gte=since),
+        medication_request_resource,
+    ),
+    'ServiceRequest': (
+        lambda: LabTestOrder.objects.select_related('test_type'),
+        lambda since: Q(updated_at__gte=since),
+        service_request_resource,
+    ),
+}
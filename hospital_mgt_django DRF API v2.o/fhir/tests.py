@@ -0,0 +1,106 @@
+import datetime
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from patients.models import Patient
+from users.models import User
+from visits.models import Diagnosis, Visit, VitalSigns
+from .exporter import delete_export, export_dir, run_export
+from .models import ExportJob
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        settings_override = override_settings(FHIR_EXPORT_DIR=self.export_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_user('fhir.admin@example.com', 'pw', role='Hospital Admin')
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Export', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=self.patient, start_time=timezone.now() - datetime.timedelta(days=3))
+
+    def export(self, resource_types, since=None):
+        job = ExportJob.objects.create(requested_by=self.admin, request_url='/api/fhir/$export',
+                                       resource_types=resource_types, since=since)
+        run_export(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def read(self, job, resource_type):
+        with open(export_dir(job.pk) / f'{resource_type}.ndjson', encoding='utf-8') as handle:
+            return [json.loads(line) for line in handle]
+
+
+class IncrementalExportTests(ExportTestCase):
+    def test_visit_edit_is_exported_since(self):
+        since = timezone.now()
+        self.assertEqual(self.read(self.export(['Encounter'], since), 'Encounter'), [])
+
+        self.visit.status = 'completed'
+        self.visit.save()
+
+        job = self.export(['Encounter'], since)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual([r['status'] for r in self.read(job, 'Encounter')], ['finished'])
+
+    def test_corrections_are_exported_since(self):
+        three_days_ago = timezone.now() - datetime.timedelta(days=3)
+        vitals = VitalSigns.objects.create(visit=self.visit, heart_rate=70, recorded_at=three_days_ago)
+        diagnosis = Diagnosis.objects.create(visit=self.visit, condition='Malaria', diagnosed_at=three_days_ago)
+        since = timezone.now()
+
+        vitals.heart_rate = 72
+        vitals.save()
+        diagnosis.condition = 'Typhoid'
+        diagnosis.save()
+
+        job = self.export(['Encounter', 'Observation', 'Condition'], since)
+        self.assertEqual(self.read(job, 'Encounter'), [])  # the visit itself didn't change
+        self.assertTrue(self.read(job, 'Observation'))
+        self.assertEqual([r['code']['text'] for r in self.read(job, 'Condition')], ['Typhoid'])
+
+    def test_unchanged_rows_are_not_exported_since(self):
+        Diagnosis.objects.create(visit=self.visit, condition='Malaria')
+        since = timezone.now()
+        job = self.export(['Condition'], since)
+        self.assertEqual(self.read(job, 'Condition'), [])
+
+
+class ExportKickoffTests(ExportTestCase):
+    def test_invalid_since_is_operation_outcome(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for since in ('yesterday', '2024-13-45T00:00:00Z', '2024-02-30T00:00:00Z'):
+            with self.subTest(since=since):
+                response = client.get('/api/fhir/$export', {'_since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['resourceType'], 'OperationOutcome')
+        self.assertFalse(ExportJob.objects.exists())
+
+
+class ExportFailureTests(ExportTestCase):
+    def test_failure_removes_partial_files(self):
+        with mock.patch('fhir.exporter._write_type', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('fhir.exporter', 'ERROR'):
+            job = self.export(['Patient'])
+        self.assertEqual((job.status, job.error), ('failed', 'disk full'))
+        self.assertFalse(export_dir(job.pk).exists())
+
+    def test_cancel_mid_write_stays_cancelled(self):
+        def cancel_then_fail(job, resource_type, path):
+            delete_export(job)  # removes the directory under the running writer
+            open(path, 'w').close()
+
+        with mock.patch('fhir.exporter._write_type', side_effect=cancel_then_fail):
+            job = self.export(['Patient'])
+        self.assertEqual(job.status, 'cancelled')
+        self.assertEqual(job.error, '')
+        self.assertFalse(export_dir(job.pk).exists())
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import ExportKickoffView, ExportStatusView, ExportFileView
+
+urlpatterns = [
+    path('api/fhir/$export', ExportKickoffView.as_view(), name='fhir-export'),
+    path('api/fhir/export-status/<uuid:job_id>/', ExportStatusView.as_view(), name='fhir-export-status'),
+    path('api/fhir/export-files/<uuid:job_id>/<str:filename>', ExportFileView.as_view(), name='fhir-export-file'),
+]
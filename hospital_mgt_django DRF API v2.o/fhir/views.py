@@ -0,0 +1,126 @@
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+
+from users.permissions import IsHospitalAdmin, IsSuperUser
+from .exporter import delete_export, export_dir, start_export
+from .models import ExportJob
+from .resources import RESOURCE_TYPES
+
+NDJSON_FORMATS = ('application/fhir+ndjson', 'application/ndjson', 'ndjson')
+
+
+def operation_outcome(message, http_status=status.HTTP_400_BAD_REQUEST):
+    return Response(
+        {
+            'resourceType': 'OperationOutcome',
+            'issue': [{'severity': 'error', 'code': 'invalid', 'diagnostics': message}],
+        },
+        status=http_status,
+    )
+
+
+class ExportPermissionMixin:
+    # whole-registry extracts: hospital admins (and superusers) only
+    permission_classes = [permissions.IsAuthenticated, IsHospitalAdmin | IsSuperUser]
+
+    def get_job(self, job_id):
+        job = get_object_or_404(ExportJob, pk=job_id)
+        if job.requested_by_id != self.request.user.pk and not self.request.user.is_superuser:
+            self.permission_denied(self.request)
+        return job
+
+
+# 🔹 Kick-off: GET|POST /api/fhir/$export?_type=Patient,Encounter&_since=<instant>
+class ExportKickoffView(ExportPermissionMixin, APIView):
+    def get(self, request):
+        params = request.query_params
+        output_format = params.get('_outputFormat')
+        if output_format and output_format not in NDJSON_FORMATS:
+            return operation_outcome(f"Unsupported _outputFormat '{output_format}'.")
+
+        types = [t.strip() for t in params.get('_type', '').split(',') if t.strip()] or list(RESOURCE_TYPES)
+        unknown = [t for t in types if t not in RESOURCE_TYPES]
+        if unknown:
+            return operation_outcome(
+                f"Unsupported _type {', '.join(unknown)}; supported: {', '.join(RESOURCE_TYPES)}."
+            )
+
+        since = None
+        if params.get('_since'):
+            try:
+                since = parse_datetime(params['_since'])
+            except ValueError:  # well formed but out of range, e.g. month 13
+                since = None
+            if since is None:
+                return operation_outcome("_since must be a FHIR instant, e.g. 2025-01-01T00:00:00Z.")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        job = ExportJob.objects.create(
+            requested_by=request.user,
+            request_url=request.build_absolute_uri(),
+            resource_types=types,
+            since=since,
+        )
+        start_export(job)
+        status_url = reverse('fhir-export-status', kwargs={'job_id': job.pk}, request=request)
+        return Response(status=status.HTTP_202_ACCEPTED, headers={'Content-Location': status_url})
+
+    def post(self, request):
+        return self.get(request)
+
+
+# 🔹 Status: GET (poll) / DELETE (cancel) /api/fhir/export-status/<job id>/
+class ExportStatusView(ExportPermissionMixin, APIView):
+    def get(self, request, job_id):
+        job = self.get_job(job_id)
+        if job.status in ('accepted', 'in_progress'):
+            done = len(job.output)
+            progress = job.progress or f'{done}/{len(job.resource_types)} resource types'
+            return Response(
+                status=status.HTTP_202_ACCEPTED,
+                headers={'X-Progress': progress, 'Retry-After': '5'},
+            )
+        if job.status == 'failed':
+            return operation_outcome(job.error or "Export failed.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if job.status == 'cancelled':
+            return operation_outcome("Export was cancelled.", status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'transactionTime': job.transaction_time.isoformat(),
+            'request': job.request_url,
+            'requiresAccessToken': True,
+            'output': [
+                {
+                    'type': item['type'],
+                    'url': reverse(
+                        'fhir-export-file', kwargs={'job_id': job.pk, 'filename': item['file']}, request=request
+                    ),
+                    'count': item['count'],
+                }
+                for item in job.output
+            ],
+            'error': [],
+        })
+
+    def delete(self, request, job_id):
+        delete_export(self.get_job(job_id))
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
+# 🔹 Download: GET /api/fhir/export-files/<job id>/<Type>.ndjson
+class ExportFileView(ExportPermissionMixin, APIView):
+    def get(self, request, job_id, filename):
+        job = self.get_job(job_id)
+        if job.status != 'completed' or filename not in {item['file'] for item in job.output}:
+            return operation_outcome("No such export file.", status.HTTP_404_NOT_FOUND)
+        path = export_dir(job.pk) / filename
+        if not path.exists():
+            return operation_outcome("Export files were deleted.", status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(path, 'rb'), content_type='application/fhir+ndjson')
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import IdentifierSequence
+
+
+@admin.register(IdentifierSequence)
+class IdentifierSequenceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'next_value')
+    readonly_fields = ('name', 'next_value')
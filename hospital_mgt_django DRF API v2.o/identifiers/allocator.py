@@ -0,0 +1,181 @@
+# identifiers/allocator.py
+"""
+Block-based identifier allocation (MRNs, visit numbers, accession numbers).
+
+Each process reserves a block of numbers with a single
+``UPDATE ... SET next_value = next_value + block`` against its sequence row.
+The database serializes those updates, so no two processes ever share a
+number. The process then hands numbers out of the block from memory under a
+lock, so most allocations cost no query at all.
+
+Inside a caller's transaction the reservation must not wait for that
+transaction to end:
+    * with row locks (PostgreSQL, MySQL) the block is reserved on a private
+      per-thread connection and committed at once, so the sequence row is
+      never held until the caller commits and other callers don't queue up
+      behind a long transaction
+    * SQLite locks the whole database, so the caller's transaction already
+      serializes writers (and a second connection would wait on it); there
+      only the numbers asked for are taken, on the caller's connection, and
+      they go back to the sequence if it rolls back
+
+Trade-offs:
+    * numbers are unique and increasing per process, not gap-free: a restart
+      forgets the rest of its block, and numbers used by a transaction that
+      rolls back are skipped (except on SQLite, see above)
+    * a forked worker never inherits its parent's block (checked by pid)
+
+    register_sequence('visit', prefix='VIS', width=7)
+    next_identifier('visit')          # 'VIS0000001'
+    next_identifiers('visit', 500)    # one reservation for a bulk import
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.models import F
+
+from .models import IdentifierSequence
+
+DEFAULT_BLOCK_SIZE = getattr(settings, 'IDENTIFIER_BLOCK_SIZE', 50)
+
+
+@dataclass
+class Sequence:
+    name: str
+    prefix: str
+    width: int
+    block_size: int = DEFAULT_BLOCK_SIZE
+    # first value when the sequence row is created (e.g. above existing data)
+    seed: Optional[Callable[[], int]] = None
+
+    def format(self, number):
+        return f'{self.prefix}{number:0{self.width}d}'
+
+
+_sequences = {}
+_blocks = {}  # name -> [next, end, pid]
+_lock = threading.Lock()
+_local = threading.local()  # the thread's private connection for detached reservations
+
+
+def register_sequence(name, prefix, width, block_size=None, seed=None):
+    _sequences[name] = Sequence(name, prefix, width, block_size or DEFAULT_BLOCK_SIZE, seed)
+    return _sequences[name]
+
+
+def get_sequence(name):
+    try:
+        return _sequences[name]
+    except KeyError:
+        raise LookupError(f"Unknown identifier sequence '{name}'.")
+
+
+def _reserve(sequence, count):
+    """Atomically take ``count`` numbers from the sequence row; returns the first."""
+    for _ in range(2):
+        with transaction.atomic():
+            updated = IdentifierSequence.objects.filter(name=sequence.name).update(
+                next_value=F('next_value') + count
+            )
+            if updated:
+                # the UPDATE holds the row (PostgreSQL) / database (SQLite) lock until commit
+                end = IdentifierSequence.objects.values_list('next_value', flat=True).get(name=sequence.name)
+                return end - count
+        try:
+            with transaction.atomic():
+                start = sequence.seed() if sequence.seed else 1
+                IdentifierSequence.objects.create(name=sequence.name, next_value=start)
+        except IntegrityError:
+            pass  # another process created it first; retry the update
+    raise RuntimeError(f"Could not reserve identifiers from '{sequence.name}'.")
+
+
+def _private_connection():
+    own = getattr(_local, 'connection', None)
+    if own is None:
+        own = _local.connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    own.close_if_unusable_or_obsolete()
+    return own
+
+
+def _reserve_detached(sequence, count):
+    """
+    ``_reserve`` in a transaction of its own on the thread's private
+    connection, committed before returning: the reservation neither waits for
+    nor rolls back with the caller's transaction.
+    """
+    own = _private_connection()
+    quote = own.ops.quote_name
+    table, name, next_value = quote(IdentifierSequence._meta.db_table), quote('name'), quote('next_value')
+    for _ in range(2):
+        own.set_autocommit(False)
+        try:
+            with own.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET {next_value} = {next_value} + %s WHERE {name} = %s',
+                    [count, sequence.name],
+                )
+                if cursor.rowcount:
+                    cursor.execute(f'SELECT {next_value} FROM {table} WHERE {name} = %s', [sequence.name])
+                    end = cursor.fetchone()[0]
+                    own.commit()
+                    return end - count
+                start = sequence.seed() if sequence.seed else 1
+                cursor.execute(f'INSERT INTO {table} ({name}, {next_value}) VALUES (%s, %s)', [sequence.name, start])
+            own.commit()
+        except IntegrityError:
+            own.rollback()  # another process created it first; retry the update
+        except BaseException:
+            own.rollback()
+            raise
+        finally:
+            own.set_autocommit(True)
+    raise RuntimeError(f"Could not reserve identifiers from '{sequence.name}'.")
+
+
+def allocate_numbers(name, count=1):
+    """Return ``count`` unique, increasing numbers from sequence ``name``."""
+    sequence = get_sequence(name)
+    with _lock:
+        numbers = []
+        block = _blocks.get(name)
+        if block and block[2] == os.getpid():
+            take = min(count, block[1] - block[0])
+            numbers = list(range(block[0], block[0] + take))
+            block[0] += take
+        missing = count - len(numbers)
+        if not missing:
+            return numbers
+
+        size = max(missing, sequence.block_size)
+        if not connection.in_atomic_block:
+            start = _reserve(sequence, size)
+        elif connection.features.has_select_for_update:
+            start = _reserve_detached(sequence, size)
+        else:
+            # SQLite: the reservation rolls back with the caller, so cache nothing
+            size = missing
+            start = _reserve(sequence, size)
+        numbers.extend(range(start, start + missing))
+        if size > missing:
+            _blocks[name] = [start + missing, start + size, os.getpid()]
+        return numbers
+
+
+def next_identifiers(name, count):
+    sequence = get_sequence(name)
+    return [sequence.format(number) for number in allocate_numbers(name, count)]
+
+
+def next_identifier(name):
+    return next_identifiers(name, 1)[0]
+
+
+def reset_cache():
+    """Forget reserved blocks (tests, or after changing a sequence by hand)."""
+    with _lock:
+        _blocks.clear()
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class IdentifierSequence(models.Model):
+    """
+    One row per identifier series (MRN, visit number, accession number).
+    ``next_value`` is the first number not yet handed to any process; workers
+    reserve blocks by bumping it (see identifiers/allocator.py).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} → {self.next_value}"
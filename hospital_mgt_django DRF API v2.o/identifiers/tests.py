@@ -0,0 +1,121 @@
+import threading
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase, skipIfDBFeature
+from rest_framework.test import APIClient
+
+from patients.models import Patient
+from users.models import User
+from .allocator import _reserve_detached, allocate_numbers, register_sequence, reset_cache
+from .models import IdentifierSequence
+
+
+def run_in_threads(count, target):
+    """Start ``count`` threads on ``target(index)`` together; return their results."""
+    barrier = threading.Barrier(count)
+    results, errors = [None] * count, []
+
+    def worker(index):
+        try:
+            barrier.wait()
+            results[index] = target(index)
+        except Exception as exc:  # surfaced by the assertion below
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class IdentifierAllocatorConcurrencyTests(TransactionTestCase):
+    threads = 8
+    per_thread = 15
+
+    def setUp(self):
+        reset_cache()
+        self.doctor = User.objects.create_user('stress.doctor@example.com', 'pw', role='Doctor')
+
+    def tearDown(self):
+        reset_cache()
+
+    def test_parallel_patient_creates_get_unique_mrns(self):
+        def register_patients(index):
+            client = APIClient()
+            client.force_authenticate(self.doctor)
+            mrns = []
+            for n in range(self.per_thread):
+                response = client.post('/api/patients/', {
+                    'first_name': f'Stress{index}',
+                    'last_name': f'Patient{n}',
+                    'date_of_birth': '1990-01-01',
+                    'gender': 'F',
+                }, format='json')
+                self.assertEqual(response.status_code, 201, response.content)
+                mrns.append(response.json()['mrn'])
+            return mrns
+
+        mrns = [mrn for batch in run_in_threads(self.threads, register_patients) for mrn in batch]
+
+        total = self.threads * self.per_thread
+        self.assertEqual(len(mrns), total)
+        self.assertEqual(len(set(mrns)), total)
+        self.assertEqual(Patient.objects.values('mrn').distinct().count(), total)
+
+    def test_blocks_never_overlap_between_workers(self):
+        # clearing the cache forces every round to reserve a fresh block,
+        # as separate worker processes would
+        register_sequence('stress', prefix='S', width=6, block_size=5)
+
+        def allocate(index):
+            numbers = []
+            for _ in range(20):
+                numbers.extend(allocate_numbers('stress', 3))
+                reset_cache()
+            return numbers
+
+        numbers = [n for batch in run_in_threads(self.threads, allocate) for n in batch]
+        self.assertEqual(len(numbers), len(set(numbers)))
+
+    @skipIfDBFeature('has_select_for_update')
+    def test_rolled_back_reservation_is_not_kept(self):
+        register_sequence('rollback', prefix='R', width=4, block_size=10)
+        try:
+            with transaction.atomic():
+                first = allocate_numbers('rollback')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        # the reservation was undone, so the same numbers are handed out again
+        # and the remainder of the rolled-back block was never cached
+        self.assertEqual(allocate_numbers('rollback'), first)
+        self.assertEqual(IdentifierSequence.objects.get(name='rollback').next_value, first[0] + 10)
+
+    @skipIfDBFeature('has_select_for_update')
+    def test_allocations_inside_a_transaction_reserve_no_block(self):
+        register_sequence('bundle', prefix='B', width=4, block_size=50)
+        with transaction.atomic():
+            numbers = [n for _ in range(3) for n in allocate_numbers('bundle')]
+
+        self.assertEqual(numbers, [1, 2, 3])
+        self.assertEqual(IdentifierSequence.objects.get(name='bundle').next_value, 4)
+
+    def test_detached_reservation_survives_caller_rollback(self):
+        sequence = register_sequence('detached', prefix='D', width=4, block_size=10)
+        try:
+            with transaction.atomic():
+                start = _reserve_detached(sequence, sequence.block_size)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertEqual(start, 1)
+        self.assertEqual(IdentifierSequence.objects.get(name='detached').next_value, 11)
+        self.assertEqual(_reserve_detached(sequence, 5), 11)
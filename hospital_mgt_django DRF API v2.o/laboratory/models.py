@@ -18,6 +18,9 @@ class LabTestType(models.Model):
     description = models.TextField(blank=True, null=True)
     category = models.ForeignKey(LabTestCategory, on_delete=models.SET_NULL, null=True, blank=True)
 
+    # __str__ reads the category; lets the query planner join it up front
+    str_select_related = ('category',)
+
     def __str__(self):
         return f"{self.category or 'Uncategorized'}: {self.name}"
 
@@ -88,7 +88,7 @@ class LabTestOrderSerializer(serializers.ModelSerializer):
     requested_by = UserSerializer(read_only=True)
     requested_by_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
-        source='ordered_by',
+        source='requested_by',
         required=True
     )
 
@@ -96,6 +96,7 @@ class LabTestOrderSerializer(serializers.ModelSerializer):
         model = LabTestOrder
         fields = [
             'id',
+            'accession_number',
             'patient',
             'patient_id',
             'test_type',
@@ -119,10 +120,11 @@ class LabTestOrderWriteSerializer(serializers.ModelSerializer):
         model = LabTestOrder
         fields = [
             'id',
+            'accession_number',
             'patient',
             'test_type',
             'visit',
-            'ordered_by',
+            'requested_by',
             'priority',
             'status',
             'estimated_completion_time',
@@ -132,7 +134,7 @@ class LabTestOrderWriteSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'patient': {'required': True},
             'test_type': {'required': True},
-            'ordered_by': {'required': True}
+            'requested_by': {'required': True}
         }
 
     def validate(self, data):
@@ -177,7 +179,7 @@ class LabResultAttachmentWriteSerializer(serializers.ModelSerializer):
 class LabTestOrderDetailSerializer(serializers.ModelSerializer):
     patient = PatientSerializer(read_only=True)
     test_type = LabTestTypeSerializer(read_only=True)
-    requested_by = UserSerializer(source='ordered_by', read_only=True)
+    requested_by = UserSerializer(read_only=True)
     attachments = LabResultAttachmentSerializer(many=True, read_only=True)
 
     class Meta:
@@ -1,3 +1,117 @@
+import base64
+import datetime
+import json
+from urllib.parse import parse_qs, urlparse
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.pagination import KeysetPagination
+from patients.models import Patient
+from users.models import User
+from visits.models import LabTestOrder, Visit
+from .models import LabTestCategory, LabTestType
+
+
+def cursor_token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class LabOrderPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('paging.lab@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_orders(self, **params):
+        return self.client.get('/api/lab/orders/', params)
+
+    def test_malformed_cursors_are_404(self):
+        for payload in ([1], 'p', {'p': [{}, 1]}, {'p': ['not a date', 1]}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.list_orders(cursor=cursor_token(payload)).status_code, 404)
+
+    def test_nullable_ordering_is_rejected(self):
+        request = Request(APIRequestFactory().get('/api/lab/orders/'))
+        queryset = LabTestOrder.objects.order_by('estimated_completion_time')
+        with self.assertRaises(ValidationError):
+            KeysetPagination().paginate_queryset(queryset, request)
+
+    def test_related_ordering_is_rejected(self):
+        request = Request(APIRequestFactory().get('/api/lab/orders/'))
+        queryset = LabTestOrder.objects.order_by('patient__last_name')
+        with self.assertRaises(ValidationError):
+            KeysetPagination().paginate_queryset(queryset, request)
+
+
+class KeysetWalkTests(TestCase):
+    def setUp(self):
+        patient = Patient.objects.create(first_name='Ada', last_name='Keyset', date_of_birth='1990-01-01', gender='F')
+        t0 = timezone.now().replace(microsecond=0)
+        # runs of equal start_time so page boundaries fall inside ties
+        for hours in (0, 0, 0, 1, 1, 2, 2, 2, 2, 3):
+            Visit.objects.create(patient=patient, start_time=t0 + datetime.timedelta(hours=hours))
+
+    def page(self, ordering, size, link=None):
+        cursor = parse_qs(urlparse(link).query)['cursor'][0] if link else None
+        params = {'page_size': size, **({'cursor': cursor} if cursor else {})}
+        paginator = KeysetPagination()
+        rows = paginator.paginate_queryset(
+            Visit.objects.order_by(ordering), Request(APIRequestFactory().get('/api/visits/', params))
+        )
+        return [row.pk for row in rows], paginator.get_next_link(), paginator.get_previous_link()
+
+    def test_walk_forward_and_back_over_ties(self):
+        for ordering in ('start_time', '-start_time'):
+            expected = list(Visit.objects.order_by(ordering, ordering.replace('start_time', 'id'))
+                            .values_list('pk', flat=True))
+            for size in (1, 2, 3, 4):
+                with self.subTest(ordering=ordering, page_size=size):
+                    pages, link = [], None
+                    while True:
+                        rows, link, previous = self.page(ordering, size, link)
+                        self.assertEqual(previous is None, not pages)
+                        pages.append(rows)
+                        if link is None:
+                            break
+                    self.assertEqual([pk for rows in pages for pk in rows], expected)
+                    self.assertTrue(all(len(rows) == size for rows in pages[:-1]))
+
+                    # back from the last page through the previous links
+                    walked_back = [pages[-1]]
+                    while previous:
+                        rows, _, previous = self.page(ordering, size, previous)
+                        walked_back.insert(0, rows)
+                    self.assertEqual(walked_back, pages)
+
+
+class LabOrderQueryPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('plan.lab@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rounds = 0
+        self.add_order()
+
+    def add_order(self):
+        # a new patient, visit, requester and test type each time: nothing shared to hide an N+1
+        self.rounds += 1
+        n = self.rounds
+        patient = Patient.objects.create(first_name=f'Lab{n}', last_name='Plan', date_of_birth='1990-01-01', gender='F')
+        requester = User.objects.create_user(f'plan.requester{n}@example.com', 'pw', role='Doctor')
+        test_type = LabTestType.objects.create(name=f'Test {n}', category=LabTestCategory.objects.create(name=f'Cat {n}'))
+        LabTestOrder.objects.create(visit=Visit.objects.create(patient=patient), patient=patient,
+                                    test_type=test_type, requested_by=requester)
 
-# Create your tests here.
+    def test_order_list(self):
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get('/api/lab/orders/').status_code, 200)
+        self.add_order()
+        self.add_order()
+        with self.assertNumQueries(len(before)):
+            self.assertEqual(self.client.get('/api/lab/orders/').status_code, 200)
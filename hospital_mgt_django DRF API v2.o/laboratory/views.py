@@ -1,21 +1,25 @@
 from rest_framework import viewsets, permissions, filters
+from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .models import LabTestCategory, LabTestType,  LabResultAttachment
 from rest_framework.permissions import IsAuthenticated
-from .filters import get_lab_dashboard_stats
+from .filters import LabTestOrderFilter, get_lab_dashboard_stats
 from .serializers import (
     LabTestCategorySerializer,
     LabTestCategoryWriteSerializer,
     LabTestTypeSerializer,
     LabTestTypeWriteSerializer,
     LabTestOrderSerializer,
+    LabTestOrderDetailSerializer,
     LabTestOrderWriteSerializer,
     LabResultAttachmentSerializer,
     LabResultAttachmentWriteSerializer,
 )
 from visits.models import LabTestOrder
+from core.fieldsets import SparseFieldsetMixin
+from core.prefetch import QueryPlanMixin
 
 
 class LabTestCategoryViewSet(viewsets.ModelViewSet):
@@ -42,26 +46,31 @@ class LabTestTypeViewSet(viewsets.ModelViewSet):
         return super().get_serializer_class()
 
 
-class LabTestOrderViewSet(viewsets.ModelViewSet):
+class LabTestOrderViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = LabTestOrder.objects.all()
     serializer_class = LabTestOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter, 'django_filters.rest_framework.DjangoFilterBackend']
-    search_fields = ['test_type__name', 'patient__first_name', 'patient__last_name', 'ordered_by__email']
-    ordering_fields = ['ordered_at', 'estimated_completion_time', 'status']
-    filterset_class = 'laboratory.filters.LabTestOrderFilter'
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
+    search_fields = ['test_type__name', 'patient__first_name', 'patient__last_name', 'requested_by__email']
+    # keyset pagination needs non-null keys (estimated_completion_time is nullable)
+    ordering_fields = ['ordered_at', 'status']
+    ordering = ['-ordered_at']
+    filterset_class = LabTestOrderFilter
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return LabTestOrderWriteSerializer
+        if self.action == 'retrieve':
+            return LabTestOrderDetailSerializer
         return super().get_serializer_class()
 
     def get_queryset(self):
         user = self.request.user
+        queryset = self.queryset
         # Optional: Filter by role
         if user.role == 'LabTechnician':
-            return self.queryset.filter(status='in_progress')
-        return self.queryset.select_related('patient', 'test_type', 'ordered_by')
+            queryset = queryset.filter(status='in_progress')
+        return self.plan_queryset(queryset)
 
 
 class LabResultAttachmentViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,84 @@
+# patients/demographics.py
+"""
+Age filters and demographic counts computed in the database.
+
+Age is never computed per row: "age >= n" is rewritten as
+``date_of_birth <= today - n years`` (and "age <= n" as
+``date_of_birth > today - (n + 1) years``), so filters and age bands are plain
+range predicates on the indexed ``date_of_birth`` column.
+"""
+from collections import defaultdict
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.utils import timezone
+
+# (label, min age, max age or None)
+AGE_BANDS = (
+    ('0-4', 0, 4),
+    ('5-14', 5, 14),
+    ('15-24', 15, 24),
+    ('25-34', 25, 34),
+    ('35-44', 35, 44),
+    ('45-54', 45, 54),
+    ('55-64', 55, 64),
+    ('65+', 65, None),
+)
+
+DIMENSIONS = ('gender', 'blood_group', 'mode_of_payment')
+
+
+def born_on_or_before(age, today):
+    """Latest date of birth of someone who is at least ``age`` today."""
+    return today - relativedelta(years=age)
+
+
+def born_after(age, today):
+    """Dates of birth strictly after this belong to people at most ``age`` today."""
+    return today - relativedelta(years=age + 1)
+
+
+def age_range_q(age_min=None, age_max=None, today=None):
+    today = today or timezone.localdate()
+    condition = Q()
+    if age_min is not None:
+        condition &= Q(date_of_birth__lte=born_on_or_before(age_min, today))
+    if age_max is not None:
+        condition &= Q(date_of_birth__gt=born_after(age_max, today))
+    return condition
+
+
+def age_band_case(today=None):
+    """``CASE`` expression labelling each row with its ``AGE_BANDS`` label."""
+    today = today or timezone.localdate()
+    whens = [
+        When(date_of_birth__gt=born_after(upper, today), then=Value(label))
+        for label, _, upper in AGE_BANDS if upper is not None
+    ]
+    open_ended = next(label for label, _, upper in AGE_BANDS if upper is None)
+    return Case(*whens, default=Value(open_ended), output_field=CharField())
+
+
+def demographic_summary(queryset, today=None):
+    """
+    Counts by age band, gender, blood group and payment mode from one
+    ``GROUP BY age_band, gender, blood_group, mode_of_payment`` query; the
+    per-dimension totals are folded from those few grouped rows.
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(age_band=age_band_case(today))
+        .values('age_band', *DIMENSIONS)
+        .annotate(count=Count('id'))
+    )
+
+    summary = {'age_band': {label: 0 for label, _, _ in AGE_BANDS}}
+    summary.update({dimension: defaultdict(int) for dimension in DIMENSIONS})
+    total = 0
+    for row in rows:
+        total += row['count']
+        summary['age_band'][row['age_band']] += row['count']
+        for dimension in DIMENSIONS:
+            summary[dimension][row[dimension] or 'unknown'] += row['count']
+
+    return {'total': total, **{key: dict(counts) for key, counts in summary.items()}}
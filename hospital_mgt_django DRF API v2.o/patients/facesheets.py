@@ -0,0 +1,77 @@
+# patients/facesheets.py
+"""
+Materialized patient face sheets.
+
+Queue cards and ward lists show the same small header for many patients at
+once. Rendering it from ``PatientSerializer`` drags in the whole nested
+history, so the header is kept precomputed in ``PatientFaceSheet`` (one JSON
+row per patient). Signals on ``Patient``, ``Allergy`` and ``ChronicCondition``
+rebuild the affected rows; bulk paths (import, merge) call
+``refresh_face_sheets`` themselves. Reading many face sheets is one primary
+key lookup; rows that are missing (e.g. patients created before the table
+existed) are built on the spot.
+"""
+import datetime
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import Patient, Allergy, ChronicCondition, PatientFaceSheet
+
+PATIENT_FIELDS = ('id', 'mrn', 'first_name', 'last_name', 'date_of_birth', 'gender', 'blood_group', 'phone')
+
+
+def age_on(date_of_birth, today):
+    return today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def with_age(data, today):
+    """Stored face sheet ``data`` plus the patient's ``age`` on ``today``."""
+    return {**data, 'age': age_on(datetime.date.fromisoformat(data['date_of_birth']), today)}
+
+
+def build_face_sheets(patient_ids):
+    """``{patient_id: data}`` for the given patients, from three queries."""
+    allergies, conditions = defaultdict(list), defaultdict(list)
+    for row in Allergy.objects.filter(patient_id__in=patient_ids).order_by('id').values('patient_id', 'allergen', 'severity'):
+        allergies[row.pop('patient_id')].append(row)
+    for row in (
+        ChronicCondition.objects.filter(patient_id__in=patient_ids, active=True)
+        .order_by('id').values('patient_id', 'condition')
+    ):
+        conditions[row['patient_id']].append(row['condition'])
+
+    sheets = {}
+    for row in Patient.objects.filter(pk__in=patient_ids).values(*PATIENT_FIELDS):
+        sheets[row['id']] = {
+            **row,
+            'full_name': f"{row['first_name']} {row['last_name']}",
+            'date_of_birth': row['date_of_birth'].isoformat(),
+            'allergies': allergies[row['id']],
+            'chronic_conditions': conditions[row['id']],
+        }
+    return sheets
+
+
+def refresh_face_sheets(patient_ids):
+    """Rebuild and store the face sheets of ``patient_ids``; returns them."""
+    sheets = build_face_sheets(set(patient_ids))
+    now = timezone.now()
+    PatientFaceSheet.objects.bulk_create(
+        [PatientFaceSheet(patient_id=pk, data=data, updated_at=now) for pk, data in sheets.items()],
+        update_conflicts=True,
+        unique_fields=['patient'],
+        update_fields=['data', 'updated_at'],
+    )
+    return sheets
+
+
+def get_face_sheets(patient_ids):
+    """Face sheets for ``patient_ids`` in the given order (unknown ids are skipped), with ``age``."""
+    stored = dict(PatientFaceSheet.objects.filter(patient_id__in=patient_ids).values_list('patient_id', 'data'))
+    missing = set(patient_ids) - stored.keys()
+    if missing:
+        stored.update(refresh_face_sheets(missing))
+
+    today = timezone.localdate()
+    return [with_age(stored[pk], today) for pk in patient_ids if pk in stored]
@@ -0,0 +1,241 @@
+# patients/importer.py
+"""
+Streaming bulk import of legacy patients with their medical history.
+
+Input is CSV (a header row of ``PatientWriteSerializer`` fields) or NDJSON
+(one patient object per line). History goes in the ``allergies``,
+``chronic_conditions`` (with nested ``medications``), ``surgical_history`` and
+``family_history`` keys — JSON lists, also inside a CSV cell. Keys starting
+with ``_`` are ignored.
+
+Records are read one chunk at a time. Each chunk is validated with the same
+serializers as the API, gets its MRNs from one block reservation and is
+written with ``bulk_create`` in a single transaction, so memory stays bounded
+by the chunk size however large the file is. Rejected records go to an
+NDJSON error report in the input format (plus ``_line`` / ``_errors``), so
+the report itself can be corrected and re-imported.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from identifiers.allocator import next_identifiers
+from .facesheets import refresh_face_sheets
+from .linkage import refresh_keys
+from .models import Patient, ChronicCondition, Medication, Allergy, SurgicalHistory, FamilyHistory
+from .search import index_patients
+from .serializers import (
+    PatientWriteSerializer,
+    ChronicConditionSerializer,
+    MedicationSerializer,
+    AllergySerializer,
+    SurgicalHistorySerializer,
+    FamilyHistorySerializer,
+)
+
+CHUNK_SIZE = 1000
+
+# key -> (model, serializer) for history rows attached to the patient
+HISTORY = {
+    'allergies': (Allergy, AllergySerializer),
+    'chronic_conditions': (ChronicCondition, ChronicConditionSerializer),
+    'surgical_history': (SurgicalHistory, SurgicalHistorySerializer),
+    'family_history': (FamilyHistory, FamilyHistorySerializer),
+}
+
+
+# -----------------------------
+# READING
+# -----------------------------
+
+def read_records(stream, fmt):
+    """
+    Yield ``(line_number, record)`` from a text stream; a record that can't be
+    parsed is yielded as ``(line_number, None)``.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # blank cells mean "not given", as an omitted key in NDJSON does
+            yield reader.line_num, {k: v for k, v in record.items() if k and v not in (None, '')}
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None
+            continue
+        yield number, record if isinstance(record, dict) else None
+
+
+def text_stream(binary):
+    """Wrap an uploaded (binary) file for ``read_records`` without reading it whole."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def guess_format(name):
+    return 'csv' if str(name).lower().endswith('.csv') else 'ndjson'
+
+
+# -----------------------------
+# VALIDATION
+# -----------------------------
+
+def _history_list(record, key):
+    value = record.get(key) or []
+    if isinstance(value, str):
+        value = json.loads(value)  # CSV cell
+    if not isinstance(value, list):
+        raise ValueError
+    return value
+
+
+def _run(serializer, data):
+    try:
+        return serializer.run_validation(data), None
+    except serializers.ValidationError as exc:
+        return None, exc.detail
+
+
+class RecordValidator:
+    """
+    Validates input records with the API serializers. The serializer
+    instances are built once and reused: constructing a ModelSerializer's
+    fields costs far more than validating one row with them.
+    """
+    def __init__(self):
+        self.patient = PatientWriteSerializer()
+        self.history = {key: serializer_class() for key, (_, serializer_class) in HISTORY.items()}
+        self.medication = MedicationSerializer()
+
+    def __call__(self, record):
+        """Return ``(patient_data, history, errors)`` for one input record."""
+        fields = {k: v for k, v in record.items() if not k.startswith('_') and k not in HISTORY}
+        data, errors = _run(self.patient, fields)
+        errors = dict(errors or {})
+
+        history = {}
+        for key, serializer in self.history.items():
+            try:
+                items = _history_list(record, key)
+            except ValueError:
+                errors[key] = ["Must be a list of objects."]
+                continue
+            valid, item_errors = [], {}
+            for index, item in enumerate(items):
+                item_data, item_error = _run(serializer, item)
+                if key == 'chronic_conditions' and not item_error:
+                    try:
+                        medications = [_run(self.medication, m) for m in _history_list(item, 'medications')]
+                    except ValueError:
+                        medications = []
+                        item_error = {'medications': ["Must be a list of objects."]}
+                    medication_errors = {i: e for i, (_, e) in enumerate(medications) if e}
+                    if medication_errors:
+                        item_error = {'medications': medication_errors}
+                    else:
+                        item_data['medications'] = [m for m, _ in medications]
+                if item_error:
+                    item_errors[index] = item_error
+                else:
+                    valid.append(item_data)
+            if item_errors:
+                errors[key] = item_errors
+            history[key] = valid
+        return (data if not errors else None), history, errors
+
+
+# -----------------------------
+# WRITING
+# -----------------------------
+
+def _insert_chunk(rows, user):
+    """``rows`` = [(patient_data, history)]; returns the created patients."""
+    with transaction.atomic():
+        # one block reservation per chunk; rolled back with the chunk on failure
+        mrns = next_identifiers('mrn', len(rows))
+        patients = Patient.objects.bulk_create([
+            Patient(mrn=mrn, created_by=user, **data) for mrn, (data, _) in zip(mrns, rows)
+        ])
+
+        conditions, medications = [], []
+        for key, (model, _) in HISTORY.items():
+            objects = []
+            for patient, (_, history) in zip(patients, rows):
+                for item in history[key]:
+                    item = dict(item)
+                    nested = item.pop('medications', [])
+                    objects.append(model(patient=patient, **item))
+                    if key == 'chronic_conditions':
+                        medications.append(nested)
+            created = model.objects.bulk_create(objects, batch_size=CHUNK_SIZE)
+            if key == 'chronic_conditions':
+                conditions = created
+        Medication.objects.bulk_create([
+            Medication(chronic_condition=condition, **item)
+            for condition, items in zip(conditions, medications)
+            for item in items
+        ], batch_size=CHUNK_SIZE)
+
+        # bulk_create sends no post_save: keep search, duplicate detection and face sheets current
+        index_patients(patients)
+        refresh_keys(patients)
+        refresh_face_sheets([patient.pk for patient in patients])
+    return patients
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = self.imported = self.failed = 0
+        self.last_line = 0
+
+    def as_dict(self):
+        return {'read': self.read, 'imported': self.imported, 'failed': self.failed, 'last_line': self.last_line}
+
+
+def import_patients(records, user=None, chunk_size=CHUNK_SIZE, start_after=0, on_error=None, on_chunk=None):
+    """
+    Import ``(line_number, record)`` pairs (see ``read_records``).
+
+    Records at or before ``start_after`` are skipped (resuming an interrupted
+    run). ``on_error(line, record, errors)`` is called for every rejected
+    record and ``on_chunk(stats)`` after every committed chunk, whose
+    ``last_line`` is the resume point. Returns the final ``ImportStats``.
+    """
+    stats = ImportStats()
+    validate_record = RecordValidator()
+    records = ((line, record) for line, record in records if line > start_after)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return stats
+        rows = []
+        for line, record in chunk:
+            stats.read += 1
+            if record is None:
+                data, history, errors = None, {}, {'non_field_errors': ["Not a valid record."]}
+            else:
+                data, history, errors = validate_record(record)
+            if errors:
+                stats.failed += 1
+                if on_error:
+                    on_error(line, record, errors)
+                continue
+            rows.append((data, history))
+        if rows:
+            _insert_chunk(rows, user)
+            stats.imported += len(rows)
+        stats.last_line = chunk[-1][0]
+        if on_chunk:
+            on_chunk(stats)
+
+
+def error_entry(line, record, errors):
+    """One error-report line: the record as given plus ``_line`` and ``_errors``."""
+    return json.dumps({**(record or {}), '_line': line, '_errors': errors}, default=str)
@@ -0,0 +1,238 @@
+# patients/linkage.py
+"""
+Duplicate patient detection (record linkage).
+
+Comparing every registration with every patient does not scale, so each
+patient gets a handful of *blocking keys* (``PatientBlockingKey``, indexed on
+``(kind, key)``):
+
+    phone      last 9 digits of the phone number
+    dob_last   date of birth + Soundex of the surname
+    dob_first  date of birth + Soundex of the first name
+    names      Soundex of both names, order-insensitive (catches swapped names)
+
+Only patients sharing at least one key are candidates, and each candidate is
+scored field by field (name similarity, date of birth, phone, gender).
+Keys are refreshed by a ``post_save`` signal; the full-registry scan is the
+``find_duplicate_patients`` management command.
+"""
+import datetime
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.db.models import Exists, OuterRef
+
+# a block larger than this (e.g. "John Kamau") is too unspecific to compare pairwise
+MAX_BLOCK_SIZE = 200
+POSSIBLE_DUPLICATE_SCORE = 0.7
+
+WEIGHTS = {'name': 0.4, 'dob': 0.3, 'phone': 0.2, 'gender': 0.1}
+KEY_FIELDS = ('first_name', 'last_name', 'date_of_birth', 'phone', 'gender')
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def soundex(name):
+    """American Soundex ("Robert" -> "R163"); '' for names without letters."""
+    letters = [ch for ch in (name or '').lower() if ch.isalpha()]
+    if not letters:
+        return ''
+    code, previous = letters[0].upper(), _SOUNDEX_CODES.get(letters[0], '')
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in 'hw':  # h/w don't separate equal codes, vowels do
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def normalize_phone(phone):
+    """Last 9 digits, so "+254 712 345 678" and "0712345678" agree."""
+    digits = ''.join(ch for ch in phone or '' if ch.isdigit())
+    return digits[-9:] if len(digits) >= 7 else ''
+
+
+def _as_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def blocking_keys(first_name, last_name, date_of_birth, phone, **ignored):
+    """``[(kind, key), ...]`` for one patient (or registration form)."""
+    first, last = soundex(first_name), soundex(last_name)
+    dob = _as_date(date_of_birth)
+    keys = []
+    if phone_key := normalize_phone(phone):
+        keys.append(('phone', phone_key))
+    if dob and last:
+        keys.append(('dob_last', f'{dob.isoformat()}:{last}'))
+    if dob and first:
+        keys.append(('dob_first', f'{dob.isoformat()}:{first}'))
+    if first and last:
+        keys.append(('names', ':'.join(sorted((first, last)))))
+    return keys
+
+
+def refresh_keys(patients):
+    """Rewrite the blocking keys of ``patients`` (model instances)."""
+    from .models import PatientBlockingKey
+
+    patients = list(patients)
+    PatientBlockingKey.objects.filter(patient__in=patients).delete()
+    PatientBlockingKey.objects.bulk_create([
+        PatientBlockingKey(patient_id=patient.pk, kind=kind, key=key)
+        for patient in patients
+        for kind, key in blocking_keys(**{f: getattr(patient, f) for f in KEY_FIELDS})
+    ], batch_size=1000)
+
+
+# -----------------------------
+# SCORING
+# -----------------------------
+
+def _similar(a, b):
+    a, b = (a or '').strip().lower(), (b or '').strip().lower()
+    return SequenceMatcher(None, a, b).ratio() if a and b else 0.0
+
+
+def _name_score(a, b):
+    straight = (_similar(a['first_name'], b['first_name']) + _similar(a['last_name'], b['last_name'])) / 2
+    swapped = (_similar(a['first_name'], b['last_name']) + _similar(a['last_name'], b['first_name'])) / 2
+    return max(straight, swapped * 0.95)
+
+
+def _dob_score(a, b):
+    a, b = _as_date(a), _as_date(b)
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    if a.year == b.year and (a.month, a.day) == (b.day, b.month):
+        return 0.8  # day / month swapped on entry
+    if (a.month, a.day) == (b.month, b.day) and abs(a.year - b.year) == 1:
+        return 0.6
+    if a.year == b.year:
+        return 0.3
+    return 0.0
+
+
+def score_pair(a, b):
+    """
+    Compare two patient dicts (``KEY_FIELDS``); returns ``(score 0..1, reasons)``.
+    """
+    name = _name_score(a, b)
+    dob = _dob_score(a['date_of_birth'], b['date_of_birth'])
+    phone_a, phone_b = normalize_phone(a.get('phone')), normalize_phone(b.get('phone'))
+    phone = 1.0 if phone_a and phone_a == phone_b else 0.0
+    gender = 1.0 if a.get('gender') and a.get('gender') == b.get('gender') else 0.0
+
+    score = (
+        WEIGHTS['name'] * name + WEIGHTS['dob'] * dob
+        + WEIGHTS['phone'] * phone + WEIGHTS['gender'] * gender
+    )
+    reasons = []
+    if name >= 0.85:
+        reasons.append('similar name')
+    if dob == 1.0:
+        reasons.append('same date of birth')
+    elif dob >= 0.6:
+        reasons.append('near date of birth')
+    if phone:
+        reasons.append('same phone')
+    return round(score, 3), reasons
+
+
+# -----------------------------
+# CANDIDATES
+# -----------------------------
+
+def candidate_ids(keys, exclude_id=None):
+    """Ids of patients sharing any of ``keys``, skipping oversized blocks."""
+    from .models import PatientBlockingKey
+
+    ids = set()
+    for kind, key in keys:
+        block = list(
+            PatientBlockingKey.objects.filter(kind=kind, key=key)
+            .values_list('patient_id', flat=True)[:MAX_BLOCK_SIZE + 1]
+        )
+        if len(block) <= MAX_BLOCK_SIZE:
+            ids.update(block)
+    ids.discard(exclude_id)
+    return ids
+
+
+def find_possible_duplicates(data, exclude_id=None, min_score=POSSIBLE_DUPLICATE_SCORE, limit=10):
+    """
+    Registration-time check: ``data`` holds the form fields (``KEY_FIELDS``).
+    Returns ``[(patient_id, score, reasons), ...]`` best first.
+    """
+    from .models import Patient
+
+    ids = candidate_ids(blocking_keys(**{f: data.get(f) for f in KEY_FIELDS}), exclude_id)
+    if not ids:
+        return []
+    matches = []
+    for candidate in Patient.objects.filter(pk__in=ids).values('id', *KEY_FIELDS):
+        score, reasons = score_pair(data, candidate)
+        if score >= min_score:
+            matches.append((candidate['id'], score, reasons))
+    matches.sort(key=lambda match: -match[1])
+    return matches[:limit]
+
+
+def iter_blocks():
+    """
+    Yield the patient ids of every shared blocking key (2..MAX_BLOCK_SIZE
+    members), streaming the key index in ``(kind, key)`` order.
+    """
+    from .models import PatientBlockingKey
+
+    shared = PatientBlockingKey.objects.filter(
+        kind=OuterRef('kind'), key=OuterRef('key')
+    ).exclude(patient_id=OuterRef('patient_id'))
+    rows = (
+        PatientBlockingKey.objects.filter(Exists(shared))
+        .order_by('kind', 'key', 'patient_id')
+        .values_list('kind', 'key', 'patient_id')
+    )
+    current, block = None, []
+    for kind, key, patient_id in rows.iterator(chunk_size=5000):
+        if (kind, key) != current:
+            if 1 < len(block) <= MAX_BLOCK_SIZE:
+                yield block
+            current, block = (kind, key), []
+        block.append(patient_id)
+    if 1 < len(block) <= MAX_BLOCK_SIZE:
+        yield block
+
+
+def score_blocks(blocks, min_score=POSSIBLE_DUPLICATE_SCORE):
+    """Score every pair inside ``blocks``; returns ``{(low_id, high_id): (score, reasons)}``."""
+    from .models import Patient
+
+    ids = {pk for block in blocks for pk in block}
+    patients = {row['id']: row for row in Patient.objects.filter(pk__in=ids).values('id', *KEY_FIELDS)}
+    results = {}
+    for block in blocks:
+        for a, b in combinations(sorted(block), 2):
+            if (a, b) in results or a not in patients or b not in patients:
+                continue
+            score, reasons = score_pair(patients[a], patients[b])
+            if score >= min_score:
+                results[(a, b)] = (score, reasons)
+    return results
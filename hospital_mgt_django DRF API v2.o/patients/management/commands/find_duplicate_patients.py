@@ -0,0 +1,83 @@
+from multiprocessing import get_context
+
+from django import db
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from patients.linkage import POSSIBLE_DUPLICATE_SCORE, iter_blocks, refresh_keys, score_blocks
+from patients.models import Patient, PatientDuplicate
+
+
+def _chunks(blocks, size):
+    chunk = []
+    for block in blocks:
+        chunk.append(block)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _score_chunk(args):
+    # runs in a worker process with its own database connection
+    blocks, min_score = args
+    return score_blocks(blocks, min_score)
+
+
+class Command(BaseCommand):
+    help = 'Scans the whole registry for probable duplicate patients (parallel workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--min-score', type=float, default=POSSIBLE_DUPLICATE_SCORE)
+        parser.add_argument('--blocks-per-task', type=int, default=500)
+        parser.add_argument('--rebuild-keys', action='store_true', help='Recompute blocking keys first')
+
+    def handle(self, *args, **options):
+        if options['rebuild_keys']:
+            self.rebuild_keys()
+
+        min_score = options['min_score']
+        tasks = ((chunk, min_score) for chunk in _chunks(iter_blocks(), options['blocks_per_task']))
+        pairs = {}
+
+        if options['workers'] > 1:
+            # blocks are streamed by this process; workers only read patients and score
+            db.connections.close_all()
+            with get_context('fork').Pool(options['workers'], initializer=db.connections.close_all) as pool:
+                for result in pool.imap_unordered(_score_chunk, tasks):
+                    pairs.update(result)
+        else:
+            for task in tasks:
+                pairs.update(_score_chunk(task))
+
+        self.stdout.write(f"ℹ️ {len(pairs)} candidate pairs scored ≥ {min_score}. Saving...")
+        self.save(pairs)
+        self.stdout.write(self.style.SUCCESS(f"✔ Duplicate scan finished: {len(pairs)} pairs."))
+
+    def rebuild_keys(self):
+        patients = Patient.objects.order_by('id').only('id', 'first_name', 'last_name', 'date_of_birth', 'phone', 'gender')
+        batch, total = [], 0
+        for patient in patients.iterator(chunk_size=2000):
+            batch.append(patient)
+            if len(batch) >= 2000:
+                refresh_keys(batch)
+                total += len(batch)
+                batch = []
+        refresh_keys(batch)
+        total += len(batch)
+        self.stdout.write(f"… blocking keys rebuilt for {total} patients")
+
+    def save(self, pairs):
+        # re-scans refresh scores but keep reviewers' dismissed decisions
+        now = timezone.now()
+        PatientDuplicate.objects.bulk_create(
+            [
+                PatientDuplicate(patient_a_id=a, patient_b_id=b, score=score, reasons=reasons, detected_at=now)
+                for (a, b), (score, reasons) in pairs.items()
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['patient_a', 'patient_b'],
+            update_fields=['score', 'reasons', 'detected_at'],
+        )
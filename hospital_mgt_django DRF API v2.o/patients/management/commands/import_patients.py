@@ -0,0 +1,68 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from patients.importer import CHUNK_SIZE, error_entry, guess_format, import_patients, read_records
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Streams legacy patients (CSV or NDJSON) with their medical history into the registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--errors', help='Error report (NDJSON); defaults to <path>.errors.ndjson')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last committed chunk')
+        parser.add_argument('--created-by', help='Email of the user recorded as creator')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        user = None
+        if options['created_by']:
+            user = User.objects.filter(email=options['created_by']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['created_by']}.")
+
+        checkpoint = f'{path}.checkpoint'
+        start_after = 0
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as handle:
+                start_after = int(handle.read().strip() or 0)
+            self.stdout.write(f"ℹ️ Resuming after line {start_after}.")
+
+        errors_path = options['errors'] or f'{path}.errors.ndjson'
+        started = time.monotonic()
+
+        def save_progress(stats):
+            with open(checkpoint, 'w') as handle:
+                handle.write(str(stats.last_line))
+            rate = stats.read / max(time.monotonic() - started, 0.001)
+            self.stdout.write(
+                f"… line {stats.last_line}: {stats.imported} imported, {stats.failed} rejected ({rate:.0f} rows/s)"
+            )
+
+        with open(path, encoding='utf-8-sig', newline='') as source, \
+                open(errors_path, 'a' if options['resume'] else 'w') as report:
+            try:
+                stats = import_patients(
+                    read_records(source, options['format'] or guess_format(path)),
+                    user=user,
+                    chunk_size=options['chunk_size'],
+                    start_after=start_after,
+                    on_error=lambda line, record, errors: report.write(error_entry(line, record, errors) + '\n'),
+                    on_chunk=save_progress,
+                )
+            except (UnicodeDecodeError, csv.Error) as exc:
+                raise CommandError(f"{path} is not readable as UTF-8 {options['format'] or guess_format(path)}: {exc}. "
+                                   "Committed chunks are kept; fix the file and re-run with --resume.")
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)  # finished: a later --resume starts from the top
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Imported {stats.imported} patients; {stats.failed} rejected (see {errors_path})."
+        ))
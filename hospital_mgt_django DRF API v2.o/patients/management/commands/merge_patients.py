@@ -0,0 +1,57 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from patients.linkage import POSSIBLE_DUPLICATE_SCORE
+from patients.merge import CHUNK_SIZE, MergeError, merge_patients
+from patients.models import PatientDuplicate
+
+
+class Command(BaseCommand):
+    help = 'Merges duplicate patients in bulk (set-based, one transaction per chunk)'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--pairs', help='CSV file of survivor_id,loser_id rows')
+        source.add_argument(
+            '--from-duplicates', action='store_true',
+            help='Merge open pairs found by find_duplicate_patients (older record survives)',
+        )
+        parser.add_argument('--min-score', type=float, default=0.95)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        pairs = self.read_pairs(options['pairs']) if options['pairs'] else self.duplicate_pairs(options['min_score'])
+        self.stdout.write(f"ℹ️ {len(pairs)} pairs to merge.")
+        if options['dry_run'] or not pairs:
+            return
+        try:
+            merged = merge_patients(pairs, chunk_size=options['chunk_size'])
+        except MergeError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"✔ Merged {merged} patients."))
+
+    def read_pairs(self, path):
+        with open(path, newline='') as handle:
+            try:
+                return [(int(row[0]), int(row[1])) for row in csv.reader(handle) if row and row[0].strip().isdigit()]
+            except (IndexError, ValueError):
+                raise CommandError("Each row must be survivor_id,loser_id.")
+
+    def duplicate_pairs(self, min_score):
+        if min_score < POSSIBLE_DUPLICATE_SCORE:
+            raise CommandError(f"--min-score must be at least {POSSIBLE_DUPLICATE_SCORE}.")
+        pairs, merged_away = [], set()
+        rows = (
+            PatientDuplicate.objects.filter(status='open', score__gte=min_score)
+            .order_by('-score', 'patient_a_id')
+            .values_list('patient_a_id', 'patient_b_id')
+        )
+        for survivor, loser in rows:
+            # a record merged away in this run can neither absorb nor be absorbed again
+            if survivor in merged_away or loser in merged_away:
+                continue
+            merged_away.add(loser)
+            pairs.append((survivor, loser))
+        survivors = {survivor for survivor, _ in pairs}
+        return [(s, l) for s, l in pairs if l not in survivors]
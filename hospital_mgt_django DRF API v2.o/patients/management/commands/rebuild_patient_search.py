@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from patients.search import fts_enabled, sync_index
+
+
+class Command(BaseCommand):
+    help = 'Brings the patient search index up to date (only changed rows unless --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rewrite every row')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write("ℹ️ No FTS index on this database (PostgreSQL maintains its trigram index itself).")
+            return
+
+        written, removed = sync_index(chunk_size=options['chunk_size'], full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"✔ Search index synced: {written} rows written, {removed} removed."))
@@ -0,0 +1,128 @@
+# patients/merge.py
+"""
+Set-based patient merges.
+
+Merging moves everything that points at the losing patient to the survivor
+with one ``UPDATE ... SET patient_id = CASE ...`` per referencing table (per
+chunk of pairs), records a ``PatientMergeTombstone`` for the loser's id and
+MRN, and deletes the loser rows — no per-row ``save()``, so a batch of
+thousands of pairs costs a few dozen statements per chunk.
+
+Referencing tables are discovered from ``Patient._meta``, so new apps that add
+a ``ForeignKey(Patient)`` are merged without changes here. Tombstones point at
+the survivor through such a key too, which keeps redirects one hop after a
+survivor is itself merged later.
+"""
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from .facesheets import refresh_face_sheets
+from .linkage import refresh_keys
+from .models import Patient, PatientBlockingKey, PatientDuplicate, PatientFaceSheet, PatientMergeTombstone
+
+CHUNK_SIZE = 500
+
+# rows derived from the loser alone; dropped instead of moved
+_DERIVED = (PatientBlockingKey, PatientFaceSheet)
+
+
+class MergeError(ValueError):
+    pass
+
+
+def _referencing_fields():
+    return [
+        relation.field for relation in Patient._meta.related_objects
+        if relation.related_model not in _DERIVED and not relation.many_to_many
+    ]
+
+
+def validate_pairs(pairs):
+    """
+    Check ``[(survivor_id, loser_id), ...]``; returns the pairs as a dict
+    ``{loser_id: survivor_id}``. Raises ``MergeError`` on the first problem.
+    """
+    mapping = {}
+    for survivor_id, loser_id in pairs:
+        if survivor_id == loser_id:
+            raise MergeError(f"Cannot merge patient {loser_id} into itself.")
+        if mapping.setdefault(loser_id, survivor_id) != survivor_id:
+            raise MergeError(f"Patient {loser_id} is merged into more than one survivor.")
+    chained = set(mapping.values()) & mapping.keys()
+    if chained:
+        raise MergeError(f"Patients {sorted(chained)} are both a survivor and merged away.")
+    ids = mapping.keys() | set(mapping.values())
+    missing = ids - set(Patient.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    # losers already merged into the same survivor (a re-run batch) are skipped
+    done = PatientMergeTombstone.objects.filter(merged_patient_id__in=missing & mapping.keys())
+    for loser_id, survivor_id in done.values_list('merged_patient_id', 'survivor_id'):
+        if mapping[loser_id] == survivor_id:
+            missing.discard(loser_id)
+            del mapping[loser_id]
+    if missing:
+        raise MergeError(f"Patients {sorted(missing)} do not exist.")
+    return mapping
+
+
+def _merge_chunk(mapping, user):
+    losers = list(mapping)
+    survivors = set(mapping.values())
+
+    # 1️⃣ tombstones first (they capture the loser's identity before it is deleted)
+    PatientMergeTombstone.objects.bulk_create([
+        PatientMergeTombstone(
+            merged_patient_id=row['id'],
+            merged_mrn=row['mrn'],
+            survivor_id=mapping[row['id']],
+            merged_by=user,
+            details={k: str(v) if v is not None else None for k, v in row.items() if k not in ('id', 'mrn')},
+        )
+        for row in Patient.objects.filter(pk__in=losers).values(
+            'id', 'mrn', 'first_name', 'last_name', 'date_of_birth', 'phone'
+        )
+    ])
+
+    # 2️⃣ one UPDATE per referencing table re-points every loser at its survivor
+    now = timezone.now()
+    for field in _referencing_fields():
+        target = Case(*[When(**{field.attname: loser, 'then': Value(survivor)}) for loser, survivor in mapping.items()])
+        changes = {field.attname: target}
+        if any(f.name == 'updated_at' and getattr(f, 'auto_now', False) for f in field.model._meta.concrete_fields):
+            changes['updated_at'] = now  # update() skips auto_now; incremental FHIR exports rely on it
+        field.model._base_manager.filter(**{f'{field.attname}__in': losers}).update(**changes)
+
+    # 3️⃣ drop what only described the losers, then the losers themselves
+    for model in _DERIVED:
+        model.objects.filter(patient_id__in=losers).delete()
+    PatientDuplicate.objects.filter(Q(patient_a_id__in=losers) | Q(patient_b_id__in=losers)).delete()
+    # nothing references the losers any more, so the collector finds nothing to
+    # cascade; post_delete drops them from the search index
+    Patient.objects.filter(pk__in=losers).delete()
+
+    # 4️⃣ survivors' ETags and the cached visit details that embed the patient
+    from visits.models import Visit
+    Patient.touch(survivors)
+    Visit.touch(Visit.objects.filter(patient_id__in=survivors).values('id'))
+    refresh_keys(Patient.objects.filter(pk__in=survivors))
+    refresh_face_sheets(survivors)  # they gained the losers' allergies / conditions
+
+
+def merge_patients(pairs, user=None, chunk_size=CHUNK_SIZE):
+    """
+    Merge ``[(survivor_id, loser_id), ...]``. Each chunk is one transaction,
+    so a long batch that failed half-way can simply be re-run: pairs merged
+    already are skipped. Returns the number of patients merged away.
+    """
+    mapping = validate_pairs(pairs)
+    items = list(mapping.items())
+    for start in range(0, len(items), chunk_size):
+        with transaction.atomic():
+            _merge_chunk(dict(items[start:start + chunk_size]), user)
+    return len(items)
+
+
+def resolve_merged(patient_id=None, mrn=None):
+    """Survivor id for a merged-away patient id or MRN, or None."""
+    lookup = {'merged_patient_id': patient_id} if patient_id is not None else {'merged_mrn': mrn}
+    return PatientMergeTombstone.objects.filter(**lookup).values_list('survivor_id', flat=True).first()
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# Frozen copy of the search structure as this migration created it; later
+# changes to patients.search must not alter what this migration did.
+SEARCH_TABLE = 'patients_patient_search'
+PG_INDEX = 'patients_patient_search_trgm'
+PG_DOCUMENT = (
+    "lower(coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || mrn || ' ' "
+    "|| coalesce(phone, '') || ' ' || coalesce(emergency_contact_name, '') || ' ' "
+    "|| coalesce(emergency_contact_phone, ''))"
+)
+CHUNK_SIZE = 5000
+
+
+def _with_digits(value):
+    value = value or ''
+    digits = ''.join(ch for ch in value if ch.isdigit())
+    return f'{value} {digits}' if digits and digits != value else value
+
+
+def _document(first_name, last_name, mrn, phone, contact_name, contact_phone):
+    return (
+        f'{first_name or ""} {last_name or ""}'.strip(),
+        mrn or '',
+        _with_digits(phone),
+        f'{contact_name or ""} {_with_digits(contact_phone)}'.strip(),
+    )
+
+
+def create_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                    "name, mrn, phone, contact, updated_at UNINDEXED, tokenize='trigram')"
+                )
+            except Exception:
+                return  # SQLite without FTS5/trigram: search falls back to icontains
+            last_id = 0
+            while True:
+                cursor.execute(
+                    "SELECT id, first_name, last_name, mrn, phone, emergency_contact_name, "
+                    "emergency_contact_phone, updated_at FROM patients_patient "
+                    "WHERE id > %s ORDER BY id LIMIT %s",
+                    [last_id, CHUNK_SIZE],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, name, mrn, phone, contact, updated_at) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)",
+                    [(row[0], *_document(*row[1:7]), str(row[7])) for row in rows],
+                )
+                last_id = rows[-1][0]
+    elif conn.vendor == 'postgresql':
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON patients_patient "
+                f"USING gin (({PG_DOCUMENT}) gin_trgm_ops)"
+            )
+
+
+def drop_index(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_patient_version'),
+    ]
+
+    operations = [
+        # FTS5 trigram table on SQLite, pg_trgm GIN index on PostgreSQL
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0007_patient_dob_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientBlockingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('phone', 'Normalized phone'), ('dob_last', 'DOB + surname Soundex'), ('dob_first', 'DOB + first name Soundex'), ('names', 'Both names Soundex')], max_length=10)),
+                ('key', models.CharField(max_length=40)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking_keys', to='patients.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'key'], name='patient_blocking_key_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PatientDuplicate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('reasons', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('merged', 'Merged'), ('dismissed', 'Not a duplicate')], default='open', max_length=10)),
+                ('detected_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('patient_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='patients.patient')),
+                ('patient_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='patients.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', '-score'], name='patient_duplicate_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('patient_a', 'patient_b'), name='unique_patient_duplicate_pair')],
+            },
+        ),
+    ]
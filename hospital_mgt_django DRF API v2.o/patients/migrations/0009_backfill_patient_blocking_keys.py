@@ -0,0 +1,76 @@
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+# Frozen copy of the blocking keys as patients.linkage defined them when this
+# migration was written, so later changes there don't rewrite history.
+KEY_FIELDS = ('first_name', 'last_name', 'date_of_birth', 'phone')
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def soundex(name):
+    letters = [ch for ch in (name or '').lower() if ch.isalpha()]
+    if not letters:
+        return ''
+    code, previous = letters[0].upper(), _SOUNDEX_CODES.get(letters[0], '')
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def blocking_keys(first_name, last_name, date_of_birth, phone):
+    first, last = soundex(first_name), soundex(last_name)
+    digits = ''.join(ch for ch in phone or '' if ch.isdigit())
+    keys = []
+    if len(digits) >= 7:
+        keys.append(('phone', digits[-9:]))
+    if date_of_birth and last:
+        keys.append(('dob_last', f'{date_of_birth.isoformat()}:{last}'))
+    if date_of_birth and first:
+        keys.append(('dob_first', f'{date_of_birth.isoformat()}:{first}'))
+    if first and last:
+        keys.append(('names', ':'.join(sorted((first, last)))))
+    return keys
+
+
+def backfill(apps, schema_editor):
+    Patient = apps.get_model('patients', 'Patient')
+    PatientBlockingKey = apps.get_model('patients', 'PatientBlockingKey')
+    last_id = 0
+    while True:
+        rows = list(
+            Patient.objects.filter(id__gt=last_id).order_by('id').values('id', *KEY_FIELDS)[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        PatientBlockingKey.objects.bulk_create([
+            PatientBlockingKey(patient_id=row['id'], kind=kind, key=key)
+            for row in rows
+            for kind, key in blocking_keys(**{f: row[f] for f in KEY_FIELDS})
+        ])
+        last_id = rows[-1]['id']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0008_patient_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0009_backfill_patient_blocking_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patientduplicate',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('dismissed', 'Not a duplicate')], default='open', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='PatientMergeTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merged_patient_id', models.PositiveIntegerField(unique=True)),
+                ('merged_mrn', models.CharField(max_length=50, unique=True)),
+                ('merged_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('details', models.JSONField(default=dict)),
+                ('merged_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('survivor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merge_tombstones', to='patients.patient')),
+            ],
+        ),
+    ]
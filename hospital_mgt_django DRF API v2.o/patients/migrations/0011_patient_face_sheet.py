@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0010_patient_merge_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientFaceSheet',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='face_sheet', serialize=False, to='patients.patient')),
+                ('data', models.JSONField()),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
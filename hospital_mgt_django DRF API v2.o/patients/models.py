@@ -1,21 +1,30 @@
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
+from identifiers.allocator import next_identifier, register_sequence
+from core.etag import VersionedModelMixin
 
 User = settings.AUTH_USER_MODEL
 
+def _mrn_seed():
+    # continue above the highest "MRN<digits>" already issued
+    numbers = [
+        int(mrn[3:]) for mrn in Patient.objects.filter(mrn__regex=r'^MRN[0-9]+$').values_list('mrn', flat=True)
+    ]
+    return max(numbers) + 1 if numbers else 100001
+
+
+register_sequence('mrn', prefix='MRN', width=6, seed=_mrn_seed)
+
+
 def generate_mrn():
-    last_patient = Patient.objects.order_by("id").last()
-    if not last_patient:
-        return "MRN100001"  # Starting point if no patient exists yet
-    
-    last_id = last_patient.id
-    new_id = last_id + 1
-    return f"MRN{new_id:06d}"
+    # block-allocated from the 'mrn' sequence: no query per call, no duplicates under concurrency
+    return next_identifier('mrn')
 
 
-class Patient(models.Model):
+class Patient(VersionedModelMixin, models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
         ('F', 'Female'),
@@ -62,10 +71,23 @@ class Patient(models.Model):
     )
     insurance = models.CharField(max_length=100, blank=True, null=True)
     discharged_time = models.DateTimeField(blank=True, null=True)
+    # bumped on any write to the patient or its medical history (ETag)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # age filters / age bands are date_of_birth range scans
+            models.Index(fields=['date_of_birth'], name='patient_dob_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    @classmethod
+    def touch(cls, ids):
+        """Bump the version of the given patient ids (a list or a values() subquery)."""
+        cls.objects.filter(pk__in=ids).update(version=F('version') + 1)
+
     
     from django.utils import timezone
 
@@ -73,7 +95,7 @@ class Patient(models.Model):
     def age(self):
         if not self.date_of_birth:
             return None
-        today = timezone.now().date()
+        today = timezone.localdate()
         dob = self.date_of_birth
         return max(0, relativedelta(today, dob).years)
     
@@ -134,4 +156,91 @@ class FamilyHistory(models.Model):
     notes = models.TextField(blank=True, null=True)
 
     def __str__(self):
-        return f"{self.patient} - {self.relative}: {self.condition}"
\ No newline at end of file
+        return f"{self.patient} - {self.relative}: {self.condition}"
+
+# -----------------------------
+# FACE SHEETS (see patients/facesheets.py)
+# -----------------------------
+
+class PatientFaceSheet(models.Model):
+    """
+    Compact header shown on queue cards and ward lists: identity, allergies
+    and active chronic conditions. Rewritten by signals whenever one of those
+    changes; ``age`` is computed when served.
+    """
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE, primary_key=True, related_name='face_sheet')
+    data = models.JSONField()
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Face sheet of {self.patient_id}"
+
+
+# -----------------------------
+# DUPLICATE DETECTION (see patients/linkage.py)
+# -----------------------------
+
+class PatientBlockingKey(models.Model):
+    """
+    Precomputed record-linkage key (phone, DOB + phonetic name, ...). Patients
+    sharing a key are the only ones compared with each other.
+    """
+    KIND_CHOICES = (
+        ('phone', 'Normalized phone'),
+        ('dob_last', 'DOB + surname Soundex'),
+        ('dob_first', 'DOB + first name Soundex'),
+        ('names', 'Both names Soundex'),
+    )
+
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='blocking_keys')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=40)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'key'], name='patient_blocking_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.patient_id} {self.kind}={self.key}"
+
+
+class PatientDuplicate(models.Model):
+    """A scored pair of probably-identical patients found by the batch scan."""
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        ('dismissed', 'Not a duplicate'),
+    )
+
+    # always stored with patient_a_id < patient_b_id
+    patient_a = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='+')
+    patient_b = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    reasons = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    detected_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['patient_a', 'patient_b'], name='unique_patient_duplicate_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-score'], name='patient_duplicate_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.patient_a_id} ~ {self.patient_b_id} ({self.score:.2f}, {self.status})"
+
+
+class PatientMergeTombstone(models.Model):
+    """Left behind by a merged-away patient; old ids and MRNs redirect to the survivor."""
+    merged_patient_id = models.PositiveIntegerField(unique=True)
+    merged_mrn = models.CharField(max_length=50, unique=True)
+    survivor = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='merge_tombstones')
+    merged_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    merged_at = models.DateTimeField(default=timezone.now)
+    # identity of the merged record at the time of the merge
+    details = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.merged_mrn} -> {self.survivor_id}"
@@ -0,0 +1,268 @@
+# patients/search.py
+"""
+Indexed patient search (name, MRN, phone, emergency contact).
+
+SQLite: an FTS5 table with the ``trigram`` tokenizer, one row per patient
+(``rowid`` = patient id), kept in sync by signals. Every query term of three or
+more characters matches as a substring, which gives prefix matching on names,
+MRNs and phone digits. A lookup first asks for documents containing *all*
+terms, ranked by ``bm25``. Only if nothing matches does it fall back to a
+typo-tolerant pass over the alphabetic terms: each must share its leading or
+trailing trigrams with the document, and the candidates are re-ranked by
+trigram similarity.
+
+PostgreSQL: a ``pg_trgm`` GIN index on the same document expression, queried
+with ``word_similarity`` (the index is maintained by the database itself).
+
+Anything else (or SQLite built without FTS5) falls back to ``icontains``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_TABLE = 'patients_patient_search'
+PG_INDEX = 'patients_patient_search_trgm'
+# document expression for the pg_trgm index; queries must repeat it verbatim
+PG_DOCUMENT = (
+    "lower(coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || mrn || ' ' "
+    "|| coalesce(phone, '') || ' ' || coalesce(emergency_contact_name, '') || ' ' "
+    "|| coalesce(emergency_contact_phone, ''))"
+)
+# bm25 column weights: name, mrn, phone, contact
+FTS_WEIGHTS = (10.0, 8.0, 5.0, 1.0)
+FUZZY_MIN_SIMILARITY = 0.3
+# hits examined per query; very broad queries ("kamau") are ranked within the
+# first RANK_WINDOW matches so a lookup stays bounded on a million-row table
+RANK_WINDOW = 1000
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_SELECT_DOCUMENTS = (
+    "SELECT id, first_name, last_name, mrn, phone, emergency_contact_name, "
+    "emergency_contact_phone, updated_at FROM patients_patient"
+)
+
+
+# -----------------------------
+# INDEX MAINTENANCE
+# -----------------------------
+
+def _digits(value):
+    return ''.join(ch for ch in value or '' if ch.isdigit())
+
+
+def _with_digits(value):
+    # "+254 712-345" is indexed as typed and as bare digits, so either form matches
+    value = value or ''
+    digits = _digits(value)
+    return f'{value} {digits}' if digits and digits != value else value
+
+
+def document(first_name, last_name, mrn, phone, contact_name, contact_phone):
+    """Column values stored in the FTS table for one patient."""
+    return (
+        f'{first_name or ""} {last_name or ""}'.strip(),
+        mrn or '',
+        _with_digits(phone),
+        f'{contact_name or ""} {_with_digits(contact_phone)}'.strip(),
+    )
+
+
+_fts_tables = {}  # (alias, database name) -> whether the FTS table exists
+
+
+def fts_enabled(conn=None):
+    """Whether ``conn`` has the FTS table; introspected once per database."""
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return False
+    key = (conn.alias, conn.settings_dict['NAME'])
+    if key not in _fts_tables:
+        _fts_tables[key] = SEARCH_TABLE in conn.introspection.table_names()
+    return _fts_tables[key]
+
+
+def forget_fts_tables():
+    """Introspect again on the next lookup (after migrations created or dropped the table)."""
+    _fts_tables.clear()
+
+
+def _write_rows(cursor, rows):
+    """``rows`` = [(id, first, last, mrn, phone, contact_name, contact_phone, updated_at)]"""
+    if not rows:
+        return
+    cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+    cursor.executemany(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, name, mrn, phone, contact, updated_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        [(row[0], *document(*row[1:7]), str(row[7])) for row in rows],
+    )
+
+
+def index_patients(patients):
+    """Insert or refresh the index rows of ``patients`` (model instances)."""
+    if not fts_enabled():
+        return
+    rows = [
+        (p.pk, p.first_name, p.last_name, p.mrn, p.phone,
+         p.emergency_contact_name, p.emergency_contact_phone,
+         # same text the raw column reads back as, so sync_index sees it as current
+         connection.ops.adapt_datetimefield_value(p.updated_at))
+        for p in patients
+    ]
+    with connection.cursor() as cursor:
+        _write_rows(cursor, rows)
+
+
+def unindex_patients(ids):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in ids])
+
+
+def sync_index(chunk_size=5000, full=False, conn=None):
+    """
+    Bring the FTS table in line with ``patients_patient``, walking both in id
+    order one chunk at a time. Only missing or outdated rows (``updated_at``
+    differs) are rewritten unless ``full``; rows of deleted patients are
+    dropped. Returns ``(written, removed)``.
+    """
+    conn = conn or connection
+    if not fts_enabled(conn):
+        return 0, 0
+
+    written = removed = 0
+    last_id = 0
+    with conn.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f"{_SELECT_DOCUMENTS} WHERE id > %s ORDER BY id LIMIT %s", [last_id, chunk_size]
+            )
+            patients = cursor.fetchall()
+            upper = patients[-1][0] if patients else None
+
+            range_sql = "rowid > %s" + (" AND rowid <= %s" if upper is not None else "")
+            params = [last_id] + ([upper] if upper is not None else [])
+            cursor.execute(f"SELECT rowid, updated_at FROM {SEARCH_TABLE} WHERE {range_sql}", params)
+            indexed = dict(cursor.fetchall())
+
+            stale = [row for row in patients if full or indexed.get(row[0]) != str(row[7])]
+            _write_rows(cursor, stale)
+            written += len(stale)
+
+            orphans = indexed.keys() - {row[0] for row in patients}
+            cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in orphans])
+            removed += len(orphans)
+
+            if upper is None:
+                return written, removed
+            last_id = upper
+
+
+# -----------------------------
+# QUERYING
+# -----------------------------
+
+def _tokens(query):
+    return TOKEN_RE.findall((query or '').lower())
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _similarity(tokens, text):
+    """Mean over query tokens of the best trigram Jaccard against any document word."""
+    words = [_trigrams(word) for word in TOKEN_RE.findall(text.lower())]
+    words = [w for w in words if w]
+    if not words:
+        return 0.0
+    total = 0.0
+    for token in tokens:
+        grams = _trigrams(token)
+        total += max(len(grams & w) / len(grams | w) for w in words) if grams else 0.0
+    return total / len(tokens)
+
+
+def _fuzzy_term(token):
+    # a single typo leaves the leading or the trailing part of the word intact
+    size = max(3, len(token) // 2)
+    return f'({_quote(token[:size])} OR {_quote(token[-size:])})'
+
+
+def _fts_search(tokens, limit):
+    long_tokens = [t for t in tokens if len(t) >= 3]
+    short_tokens = [t for t in tokens if len(t) < 3]
+    if not long_tokens:
+        return []
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+
+    def run(match):
+        # no ORDER BY: FTS5 stops after RANK_WINDOW hits instead of scoring every match
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, name || ' ' || mrn || ' ' || phone || ' ' || contact, "
+                f"bm25({SEARCH_TABLE}, {weights}) "
+                f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT %s",
+                [match, RANK_WINDOW],
+            )
+            return cursor.fetchall()
+
+    def short_ok(text):
+        # 1-2 letter terms (initials) can't use trigrams; require them as word prefixes
+        words = TOKEN_RE.findall(text.lower())
+        return all(any(w.startswith(t) for w in words) for t in short_tokens)
+
+    # 1️⃣ every term present (substring/prefix), best bm25 first
+    rows = [row for row in run(' AND '.join(_quote(t) for t in long_tokens)) if short_ok(row[1])]
+    if rows:
+        return [pk for pk, _, _ in sorted(rows, key=lambda row: row[2])[:limit]]
+
+    # 2️⃣ nothing matched exactly: likely a typo in a name (numbers are matched exactly)
+    fuzzy_tokens = [t for t in long_tokens if t.isalpha()]
+    if not fuzzy_tokens:
+        return []
+    rows = run(' AND '.join(_fuzzy_term(t) for t in fuzzy_tokens))
+    scored = sorted(
+        ((-score, rank, pk) for pk, text, rank in rows
+         if short_ok(text) and (score := _similarity(fuzzy_tokens, text)) >= FUZZY_MIN_SIMILARITY),
+    )
+    return [pk for _, _, pk in scored[:limit]]
+
+
+def _pg_search(query, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM patients_patient WHERE %s <%% {PG_DOCUMENT} "
+            f"ORDER BY word_similarity(%s, {PG_DOCUMENT}) DESC, id LIMIT %s",
+            [query.lower(), query.lower(), limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_patient_ids(query, limit=50):
+    """Return up to ``limit`` patient ids best matching ``query``, best first."""
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    if fts_enabled():
+        return _fts_search(tokens, limit)
+    if connection.vendor == 'postgresql':
+        return _pg_search(' '.join(tokens), limit)
+
+    from .models import Patient
+
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(first_name__icontains=token) | Q(last_name__icontains=token) | Q(mrn__icontains=token)
+            | Q(phone__icontains=token) | Q(emergency_contact_name__icontains=token)
+            | Q(emergency_contact_phone__icontains=token)
+        )
+    return list(Patient.objects.filter(condition).order_by('last_name', 'id').values_list('id', flat=True)[:limit])
@@ -182,4 +182,50 @@ class PatientSerializer(serializers.ModelSerializer):
             'surgical_history',
             'family_history',
         ]
-        read_only_fields = ['mrn', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['mrn', 'created_at', 'updated_at']
+
+
+# 🔹 4. Patient List Serializer – flat registry row
+#    Expects the last_visit_* annotations added by PatientViewSet for the list action.
+class PatientListSerializer(serializers.ModelSerializer):
+    age = serializers.ReadOnlyField()
+    last_visit = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Patient
+        fields = [
+            'id',
+            'mrn',
+            'first_name',
+            'last_name',
+            'age',
+            'gender',
+            'phone',
+            'email',
+            'mode_of_payment',
+            'last_visit',
+        ]
+        read_only_fields = fields
+
+    def get_last_visit(self, obj):
+        if getattr(obj, 'last_visit_id', None) is None:
+            return None
+        return {
+            'id': obj.last_visit_id,
+            'start_time': serializers.DateTimeField().to_representation(obj.last_visit_start),
+            'status': obj.last_visit_status,
+        }
+
+
+# 🔹 5. Possible Duplicates Serializer – registration form fields to match on
+class PossibleDuplicatesSerializer(serializers.Serializer):
+    first_name = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=100)
+    last_name = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=100)
+    date_of_birth = serializers.DateField(required=False, allow_null=True)
+    phone = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=20)
+    gender = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=1)
+
+    def validate(self, attrs):
+        if not (attrs.get('first_name') or attrs.get('last_name') or attrs.get('phone')):
+            raise serializers.ValidationError("Provide at least a name or a phone number.")
+        return attrs
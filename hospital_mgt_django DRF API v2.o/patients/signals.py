@@ -0,0 +1,93 @@
+# patients/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Patient,
+    ChronicCondition,
+    Medication,
+    Allergy,
+    SurgicalHistory,
+    FamilyHistory,
+)
+from .facesheets import refresh_face_sheets
+from .linkage import refresh_keys
+from .search import forget_fts_tables, index_patients, unindex_patients
+
+# medical history rendered inside the patient detail; any write bumps Patient.version
+PATIENT_CHILDREN = (ChronicCondition, Allergy, SurgicalHistory, FamilyHistory)
+
+
+# 🔹 Patient versioning (ETag)
+@receiver(post_save, sender=Patient)
+def bump_patient_version(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    Patient.touch([instance.pk])
+
+
+def bump_parent_patient_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    Patient.touch([instance.patient_id])
+
+
+for _model in PATIENT_CHILDREN:
+    post_save.connect(bump_parent_patient_version, sender=_model, dispatch_uid=f'patient-version-save-{_model.__name__}')
+    post_delete.connect(bump_parent_patient_version, sender=_model, dispatch_uid=f'patient-version-delete-{_model.__name__}')
+
+
+@receiver([post_save, post_delete], sender=Medication)
+def bump_medication_patient_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    Patient.touch(
+        ChronicCondition.objects.filter(pk=instance.chronic_condition_id).values('patient_id')
+    )
+
+
+# 🔹 Search index
+@receiver(post_save, sender=Patient)
+def index_patient(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_patients([instance])
+
+
+@receiver(post_delete, sender=Patient)
+def unindex_patient(sender, instance, **kwargs):
+    unindex_patients([instance.pk])
+
+
+@receiver(post_migrate)
+def forget_search_tables(sender, **kwargs):
+    # the search migration may have just created (or dropped) the FTS table
+    forget_fts_tables()
+
+
+# 🔹 Duplicate detection blocking keys
+@receiver(post_save, sender=Patient)
+def refresh_blocking_keys(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_keys([instance])
+
+
+# 🔹 Face sheets (queue / ward header)
+@receiver(post_save, sender=Patient)
+def refresh_patient_face_sheet(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_face_sheets([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Allergy)
+@receiver([post_save, post_delete], sender=ChronicCondition)
+def refresh_parent_face_sheet(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # after commit: when the patient itself is being deleted, its history goes
+    # first and an immediate rebuild would re-create the row being removed
+    patient_id = instance.patient_id
+    transaction.on_commit(lambda: refresh_face_sheets([patient_id]))
@@ -1,3 +1,627 @@
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from users.models import User
+from queues.models import Que
+from visits.models import Diagnosis, Note, Visit, VitalSigns
+from .models import (
+    Allergy, ChronicCondition, FamilyHistory, Medication, Patient, PatientBlockingKey, PatientDuplicate, PatientFaceSheet,
+    SurgicalHistory,
+)
+from .importer import _insert_chunk
+from .linkage import POSSIBLE_DUPLICATE_SCORE, normalize_phone, score_pair, soundex
+from .search import forget_fts_tables, fts_enabled
+
+
+class PatientETagTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('etag.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Etag', date_of_birth='1990-01-01', gender='F')
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(f'/api/patients/{self.patient.pk}/', headers=headers)
+
+    def test_stale_instance_save_changes_etag(self):
+        stale = Patient.objects.get(pk=self.patient.pk)
+        Patient.touch([self.patient.pk])
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+        stale.notes = 'edited from an old copy'
+        stale.save()
+
+        self.assertGreater(Patient.objects.get(pk=self.patient.pk).version, 2)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_non_numeric_id_is_404(self):
+        self.assertEqual(self.client.get('/api/patients/abc/').status_code, 404)
+        self.assertEqual(self.client.get('/api/patients/abc/timeline/').status_code, 404)
+
+
+class PatientMergeTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('merge.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.survivor = Patient.objects.create(first_name='Ada', last_name='Merge', date_of_birth='1990-01-01', gender='F')
+        self.loser = Patient.objects.create(first_name='Adah', last_name='Merge', date_of_birth='1990-01-01', gender='F')
+
+    def merge(self, pk, patients):
+        return self.client.post(f'/api/patients/{pk}/merge/', {'patients': patients}, format='json')
+
+    def test_merged_id_redirects_to_survivor(self):
+        self.assertEqual(self.merge(self.survivor.pk, [self.loser.pk]).status_code, 200)
+        self.assertFalse(Patient.objects.filter(pk=self.loser.pk).exists())
+
+        response = self.client.get(f'/api/patients/{self.loser.pk}/')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response.json()['survivor'], self.survivor.pk)
+        self.assertEqual(self.client.get('/api/patients/999999/').status_code, 404)
+
+    def test_existing_patient_skips_tombstones(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(f'/api/patients/{self.survivor.pk}/').status_code, 200)
+        self.assertFalse([q for q in queries if 'tombstone' in q['sql'].lower()])
+
+    def test_non_numeric_ids_are_404(self):
+        self.assertEqual(self.client.get('/api/patients/abc/possible-duplicates/').status_code, 404)
+        self.assertEqual(self.merge('abc', [self.loser.pk]).status_code, 404)
+
+    def test_boolean_loser_ids_are_rejected(self):
+        self.assertEqual(self.merge(self.survivor.pk, [True]).status_code, 400)
+
+
+class PatientRegistryTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('registry.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Registry', date_of_birth='1990-01-01',
+                                              gender='F', phone='0700111222')
+        self.newcomer = Patient.objects.create(first_name='Bea', last_name='Registry', date_of_birth='1990-01-01',
+                                               gender='F')
+
+    def rows(self):
+        response = self.client.get('/api/patients/')
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row for row in response.json()['results']}
+
+    def test_flat_row_with_latest_visit(self):
+        start = timezone.now() - datetime.timedelta(days=3)
+        Visit.objects.create(patient=self.patient, start_time=start, status='completed')
+        latest = Visit.objects.create(patient=self.patient, start_time=start + datetime.timedelta(days=2),
+                                      status='in_progress')
+        Visit.objects.create(patient=self.patient, start_time=start + datetime.timedelta(days=1))
+
+        row = self.rows()[self.patient.pk]
+        self.assertEqual(set(row), {'id', 'mrn', 'first_name', 'last_name', 'age', 'gender', 'phone', 'email',
+                                    'mode_of_payment', 'last_visit'})
+        self.assertEqual(row['last_visit'], {
+            'id': latest.pk,
+            'start_time': serializers.DateTimeField().to_representation(latest.start_time),
+            'status': 'in_progress',
+        })
+        self.assertEqual((row['mrn'], row['phone'], row['age']), (self.patient.mrn, '0700111222', Patient.objects.get(pk=self.patient.pk).age))
+
+    def test_latest_visit_ties_break_on_id(self):
+        start = timezone.now()
+        Visit.objects.create(patient=self.patient, start_time=start)
+        second = Visit.objects.create(patient=self.patient, start_time=start)
+        self.assertEqual(self.rows()[self.patient.pk]['last_visit']['id'], second.pk)
+
+    def test_patient_without_visits(self):
+        self.assertIsNone(self.rows()[self.newcomer.pk]['last_visit'])
+
+
+class FaceSheetTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('facesheet.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Sheet', date_of_birth='1990-01-01', gender='F')
+
+    def post(self, body):
+        return self.client.post('/api/patients/face-sheets/', body, format='json')
+
+    def test_post_ids(self):
+        response = self.post({'ids': [self.patient.pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_malformed_bodies_are_400(self):
+        for body in ([self.patient.pk], {'ids': str(self.patient.pk)}, {'ids': 5}):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+    def stored(self):
+        return PatientFaceSheet.objects.get(patient=self.patient).data
+
+    def test_allergy_save_refreshes_sheet(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Allergy.objects.create(patient=self.patient, allergen='Penicillin', severity='Severe', reaction='Rash')
+        self.assertEqual(self.stored()['allergies'], [{'allergen': 'Penicillin', 'severity': 'Severe'}])
+
+    def test_chronic_condition_save_refreshes_sheet(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            condition = ChronicCondition.objects.create(
+                patient=self.patient, condition='Asthma', diagnosed_date='2010-05-01'
+            )
+        self.assertEqual(self.stored()['chronic_conditions'], ['Asthma'])
+
+        # inactive conditions drop off the header
+        condition.active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            condition.save()
+        self.assertEqual(self.stored()['chronic_conditions'], [])
+
+    def test_get_ids_keeps_order_and_skips_unknown(self):
+        other = Patient.objects.create(first_name='Bo', last_name='Sheet', date_of_birth='1985-06-15', gender='M')
+        response = self.client.get(f'/api/patients/face-sheets/?ids={other.pk},999999,{self.patient.pk}')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([sheet['id'] for sheet in results], [other.pk, self.patient.pk])
+        self.assertEqual(results[1]['full_name'], 'Ada Sheet')
+        self.assertEqual(results[1]['age'], Patient.objects.get(pk=self.patient.pk).age)
+
+    def test_missing_sheet_is_built_on_read(self):
+        PatientFaceSheet.objects.filter(patient=self.patient).delete()
+        response = self.post({'ids': [self.patient.pk]})
+        self.assertEqual(response.json()['results'][0]['mrn'], self.patient.mrn)
+        self.assertTrue(PatientFaceSheet.objects.filter(patient=self.patient).exists())
+
+    def test_id_limit(self):
+        self.assertEqual(self.post({'ids': list(range(1, 501))}).status_code, 200)
+        self.assertEqual(self.post({'ids': list(range(1, 502))}).status_code, 400)
+        self.assertEqual(self.post({'ids': []}).status_code, 400)
+        self.assertEqual(self.client.get('/api/patients/face-sheets/').status_code, 400)
+
+
+class PatientImportTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('import.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def record(self, n, **fields):
+        return {'first_name': f'Imp{n}', 'last_name': 'Ort', 'date_of_birth': '1980-02-03', 'gender': 'F', **fields}
+
+    def ndjson(self, *lines):
+        return '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines) + '\n'
+
+    def upload(self, content, name='patients.ndjson', **params):
+        upload = SimpleUploadedFile(name, content if isinstance(content, bytes) else content.encode())
+        query = f"?{'&'.join(f'{k}={v}' for k, v in params.items())}" if params else ''
+        return self.client.post(f'/api/patients/import/{query}', {'file': upload}, format='multipart')
+
+    def write(self, content, name='patients.ndjson'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+        return path
+
+    def test_ndjson_with_history(self):
+        condition = {'condition': 'Diabetes', 'diagnosed_date': '2015-01-01',
+                     'medications': [{'name': 'Metformin', 'dosage': '500mg', 'frequency': 'BD',
+                                      'start_date': '2015-01-02'}]}
+        response = self.upload(self.ndjson(self.record(1, allergies=[{'allergen': 'Latex', 'severity': 'Mild',
+                                                                     'reaction': 'Itch'}],
+                                                       chronic_conditions=[condition]),
+                                           self.record(2, _legacy_id='X9')))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['imported'], response.data['failed'], response.data['errors']), (2, 0, []))
+
+        patient = Patient.objects.get(first_name='Imp1')
+        self.assertTrue(patient.mrn)
+        self.assertEqual(patient.created_by, self.doctor)
+        self.assertEqual(list(patient.allergies.values_list('allergen', flat=True)), ['Latex'])
+        self.assertEqual(Medication.objects.get(chronic_condition__patient=patient).name, 'Metformin')
+        self.assertEqual(PatientFaceSheet.objects.get(patient=patient).data['chronic_conditions'], ['Diabetes'])
+        self.assertNotEqual(Patient.objects.get(first_name='Imp2').mrn, patient.mrn)
+
+    def test_rejects_are_reported_per_line(self):
+        response = self.upload(self.ndjson(
+            self.record(1),
+            'not json',
+            self.record(3, gender='Q'),
+            self.record(4, chronic_conditions=[{'condition': 'Asthma', 'diagnosed_date': '2010-01-01',
+                                                'medications': 5}]),
+            self.record(5, allergies={'allergen': 'Latex'}),
+            '[1, 2]',
+            self.record(7),
+        ))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['read'], response.data['imported'], response.data['failed']), (7, 2, 5))
+        errors = {entry['_line']: entry['_errors'] for entry in response.data['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6])
+        self.assertIn('gender', errors[3])
+        self.assertEqual(errors[4]['chronic_conditions'], {'0': {'medications': ['Must be a list of objects.']}})
+        self.assertEqual(errors[5]['allergies'], ['Must be a list of objects.'])
+        self.assertEqual(set(Patient.objects.values_list('first_name', flat=True)), {'Imp1', 'Imp7'})
+
+    def test_csv_with_json_history_cells(self):
+        content = (
+            'first_name,last_name,date_of_birth,gender,phone,allergies\n'
+            'Cee,Esv,1970-05-06,M,,"[{""allergen"": ""Nuts"", ""severity"": ""Severe"", ""reaction"": ""Swelling""}]"\n'
+        )
+        response = self.upload(content, name='patients.csv')
+        self.assertEqual(response.data['imported'], 1, response.content)
+        patient = Patient.objects.get(first_name='Cee')
+        self.assertIsNone(patient.phone)
+        self.assertEqual(patient.allergies.get().allergen, 'Nuts')
+
+    def test_start_after_skips_lines(self):
+        response = self.upload(self.ndjson(self.record(1), self.record(2), self.record(3)), start_after=2)
+        self.assertEqual((response.data['read'], response.data['imported']), (1, 1))
+        self.assertEqual(list(Patient.objects.values_list('first_name', flat=True)), ['Imp3'])
+
+    def test_bad_requests_are_400(self):
+        self.assertEqual(self.client.post('/api/patients/import/', {}, format='multipart').status_code, 400)
+        self.assertEqual(self.upload(self.ndjson(self.record(1)), start_after='x').status_code, 400)
+        self.assertEqual(self.upload(self.ndjson(self.record(1)), start_after='\u00b2').status_code, 400)
+        self.assertFalse(Patient.objects.exists())
+
+    def test_non_utf8_upload_is_400(self):
+        response = self.upload(self.ndjson(self.record(1)).encode() + 'Zoë'.encode('latin-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data['imported'], response.data['start_after']), (0, 0))
+
+    def test_command_writes_error_report(self):
+        path = self.write(self.ndjson(self.record(1), self.record(2, gender='Q'), self.record(3)))
+        call_command('import_patients', path, chunk_size=2, stdout=io.StringIO())
+        self.assertEqual(Patient.objects.count(), 2)
+        with open(f'{path}.errors.ndjson', encoding='utf-8') as handle:
+            report = [json.loads(line) for line in handle]
+        self.assertEqual([(entry['_line'], entry['first_name']) for entry in report], [(2, 'Imp2')])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_command_resumes_after_failed_chunk(self):
+        path = self.write(self.ndjson(*(self.record(n) for n in range(1, 6))))
+        calls = []
+
+        def fail_second_chunk(rows, user):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return _insert_chunk(rows, user)
+
+        with mock.patch('patients.importer._insert_chunk', side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                call_command('import_patients', path, chunk_size=2, stdout=io.StringIO())
+        with open(f'{path}.checkpoint') as handle:
+            self.assertEqual(handle.read(), '2')
+
+        out = io.StringIO()
+        call_command('import_patients', path, chunk_size=2, resume=True, stdout=out)
+        self.assertIn('Resuming after line 2', out.getvalue())
+        self.assertEqual(sorted(Patient.objects.values_list('first_name', flat=True)),
+                         [f'Imp{n}' for n in range(1, 6)])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_command_rejects_non_utf8_file(self):
+        path = os.path.join(self.tmp, 'latin.ndjson')
+        with open(path, 'wb') as handle:
+            handle.write(self.ndjson(self.record(1)).encode() + 'Zoë'.encode('latin-1'))
+        with self.assertRaisesMessage(CommandError, 'UTF-8'):
+            call_command('import_patients', path, stdout=io.StringIO())
+
+
+class PatientDuplicateTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('dupes.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.grace = Patient.objects.create(first_name='Grace', last_name='Wanjiku', date_of_birth='1985-04-12',
+                                            gender='F', phone='+254 712 345 678')
+
+    def person(self, **fields):
+        return {'first_name': 'Grace', 'last_name': 'Wanjiku', 'date_of_birth': '1985-04-12', 'gender': 'F',
+                'phone': None, **fields}
+
+    def check(self, **fields):
+        return self.client.post('/api/patients/possible-duplicates/', self.person(**fields), format='json')
+
+    def test_blocking_keys(self):
+        self.assertEqual([soundex(n) for n in ('Robert', 'Rupert', 'Ashcraft', 'Tymczak', '42')],
+                         ['R163', 'R163', 'A261', 'T522', ''])
+        self.assertEqual(normalize_phone('0712-345-678'), normalize_phone('+254712345678'))
+        self.assertEqual(normalize_phone('12345'), '')
+        self.assertEqual(set(self.grace.blocking_keys.values_list('kind', 'key')), {
+            ('phone', '712345678'),
+            ('dob_last', '1985-04-12:W522'),
+            ('dob_first', '1985-04-12:G620'),
+            ('names', 'G620:W522'),
+        })
+        self.grace.phone = ''
+        self.grace.save()
+        self.assertFalse(self.grace.blocking_keys.filter(kind='phone').exists())
+
+    def test_scores_and_reasons(self):
+        self.assertEqual(score_pair(self.person(phone='0712345678'), self.person(phone='+254712345678')),
+                         (1.0, ['similar name', 'same date of birth', 'same phone']))
+        self.assertEqual(score_pair(self.person(), self.person()), (0.8, ['similar name', 'same date of birth']))
+        # day and month swapped on entry
+        self.assertEqual(score_pair(self.person(), self.person(date_of_birth='1985-12-04')),
+                         (0.74, ['similar name', 'near date of birth']))
+        score, _ = score_pair(self.person(), self.person(first_name='Wanjiku', last_name='Grace'))
+        self.assertGreaterEqual(score, POSSIBLE_DUPLICATE_SCORE)
+        score, _ = score_pair(self.person(), self.person(date_of_birth='1962-07-30'))
+        self.assertLess(score, POSSIBLE_DUPLICATE_SCORE)
+
+    def test_registration_check(self):
+        Patient.objects.create(first_name='Grace', last_name='Wanjiku', date_of_birth='1962-07-30', gender='F')
+        response = self.check(first_name='Grac', phone='0712345678')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([(r['id'], r['reasons']) for r in response.data['results']],
+                         [(self.grace.pk, ['similar name', 'same date of birth', 'same phone'])])
+        self.assertEqual(self.check(first_name='Otieno', last_name='Ouma', date_of_birth='2001-01-01').data['count'], 0)
+
+    def test_invalid_registration_fields_are_400(self):
+        cases = [
+            self.person(first_name=['Grace']),
+            self.person(last_name={'x': 1}),
+            self.person(date_of_birth='12/04/1985'),
+            self.person(date_of_birth='1985-02-30'),
+            {'gender': 'F', 'date_of_birth': '1985-04-12'},
+            ['Grace'],
+        ]
+        for body in cases:
+            with self.subTest(body=body):
+                response = self.client.post('/api/patients/possible-duplicates/', body, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_patient_detail_route(self):
+        twin = Patient.objects.create(first_name='Grace', last_name='Wanjiku', date_of_birth='1985-04-12', gender='F')
+        response = self.client.get(f'/api/patients/{self.grace.pk}/possible-duplicates/')
+        self.assertEqual([r['id'] for r in response.data['results']], [twin.pk])
+        self.assertEqual(self.client.get('/api/patients/999999/possible-duplicates/').status_code, 404)
+
+    def test_find_duplicate_patients_command(self):
+        twin = Patient.objects.create(first_name='Grace', last_name='Wanjku', date_of_birth='1985-04-12', gender='F',
+                                      phone='0712345678')
+        Patient.objects.create(first_name='Otieno', last_name='Ouma', date_of_birth='2001-01-01', gender='M')
+        call_command('find_duplicate_patients', workers=1, stdout=io.StringIO())
+        pair = PatientDuplicate.objects.get()
+        self.assertEqual((pair.patient_a_id, pair.patient_b_id), (self.grace.pk, twin.pk))
+        self.assertIn('same phone', pair.reasons)
+
+        # re-scans keep the reviewer's decision; --rebuild-keys recovers a lost key index
+        PatientDuplicate.objects.update(status='dismissed')
+        PatientBlockingKey.objects.all().delete()
+        call_command('find_duplicate_patients', workers=1, rebuild_keys=True, stdout=io.StringIO())
+        self.assertEqual(PatientDuplicate.objects.get().status, 'dismissed')
+
+
+class PatientTimelineTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('timeline.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Timeline', date_of_birth='1990-01-01',
+                                              gender='F')
+        visit = Visit.objects.create(patient=self.patient)
+        t0 = timezone.now().replace(microsecond=0)
+        hours = lambda n: t0 - datetime.timedelta(hours=n)
+
+        # ties on purpose: same timestamp across types (type asc) and within a type (id desc)
+        v1 = VitalSigns.objects.create(visit=visit, heart_rate=70, recorded_at=hours(1))
+        v2 = VitalSigns.objects.create(visit=visit, heart_rate=72, recorded_at=hours(1))
+        d1 = Diagnosis.objects.create(visit=visit, condition='Malaria', diagnosed_at=hours(1))
+        d2 = Diagnosis.objects.create(visit=visit, condition='Anaemia', diagnosed_at=hours(3))
+        note = Note.objects.create(visit=visit, title='Review', content='Stable')
+        Note.objects.filter(pk=note.pk).update(created_at=hours(2))
+        que = Que.objects.create(visit=visit, department='Triage', arrival_time=hours(4))
+        v3 = VitalSigns.objects.create(visit=visit, heart_rate=90, recorded_at=hours(5))
+
+        other = Patient.objects.create(first_name='Bo', last_name='Timeline', date_of_birth='1990-01-01', gender='M')
+        VitalSigns.objects.create(visit=Visit.objects.create(patient=other), heart_rate=60, recorded_at=hours(1))
+
+        self.expected = [
+            ('diagnoses', d1.pk), ('vitals', v2.pk), ('vitals', v1.pk), ('notes', note.pk),
+            ('diagnoses', d2.pk), ('queue', que.pk), ('vitals', v3.pk),
+        ]
+
+    def get(self, url=None, **params):
+        response = self.client.get(url or f'/api/patients/{self.patient.pk}/timeline/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def entries(self, page):
+        return [(entry['type'], entry['data']['id']) for entry in page['results']]
+
+    def test_sources_merge_newest_first(self):
+        page = self.get()
+        self.assertEqual(self.entries(page), self.expected)
+        self.assertIsNone(page['next'])
+
+    def test_cursor_walk_has_no_gaps_or_duplicates(self):
+        for size in (1, 2, 3):
+            with self.subTest(page_size=size):
+                seen, page = [], self.get(page_size=size)
+                while True:
+                    seen += self.entries(page)
+                    if not page['next']:
+                        break
+                    page = self.get(page['next'])
+                self.assertEqual(seen, self.expected)
+
+    def test_type_filter(self):
+        page = self.get(types='vitals, notes')
+        self.assertEqual(self.entries(page), [e for e in self.expected if e[0] in ('vitals', 'notes')])
+
+    def test_unknown_types_are_400(self):
+        for types in ('bogus', 'vitals,bogus'):
+            with self.subTest(types=types):
+                response = self.client.get(f'/api/patients/{self.patient.pk}/timeline/', {'types': types})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('bogus', response.json()['types'])
+                self.assertIn('vitals', response.json()['types'])
+
+
+class PatientSearchTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('search.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.wanjiru = Patient.objects.create(first_name='Wanjiru', last_name='Kamau', date_of_birth='1990-01-01',
+                                              gender='F', phone='+254 712 345678')
+        self.otieno = Patient.objects.create(first_name='Otieno', last_name='Odhiambo', date_of_birth='1985-01-01',
+                                             gender='M', phone='0722000111')
+
+    def search(self, query):
+        response = self.client.get('/api/patients/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, query):
+        return [row['id'] for row in self.search(query)['results']]
+
+    def test_prefix_and_phone_digits(self):
+        self.assertTrue(fts_enabled())
+        self.assertEqual(self.ids('wanj'), [self.wanjiru.pk])
+        self.assertEqual(self.ids('kam wanj'), [self.wanjiru.pk])
+        self.assertEqual(self.ids('712345'), [self.wanjiru.pk])
+        self.assertEqual(self.ids('0722'), [self.otieno.pk])
+
+    def test_typo(self):
+        self.assertEqual(self.ids('Odhiambho'), [self.otieno.pk])
+        self.assertEqual(self.ids('Wanjriu Kamau'), [self.wanjiru.pk])
+
+    def test_edits_are_reindexed(self):
+        self.otieno.last_name = 'Mutua'
+        self.otieno.save()
+        self.assertEqual(self.ids('mutua'), [self.otieno.pk])
+        self.assertEqual(self.ids('odhiambo'), [])
+
+    def test_single_page(self):
+        body = self.search('a')
+        self.assertEqual((body['next'], body['previous']), (None, None))
+        self.assertEqual(self.search('nobody-like-this')['results'], [])
+
+    def test_fallback_without_fts(self):
+        with mock.patch('patients.search.fts_enabled', return_value=False):
+            self.assertEqual(self.ids('wanj'), [self.wanjiru.pk])
+            self.assertEqual(self.ids('ODHI otie'), [self.otieno.pk])
+            self.assertEqual(self.ids('Odhiambho'), [])  # no typo tolerance in the fallback
+
+    def test_missing_table_is_remembered(self):
+        forget_fts_tables()
+        self.addCleanup(forget_fts_tables)
+        with mock.patch.object(connection.introspection, 'table_names', return_value=[]) as table_names:
+            self.assertFalse(fts_enabled())
+            self.assertEqual(self.ids('wanj'), [self.wanjiru.pk])
+        self.assertEqual(table_names.call_count, 1)
+
+
+class PatientAgeTests(TestCase):
+    # 01:30 on 2 March in Nairobi, still 1 March in UTC
+    NOW = datetime.datetime(2026, 3, 1, 22, 30, tzinfo=datetime.timezone.utc)
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('age.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        patcher = mock.patch('django.utils.timezone.now', return_value=self.NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.patients = {
+            dob: Patient.objects.create(first_name='Age', last_name=dob, date_of_birth=dob, gender='F')
+            for dob in ('2022-03-02', '2000-03-02', '2000-03-03', '1961-03-03', '1961-03-02')
+        }
+
+    def ages(self, **params):
+        response = self.client.get('/api/patients/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['last_name']: row['age'] for row in response.json()['results']}
+
+    def test_age_uses_the_local_date(self):
+        self.assertEqual(self.ages(), {
+            '2022-03-02': 4, '2000-03-02': 26, '2000-03-03': 25, '1961-03-03': 64, '1961-03-02': 65,
+        })
+
+    def test_demographic_bands_agree_with_age(self):
+        response = self.client.get('/api/patients/demographics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['total'], 5)
+        self.assertEqual(
+            {band: n for band, n in body['age_band'].items() if n},
+            {'0-4': 1, '25-34': 2, '55-64': 1, '65+': 1},
+        )
+        self.assertEqual(body['gender'], {'F': 5})
+        self.assertEqual(body['blood_group'], {'unknown': 5})
+
+    def test_age_filters(self):
+        self.assertEqual(set(self.ages(age_min=65)), {'1961-03-02'})
+        self.assertEqual(set(self.ages(age_max=4)), {'2022-03-02'})
+        self.assertEqual(set(self.ages(age_min=26, age_max=64)), {'2000-03-02', '1961-03-03'})
+        demographics = self.client.get('/api/patients/demographics/', {'age_min': 25, 'age_max': 25}).json()
+        self.assertEqual(demographics['total'], 1)
+        for value in ('abc', '-1', '151'):
+            with self.subTest(value=value):
+                self.assertEqual(self.client.get('/api/patients/', {'age_min': value}).status_code, 400)
+
+
+class PatientQueryPlanTests(TestCase):
+    """Planned endpoints cost the same number of queries however many rows they render."""
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('plan.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.patient = self.add_patient()
+
+    def add_patient(self):
+        patient = Patient.objects.create(first_name='Ada', last_name='Plan', date_of_birth='1990-01-01', gender='F')
+        self.add_history(patient)
+        Visit.objects.create(patient=patient)
+        return patient
+
+    def add_history(self, patient):
+        condition = ChronicCondition.objects.create(patient=patient, condition='Diabetes', diagnosed_date='2020-01-01')
+        Medication.objects.create(chronic_condition=condition, name='Metformin', dosage='500mg', frequency='bd',
+                                  start_date='2020-01-01')
+        Allergy.objects.create(patient=patient, allergen='Penicillin', severity='severe', reaction='rash')
+        SurgicalHistory.objects.create(patient=patient, procedure='Appendectomy', date_performed='2010-01-01')
+        FamilyHistory.objects.create(patient=patient, relative='Mother', condition='Hypertension')
+
+    def assertConstantQueries(self, url, grow):
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        grow()
+        with self.assertNumQueries(len(before)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def grow_history(self):
+        self.add_history(self.patient)
+        self.add_history(self.patient)
+
+    def test_patient_list(self):
+        self.assertConstantQueries('/api/patients/', lambda: [self.add_patient() for _ in range(2)])
+
+    def test_patient_detail(self):
+        self.assertConstantQueries(f'/api/patients/{self.patient.pk}/', self.grow_history)
 
-# Create your tests here.
+    def test_chronic_conditions(self):
+        self.assertConstantQueries(f'/api/patients/{self.patient.pk}/chronic-conditions/', self.grow_history)
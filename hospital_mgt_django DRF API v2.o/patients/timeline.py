@@ -0,0 +1,126 @@
+# patients/timeline.py
+"""
+Chronological clinical timeline for one patient.
+
+Every source (vitals, diagnoses, ... queue events) is read as its own
+index-ordered queryset, newest first, limited to one page worth of rows past
+the cursor. The sources are then combined with a streaming k-way merge
+(``heapq.merge``), so the patient's full history is never loaded or sorted
+in Python — a page costs one bounded query per source, however long the stay.
+
+Global order is ``(timestamp desc, type asc, id desc)``; the cursor carries the
+last entry's ``(timestamp, type, id)``.
+"""
+import datetime
+import heapq
+from itertools import islice
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+
+from core.pagination import decode_cursor, encode_cursor
+from core.prefetch import plan_queryset
+from queues.models import Que
+from queues.serializers import QueTimelineSerializer
+from visits.models import (
+    VitalSigns,
+    Diagnosis,
+    Prescription,
+    LabTestOrder,
+    RadiologyOrder,
+    Procedure,
+    Referral,
+    FollowUp,
+    Note,
+)
+from visits.serializers import (
+    VitalSignsSerializer,
+    DiagnosisSerializer,
+    PrescriptionSerializer,
+    LabTestOrderSerializer,
+    RadiologyOrderSerializer,
+    ProcedureSerializer,
+    ReferralSerializer,
+    FollowUpSerializer,
+    NoteSerializer,
+)
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+# type -> (model, timestamp field, patient lookup, serializer)
+TIMELINE_SOURCES = {
+    'vitals': (VitalSigns, 'recorded_at', 'visit__patient', VitalSignsSerializer),
+    'diagnoses': (Diagnosis, 'diagnosed_at', 'visit__patient', DiagnosisSerializer),
+    'prescriptions': (Prescription, 'prescribed_at', 'visit__patient', PrescriptionSerializer),
+    'lab_orders': (LabTestOrder, 'ordered_at', 'patient', LabTestOrderSerializer),
+    'radiology_orders': (RadiologyOrder, 'ordered_at', 'visit__patient', RadiologyOrderSerializer),
+    'procedures': (Procedure, 'performed_at', 'visit__patient', ProcedureSerializer),
+    'referrals': (Referral, 'referred_at', 'visit__patient', ReferralSerializer),
+    'followups': (FollowUp, 'created_at', 'visit__patient', FollowUpSerializer),
+    'notes': (Note, 'created_at', 'visit__patient', NoteSerializer),
+    'queue': (Que, 'arrival_time', 'visit__patient', QueTimelineSerializer),
+}
+
+
+def _sort_key(timestamp, type_name, pk):
+    # heapq.merge merges ascending: newest first == smallest negated offset
+    return (-((timestamp - _EPOCH) // _MICROSECOND), type_name, -pk)
+
+
+def _after(type_name, field, cursor):
+    """Rows of ``type_name`` strictly after ``cursor`` in timeline order."""
+    timestamp, cursor_type, cursor_pk = cursor
+    if type_name > cursor_type:
+        return Q(**{f'{field}__lte': timestamp})
+    if type_name < cursor_type:
+        return Q(**{f'{field}__lt': timestamp})
+    return Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'pk__lt': cursor_pk})
+
+
+def _stream(type_name, patient_id, cursor, limit):
+    model, field, patient_lookup, serializer_class = TIMELINE_SOURCES[type_name]
+    queryset = model.objects.filter(**{f'{patient_lookup}_id': patient_id})
+    if cursor:
+        queryset = queryset.filter(_after(type_name, field, cursor))
+    queryset = plan_queryset(queryset, serializer_class()).order_by(f'-{field}', '-pk')
+
+    for obj in queryset[:limit].iterator(chunk_size=limit):
+        timestamp = getattr(obj, field)
+        yield _sort_key(timestamp, type_name, obj.pk), type_name, timestamp, obj
+
+
+def get_timeline_page(patient_id, types=None, cursor=None, page_size=50):
+    """
+    Return ``(entries, next_cursor)`` for one page of the patient's timeline.
+    ``cursor`` is the opaque token from a previous page (or None).
+    """
+    types = [t for t in (types or TIMELINE_SOURCES) if t in TIMELINE_SOURCES]
+
+    position = None
+    if cursor:
+        data = decode_cursor(cursor)
+        try:
+            position = (datetime.datetime.fromisoformat(data['t']), str(data['k']), int(data['i']))
+        except (KeyError, TypeError, ValueError):
+            raise NotFound('Invalid cursor.')
+
+    # each source contributes at most page_size + 1 rows (the +1 detects a next page)
+    streams = [_stream(t, patient_id, position, page_size + 1) for t in types]
+    merged = list(islice(heapq.merge(*streams), page_size + 1))
+
+    entries = [
+        {
+            'type': type_name,
+            'timestamp': timestamp,
+            'visit': getattr(obj, 'visit_id', None),
+            'data': TIMELINE_SOURCES[type_name][3](obj).data,
+        }
+        for _, type_name, timestamp, obj in merged[:page_size]
+    ]
+
+    next_cursor = None
+    if len(merged) > page_size:
+        _, type_name, timestamp, obj = merged[page_size - 1]
+        next_cursor = encode_cursor({'t': timestamp, 'k': type_name, 'i': obj.pk})
+    return entries, next_cursor
@@ -1,4 +1,18 @@
-from rest_framework import viewsets, permissions
+import csv
+import json
+
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.etag import ConditionalRetrieveMixin
+from core.fieldsets import SparseFieldsetMixin
+from core.prefetch import QueryPlanMixin
 from .models import (
     Patient,
     ChronicCondition,
@@ -7,13 +21,23 @@ from .models import (
     SurgicalHistory,
     FamilyHistory,
 )
+from visits.models import Visit
+from .demographics import age_range_q, demographic_summary
+from .facesheets import get_face_sheets
+from .linkage import KEY_FIELDS, find_possible_duplicates
+from .importer import error_entry, guess_format, import_patients, read_records, text_stream
+from .merge import MergeError, merge_patients, resolve_merged
+from .search import search_patient_ids
+from .timeline import TIMELINE_SOURCES, get_timeline_page
 from .serializers import (
     PatientSerializer,
+    PatientListSerializer,
     ChronicConditionSerializer,
     AllergySerializer,
     SurgicalHistorySerializer,
     FamilyHistorySerializer,
-    MedicationSerializer
+    MedicationSerializer,
+    PossibleDuplicatesSerializer,
 )
 # 🔽 imports for custom permissions
 from users.permissions import (
@@ -28,7 +52,7 @@ from users.permissions import (
     IsAccountant,
 )
 
-class BaseViewSet(viewsets.ModelViewSet):
+class BaseViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     Optional base class to help with debugging.
     """
@@ -39,22 +63,253 @@ class BaseViewSet(viewsets.ModelViewSet):
 
 
 # 🔹 Patient ViewSet – Admins, Doctors can edit; others read-only
-class PatientViewSet(BaseViewSet):
+#    Supports sparse responses via ?fields=<a,b.c>&expand=<relation>
+class PatientViewSet(ConditionalRetrieveMixin, SparseFieldsetMixin, BaseViewSet):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    etag_resource = 'patient'
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PatientListSerializer
+        return super().get_serializer_class()
+
+    def get_age_filter(self):
+        # 🎂 ?age_min=&age_max= -> date_of_birth range (index friendly)
+        bounds = {}
+        for name in ('age_min', 'age_max'):
+            value = self.request.query_params.get(name)
+            if value in (None, ''):
+                continue
+            if not value.isdigit() or int(value) > 150:
+                raise ValidationError({name: "Must be a whole number of years (0-150)."})
+            bounds[name] = int(value)
+        return age_range_q(**bounds)
+
+    def with_last_visit(self, queryset):
+        # 📋 flat registry rows: latest visit via correlated subqueries, one query per page
+        latest = Visit.objects.filter(patient=OuterRef('pk')).order_by('-start_time', '-id')
+        return queryset.annotate(
+            last_visit_id=Subquery(latest.values('id')[:1]),
+            last_visit_start=Subquery(latest.values('start_time')[:1]),
+            last_visit_status=Subquery(latest.values('status')[:1]),
+        )
+
+    def get_queryset(self):
+        queryset = Patient.objects.all()
+        if self.action == 'list':
+            queryset = self.with_last_visit(queryset.filter(self.get_age_filter()))
+        return self.plan_queryset(queryset)
+
+    def redirect_to_survivor(self, request, survivor_id):
+        url = reverse('patient-detail', kwargs={'pk': survivor_id}, request=request)
+        if request.META.get('QUERY_STRING'):
+            url = f"{url}?{request.META['QUERY_STRING']}"
+        return Response(
+            {'detail': "Patient was merged.", 'survivor': survivor_id},
+            status=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={'Location': url},
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # 🔀 ids of merged-away patients redirect to the surviving record
+            pk = kwargs['pk']
+            survivor_id = resolve_merged(patient_id=int(pk)) if pk.isdigit() else None
+            if survivor_id is None:
+                raise
+            return self.redirect_to_survivor(request, survivor_id)
+
+    def list(self, request, *args, **kwargs):
+        # 🔎 ?search=<name / MRN / phone> returns one ranked page (best match first)
+        query = request.query_params.get('search', '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+
+        page_size = self.paginator.get_page_size(request) if self.paginator else 50
+        ids = search_patient_ids(query, limit=page_size)
+        patients = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([patients[pk] for pk in ids if pk in patients], many=True)
+        return Response({'next': None, 'previous': None, 'results': serializer.data})
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'merge', 'bulk_import']:
             return [permissions.IsAuthenticated(), IsAdminOrDoctor()]
         return [permissions.IsAuthenticated()]
 
+    @action(detail=False, methods=['get'], url_path='demographics')
+    def demographics(self, request):
+        """
+        Counts by age band, gender, blood group and payment mode.
+        Honours ?age_min=&age_max=. Example: /api/patients/demographics/?age_min=18
+        """
+        return Response(demographic_summary(Patient.objects.filter(self.get_age_filter())))
+
+    def patient_id(self, pk):
+        """A detail route's pk as an int; anything that is no id is a 404, not a 500."""
+        try:
+            return int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(detail="Patient not found.")
+
+    def duplicate_response(self, matches):
+        patients = self.with_last_visit(Patient.objects.all()).in_bulk([pk for pk, _, _ in matches])
+        results = [
+            {**PatientListSerializer(patients[pk]).data, 'score': score, 'reasons': reasons}
+            for pk, score, reasons in matches if pk in patients
+        ]
+        return Response({'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['post'], url_path='possible-duplicates')
+    def possible_duplicates(self, request):
+        """
+        Registration-time check: POST the form fields (first_name, last_name,
+        date_of_birth, phone, gender) before creating the patient.
+        """
+        serializer = PossibleDuplicatesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = {field: serializer.validated_data.get(field) for field in KEY_FIELDS}
+        return self.duplicate_response(find_possible_duplicates(data))
+
+    @action(detail=True, methods=['get'], url_path='possible-duplicates')
+    def patient_duplicates(self, request, pk=None):
+        """Existing records that look like the same person as this patient."""
+        pk = self.patient_id(pk)
+        data = Patient.objects.filter(pk=pk).values(*KEY_FIELDS).first()
+        if data is None:
+            raise NotFound(detail="Patient not found.")
+        return self.duplicate_response(find_possible_duplicates(data, exclude_id=pk))
+
+    @action(detail=False, methods=['get'], url_path=r'by-mrn/(?P<mrn>[^/]+)')
+    def by_mrn(self, request, mrn=None):
+        """Look a patient up by MRN; MRNs of merged-away records redirect (301)."""
+        patient_id = Patient.objects.filter(mrn=mrn).values_list('pk', flat=True).first()
+        if patient_id is None:
+            survivor_id = resolve_merged(mrn=mrn)
+            if survivor_id is None:
+                raise NotFound(detail="Patient not found.")
+            return self.redirect_to_survivor(request, survivor_id)
+        return Response(self.get_serializer(self.get_queryset().get(pk=patient_id)).data)
+
+    @action(detail=False, methods=['get', 'post'], url_path='face-sheets')
+    def face_sheets(self, request):
+        """
+        Precomputed headers (name, age, MRN, allergies, active conditions) for
+        many patients: ?ids=1,2,3 or POST {"ids": [1, 2, 3]}; at most 500.
+        """
+        if request.method == 'POST':
+            # the body must be {"ids": [...]}; a bare JSON list or a string of ids is a 400, not a 500
+            ids = request.data.get('ids') if isinstance(request.data, dict) else None
+            if not isinstance(ids, list):
+                raise ValidationError({'ids': "Must be a list of patient ids."})
+        else:
+            ids = request.query_params.get('ids', '').split(',')
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in ids or [] if str(pk).strip()))
+        except (TypeError, ValueError):
+            raise ValidationError({'ids': "Must be a list of patient ids."})
+        if not ids or len(ids) > 500:
+            raise ValidationError({'ids': "Give between 1 and 500 patient ids."})
+        return Response({'results': get_face_sheets(ids)})
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Multipart upload of a CSV / NDJSON file (field "file"), imported in
+        chunks. ?start_after=<line> resumes a previous upload of the same file.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': "Upload a CSV or NDJSON file."})
+        fmt = request.data.get('format') or guess_format(upload.name)
+        start_after = request.query_params.get('start_after', '0')
+        if fmt not in ('csv', 'ndjson') or not (start_after.isascii() and start_after.isdigit()):
+            raise ValidationError("format must be csv or ndjson; start_after a line number.")
+
+        errors = []
+
+        def collect(line, record, detail):
+            # the response carries the first rejects; the command writes a full report
+            if len(errors) < 500:
+                errors.append(json.loads(error_entry(line, record, detail)))
+
+        committed = {'imported': 0, 'start_after': int(start_after)}
+
+        def remember(stats):
+            committed.update(imported=stats.imported, start_after=stats.last_line)
+
+        try:
+            stats = import_patients(
+                read_records(text_stream(upload.file), fmt),
+                user=request.user,
+                start_after=int(start_after),
+                on_error=collect,
+                on_chunk=remember,
+            )
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # earlier chunks are committed; say where to resume once the file is fixed
+            return Response({'file': [f"Unreadable {fmt} (UTF-8 expected): {exc}."], **committed},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({**stats.as_dict(), 'errors': errors}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='merge')
+    def merge(self, request, pk=None):
+        """
+        Merge duplicates into this patient: {"patients": [<loser ids>]}.
+        Their visits, lab orders and medical history move here; their ids and
+        MRNs keep working as redirects.
+        """
+        pk = self.patient_id(pk)
+        losers = request.data.get('patients')
+        # bool is an int subclass: true/false are no patient ids
+        if not isinstance(losers, list) or not losers or not all(type(i) is int for i in losers):
+            raise ValidationError({'patients': "A non-empty list of patient ids is required."})
+        try:
+            merged = merge_patients([(pk, loser) for loser in losers], user=request.user)
+        except MergeError as exc:
+            raise ValidationError({'patients': str(exc)})
+        return Response({'survivor': pk, 'merged': merged})
+
+    @action(detail=True, methods=['get'], url_path='timeline')
+    def timeline(self, request, pk=None):
+        """
+        Merged clinical history, newest first.
+        Example: /api/patients/7/timeline/?types=vitals,diagnoses&page_size=20
+        """
+        pk = self.patient_id(pk)
+        if not Patient.objects.filter(pk=pk).exists():
+            raise NotFound(detail="Patient not found.")
+
+        types = request.query_params.get('types')
+        types = [t.strip() for t in types.split(',') if t.strip()] if types else list(TIMELINE_SOURCES)
+        unknown = [t for t in types if t not in TIMELINE_SOURCES]
+        if unknown:
+            # a typo must not read as "no history"
+            raise ValidationError({
+                'types': f"Unknown type(s): {', '.join(unknown)}. Valid types: {', '.join(TIMELINE_SOURCES)}."
+            })
+        paginator = self.paginator
+        page_size = paginator.get_page_size(request) if paginator else 50
+
+        entries, next_cursor = get_timeline_page(
+            pk, types=types, cursor=request.query_params.get('cursor'), page_size=page_size
+        )
+
+        next_link = None
+        if next_cursor:
+            url = remove_query_param(request.build_absolute_uri(), 'cursor')
+            next_link = replace_query_param(url, 'cursor', next_cursor)
+        return Response({'next': next_link, 'results': entries})
+
 # 🔹 Chronic Condition ViewSet – Only Doctors can edit
 class ChronicConditionViewSet(BaseViewSet):
     serializer_class = ChronicConditionSerializer
     permission_classes = [permissions.IsAuthenticated, IsDoctor]
 
     def get_queryset(self):
-        return ChronicCondition.objects.filter(patient_id=self.kwargs['patient_pk'])
+        return self.plan_queryset(ChronicCondition.objects.filter(patient_id=self.kwargs['patient_pk']))
 
 
 # 🔹 Medication ViewSet – Only Doctors can manage
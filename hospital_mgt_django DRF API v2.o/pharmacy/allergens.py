@@ -0,0 +1,179 @@
+# pharmacy/allergens.py
+"""
+Allergy–drug conflict checking.
+
+The drug catalog is compiled once into a per-drug set of *terms* the drug
+answers to: its generic and brand names, its therapeutic class(es) and —
+marked as cross-reactive — the classes listed in ``CROSS_REACTIVITY``. A
+patient's recorded allergens are normalized into the same vocabulary
+(``ALLERGEN_ALIASES`` maps "sulfa", "penicillin", "NSAIDs" ... to classes),
+so checking a prescription batch is one dictionary lookup per drug plus a
+set intersection, with no string matching at request time.
+
+The compiled index lives in process memory. Before a check every process
+reads the catalog's version from the database — drug count, highest id and
+latest ``updated_at``, one aggregate query — and recompiles when it moved, so
+an edit made through any worker reaches all of them.
+"""
+import re
+import threading
+
+from django.db.models import Count, Max
+
+from .models import Drug
+
+# therapeutic class -> generic names (normalized, see ``normalize``)
+DRUG_CLASSES = {
+    'penicillins': {
+        'penicillin', 'benzylpenicillin', 'phenoxymethylpenicillin', 'amoxicillin', 'ampicillin',
+        'cloxacillin', 'flucloxacillin', 'piperacillin', 'coamoxiclav', 'amoxicillinclavulanate',
+    },
+    'cephalosporins': {
+        'cefalexin', 'cephalexin', 'cefadroxil', 'cefazolin', 'cefuroxime', 'cefixime',
+        'cefotaxime', 'ceftriaxone', 'ceftazidime', 'cefepime',
+    },
+    'carbapenems': {'imipenem', 'meropenem', 'ertapenem'},
+    'sulfonamides': {'sulfamethoxazole', 'cotrimoxazole', 'sulfadiazine', 'sulfadoxinepyrimethamine'},
+    'macrolides': {'erythromycin', 'azithromycin', 'clarithromycin'},
+    'fluoroquinolones': {'ciprofloxacin', 'levofloxacin', 'norfloxacin', 'ofloxacin', 'moxifloxacin'},
+    'tetracyclines': {'tetracycline', 'doxycycline', 'minocycline'},
+    'aminoglycosides': {'gentamicin', 'amikacin', 'streptomycin', 'tobramycin'},
+    'nsaids': {
+        'aspirin', 'acetylsalicylicacid', 'ibuprofen', 'diclofenac', 'naproxen', 'indomethacin',
+        'ketorolac', 'piroxicam', 'meloxicam', 'celecoxib', 'mefenamicacid',
+    },
+    'opioids': {'morphine', 'codeine', 'tramadol', 'pethidine', 'fentanyl', 'oxycodone'},
+    'aceinhibitors': {'captopril', 'enalapril', 'lisinopril', 'ramipril', 'perindopril'},
+}
+
+# allergy to the first class -> possible reaction to the second
+CROSS_REACTIVITY = {
+    'penicillins': {'cephalosporins', 'carbapenems'},
+    'cephalosporins': {'penicillins', 'carbapenems'},
+    'carbapenems': {'penicillins', 'cephalosporins'},
+}
+
+# how allergies are commonly written -> class names
+ALLERGEN_ALIASES = {
+    'penicillin': 'penicillins',
+    'pcn': 'penicillins',
+    'betalactam': 'penicillins',
+    'betalactams': 'penicillins',
+    'cephalosporin': 'cephalosporins',
+    'sulfa': 'sulfonamides',
+    'sulpha': 'sulfonamides',
+    'sulfadrugs': 'sulfonamides',
+    'sulphadrugs': 'sulfonamides',
+    'sulfonamide': 'sulfonamides',
+    'nsaid': 'nsaids',
+    'quinolones': 'fluoroquinolones',
+    'macrolide': 'macrolides',
+    'opiates': 'opioids',
+    'opioid': 'opioids',
+    'aceinhibitor': 'aceinhibitors',
+}
+
+_CLASS_OF = {generic: name for name, generics in DRUG_CLASSES.items() for generic in generics}
+
+
+def normalize(text):
+    """'Co-Amoxiclav ' -> 'coamoxiclav'"""
+    return re.sub(r'[^a-z0-9]', '', (text or '').lower())
+
+
+def allergen_terms(allergen):
+    """Terms an allergy entry matches: the substance itself and its class."""
+    term = normalize(allergen)
+    if not term:
+        return set()
+    terms = {term}
+    if term in ALLERGEN_ALIASES:
+        terms.add(ALLERGEN_ALIASES[term])
+    if term in _CLASS_OF:
+        # "aspirin" also flags the rest of the NSAIDs, as a class reaction
+        terms.add(_CLASS_OF[term])
+    return terms
+
+
+def compile_drug_terms(drug_rows):
+    """``{drug_id: {term: (match, class)}}`` from ``(id, name, generic_name)`` rows."""
+    index = {}
+    for drug_id, name, generic_name in drug_rows:
+        terms = {}
+        for raw in (generic_name, name):
+            if term := normalize(raw):
+                terms.setdefault(term, ('drug', None))
+        classes = {_CLASS_OF[t] for t in list(terms) if t in _CLASS_OF}
+        for class_name in classes:
+            terms.setdefault(class_name, ('class', class_name))
+        for class_name in classes:
+            for related in CROSS_REACTIVITY.get(class_name, ()):
+                terms.setdefault(related, ('cross-reactivity', class_name))
+        index[drug_id] = terms
+    return index
+
+
+class AllergenIndex:
+    """Process-wide compiled catalog, recompiled when the catalog version moves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._terms = {}
+
+    def terms(self):
+        version = catalog_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._terms = compile_drug_terms(Drug.objects.values_list('id', 'name', 'generic_name'))
+                    self._version = version
+        return self._terms
+
+
+allergen_index = AllergenIndex()
+
+
+def catalog_version():
+    """Changes with every ``Drug`` insert, edit and delete."""
+    stamp = Drug.objects.aggregate(count=Count('id'), last_id=Max('id'), changed=Max('updated_at'))
+    return (stamp['count'], stamp['last_id'], stamp['changed'])
+
+
+def find_conflicts(drug_ids, allergies):
+    """
+    ``allergies`` = ``[(allergy_id, allergen, severity), ...]`` of one patient.
+    Returns one conflict dict per (drug, allergy) pair that matches.
+    """
+    if not allergies:
+        return []
+    terms = allergen_index.terms()
+    allergy_terms = [(allergy, allergen_terms(allergy[1])) for allergy in allergies]
+    conflicts = []
+    for drug_id in dict.fromkeys(pk for pk in drug_ids if pk is not None):
+        drug_terms = terms.get(drug_id)
+        if not drug_terms:
+            continue
+        for (allergy_id, allergen, severity), wanted in allergy_terms:
+            # the most direct match wins: the drug itself, then its class, then cross-reactivity
+            hits = [drug_terms[t] for t in wanted if t in drug_terms]
+            if not hits:
+                continue
+            match, via = min(hits, key=lambda hit: ('drug', 'class', 'cross-reactivity').index(hit[0]))
+            conflicts.append({
+                'drug': drug_id,
+                'allergy': allergy_id,
+                'allergen': allergen,
+                'severity': severity,
+                'match': match,
+                'drug_class': via,
+            })
+    return conflicts
+
+
+def patient_conflicts(patient_id, drug_ids):
+    """Check ``drug_ids`` against the stored allergies of one patient (one query)."""
+    from patients.models import Allergy
+
+    allergies = list(Allergy.objects.filter(patient_id=patient_id).values_list('id', 'allergen', 'severity'))
+    return find_conflicts(drug_ids, allergies)
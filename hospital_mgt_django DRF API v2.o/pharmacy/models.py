@@ -5,6 +5,8 @@ class Drug(models.Model):
     generic_name = models.CharField(max_length=100)
     strength = models.CharField(max_length=50)
     form = models.CharField(max_length=50)
+    # part of the allergen index version (see pharmacy/allergens.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.generic_name} ({self.strength}, {self.form})"
\ No newline at end of file
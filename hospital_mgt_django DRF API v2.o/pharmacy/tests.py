@@ -1,3 +1,89 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from patients.models import Allergy, Patient
+from users.models import User
+from visits.models import Visit
+from .allergens import AllergenIndex, find_conflicts
+from .models import Drug
+
+
+class AllergenIndexVersionTests(TestCase):
+    def setUp(self):
+        self.drug = Drug.objects.create(name='Panadol', generic_name='paracetamol', strength='500mg', form='tablet')
+        # a second worker's index, compiled before the edit
+        self.other_worker = AllergenIndex()
+        self.other_worker.terms()
+
+    def test_edit_reaches_other_workers(self):
+        self.assertNotIn('penicillins', self.other_worker.terms()[self.drug.pk])
+
+        self.drug.generic_name = 'amoxicillin'
+        self.drug.save()
+
+        self.assertIn('penicillins', self.other_worker.terms()[self.drug.pk])
+
+    def test_create_and_delete_reach_other_workers(self):
+        added = Drug.objects.create(name='Brufen', generic_name='ibuprofen', strength='400mg', form='tablet')
+        self.assertIn(added.pk, self.other_worker.terms())
+
+        added.delete()
+        self.assertNotIn(added.pk, self.other_worker.terms())
+
+    def test_unchanged_catalog_is_not_recompiled(self):
+        terms = self.other_worker.terms()
+        with self.assertNumQueries(1):  # the version check only
+            self.assertIs(self.other_worker.terms(), terms)
+
+    def test_class_conflict(self):
+        self.drug.generic_name = 'amoxicillin'
+        self.drug.save()
+        conflicts = find_conflicts([self.drug.pk], [(1, 'Penicillin', 'severe')])
+        self.assertEqual([(c['match'], c['drug_class']) for c in conflicts], [('class', 'penicillins')])
+
+
+class PrescriptionAllergyConflictTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('rx.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        patient = Patient.objects.create(first_name='Ada', last_name='Allergic', date_of_birth='1990-01-01', gender='F')
+        self.penicillin = Allergy.objects.create(patient=patient, allergen='Penicillin', severity='severe',
+                                                 reaction='Anaphylaxis')
+        self.ibuprofen = Allergy.objects.create(patient=patient, allergen='Ibuprofen', severity='mild', reaction='Rash')
+        self.visit = Visit.objects.create(patient=patient)
+        self.drugs = {
+            generic: Drug.objects.create(name=name, generic_name=generic, strength='500mg', form='tablet')
+            for name, generic in (('Amoxil', 'amoxicillin'), ('Brufen', 'ibuprofen'), ('Panadol', 'paracetamol'))
+        }
+        self.url = f'/api/visits/{self.visit.pk}/prescriptions/'
+
+    def body(self, generic):
+        return {'visit': self.visit.pk, 'drug': self.drugs[generic].pk, 'dosage': '1 tab', 'frequency': 'TDS'}
+
+    def conflicts(self, response, status_code):
+        self.assertEqual(response.status_code, status_code, response.content)
+        return [(c['drug'], c['allergy'], c['match']) for c in response.data['allergy_conflicts']]
+
+    def test_create_flags_direct_and_class_matches(self):
+        response = self.client.post(self.url, self.body('amoxicillin'), format='json')
+        self.assertEqual(self.conflicts(response, 201), [(self.drugs['amoxicillin'].pk, self.penicillin.pk, 'class')])
+        self.assertEqual(response.data['allergy_conflicts'][0]['drug_class'], 'penicillins')
+
+        response = self.client.post(self.url, self.body('ibuprofen'), format='json')
+        self.assertEqual(self.conflicts(response, 201), [(self.drugs['ibuprofen'].pk, self.ibuprofen.pk, 'drug')])
+
+    def test_create_without_conflict(self):
+        response = self.client.post(self.url, self.body('paracetamol'), format='json')
+        self.assertEqual(self.conflicts(response, 201), [])
+
+    def test_update_rechecks_the_new_drug(self):
+        pk = self.client.post(self.url, self.body('paracetamol'), format='json').data['id']
+        response = self.client.put(f'{self.url}{pk}/', self.body('amoxicillin'), format='json')
+        self.assertEqual(self.conflicts(response, 200), [(self.drugs['amoxicillin'].pk, self.penicillin.pk, 'class')])
+
+        response = self.client.patch(f'{self.url}{pk}/', {'drug': self.drugs['ibuprofen'].pk}, format='json')
+        self.assertEqual(self.conflicts(response, 200), [(self.drugs['ibuprofen'].pk, self.ibuprofen.pk, 'drug')])
+
+        response = self.client.patch(f'{self.url}{pk}/', {'drug': self.drugs['paracetamol'].pk}, format='json')
+        self.assertEqual(self.conflicts(response, 200), [])
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QueuesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'queues'
+
+    def ready(self):
+        import queues.signals
@@ -0,0 +1,216 @@
+# queues/events.py
+"""
+Queue change events for live boards (server-sent events).
+
+``Que`` save / delete signals publish one event per committed change:
+
+    arrival    a patient joined a department queue
+    status     the entry's status changed (Waiting -> In Progress ...)
+    transfer   the entry moved to another department (sent to both)
+    update     anything else on the card (priority, clinician ...)
+    removed    the entry was deleted
+    predictions  fresh predicted start times of the department's waiting entries
+
+Each event carries the entry's board card (``QueBoardSerializer``), so a
+screen can patch its list without refetching. ``/api/queue/events/`` streams
+them per department (see ``queues.streams``).
+
+The broker is pluggable (``QUEUE_EVENTS_BROKER``, a dotted path). The default
+``InMemoryBroker`` fans out inside one process and keeps the last
+``QUEUE_EVENTS_BUFFER`` events so a reconnecting client can resume from its
+``Last-Event-ID``; run a single ASGI worker with it, or plug in a shared
+backend with the same ``publish`` / ``subscribe`` interface.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+Event = namedtuple('Event', 'id type departments data')  # data is the JSON text sent to clients
+
+RESET = 'reset'  # the client missed events and must reload its board
+
+
+def enabled():
+    return getattr(settings, 'QUEUE_EVENTS', False)
+
+
+def _key(department):
+    return (department or '').lower()
+
+
+class Subscription:
+    """One client's feed: replayed events first, then live ones."""
+
+    def __init__(self, broker, departments, loop, max_pending):
+        self.broker = broker
+        self.departments = {_key(d) for d in departments} if departments else None
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def wants(self, event):
+        return self.departments is None or event.type == RESET or bool(self.departments & event.departments)
+
+    def put(self, event):
+        # runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # too slow to keep up: tell it to reload rather than buffer forever
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """Next event, or None after ``timeout`` seconds without one."""
+        if self.overflowed and self.queue.empty():
+            return self.broker.reset_event()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    """
+    In-process pub/sub. Event ids are ``<epoch>-<sequence>``; the epoch
+    changes when the process restarts, so an id from before the restart (or
+    one older than the replay buffer) gets a ``reset`` instead of a gap.
+    """
+
+    def __init__(self, buffer_size=1000, max_pending=500):
+        self.epoch = format(time.time_ns() // 1000, 'x')
+        self.sequence = 0
+        self.history = deque(maxlen=buffer_size)
+        self.max_pending = max_pending
+        self.subscribers = set()
+        self._lock = threading.Lock()
+
+    def _next_id(self):
+        self.sequence += 1
+        return f'{self.epoch}-{self.sequence}'
+
+    def reset_event(self):
+        return Event(f'{self.epoch}-{self.sequence}', RESET, frozenset(), '{}')
+
+    def publish(self, event_type, departments, data):
+        """Record and fan out one event; safe to call from any thread."""
+        payload = json.dumps(data, cls=DjangoJSONEncoder)
+        with self._lock:
+            event = Event(self._next_id(), event_type, frozenset(_key(d) for d in departments), payload)
+            self.history.append(event)
+            targets = [sub for sub in self.subscribers if sub.wants(event)]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub.put, event)
+            except RuntimeError:  # loop already closed; the stream is gone
+                self.unsubscribe(sub)
+        return event
+
+    def _replay(self, sub, last_event_id):
+        epoch, _, sequence = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return [self.reset_event()]
+        sequence = int(sequence)
+        if sequence > self.sequence:
+            return [self.reset_event()]
+        oldest = self.history[0] if self.history else None
+        if oldest is not None and int(oldest.id.split('-')[1]) > sequence + 1:
+            return [self.reset_event()]  # fell out of the buffer
+        return [event for event in self.history if int(event.id.split('-')[1]) > sequence and sub.wants(event)]
+
+    def subscribe(self, departments=None, last_event_id=None):
+        """
+        Start a feed on the running event loop. With ``last_event_id`` the
+        missed events are queued first (or a single ``reset``).
+        """
+        sub = Subscription(self, departments, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            backlog = self._replay(sub, last_event_id) if last_event_id else []
+            self.subscribers.add(sub)
+        for event in backlog:
+            sub.put(event)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self.subscribers.discard(sub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(getattr(settings, 'QUEUE_EVENTS_BROKER', 'queues.events.InMemoryBroker'))
+                _broker = broker_class(buffer_size=getattr(settings, 'QUEUE_EVENTS_BUFFER', 1000))
+    return _broker
+
+
+def set_broker(broker):
+    """Swap the process broker (tests use a fresh ``InMemoryBroker``); returns the old one."""
+    global _broker
+    with _broker_lock:
+        previous, _broker = _broker, broker
+    return previous
+
+
+# -----------------------------
+# PUBLISHING (called on commit by queues.signals)
+# -----------------------------
+
+def publish_change(pk, created, old=None):
+    """
+    ``old`` is the entry's ``(department, priority, status, ...)`` state
+    before the save, or None if it is unknown (deferred fields).
+    """
+    from .models import Que
+    from .serializers import QueBoardSerializer, board_queryset
+
+    entry = board_queryset(Que.objects.filter(pk=pk)).first()
+    if entry is None:
+        return  # deleted again before we got here; its own event follows
+    data = {'entry': QueBoardSerializer(entry).data}
+    departments = {entry.department}
+    if created:
+        event_type = 'arrival'
+    elif old and old[0] != entry.department:
+        event_type = 'transfer'
+        departments.add(old[0])
+        data['from_department'] = old[0]
+    elif old and old[2] != entry.status:
+        event_type = 'status'
+        data['from_status'] = old[2]
+    else:
+        event_type = 'update'
+    get_broker().publish(event_type, departments, data)
+    publish_predictions(departments)
+
+
+def publish_removal(pk, department, status):
+    get_broker().publish('removed', {department}, {'entry': {'id': pk, 'department': department, 'status': status}})
+    publish_predictions({department})
+
+
+def publish_predictions(departments):
+    """Any change can move everyone behind it, so resend the department's estimates."""
+    from .predictions import predict_department_starts
+
+    for department, starts in predict_department_starts(departments).items():
+        get_broker().publish('predictions', {department}, {
+            'department': department,
+            'predicted_starts': {str(pk): start for pk, start in starts.items()},
+        })
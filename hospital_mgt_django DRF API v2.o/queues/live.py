@@ -0,0 +1,162 @@
+# queues/live.py
+"""
+Incrementally maintained queue counters for the live board (optional).
+
+With ``QUEUE_LIVE_STATS = True`` every process keeps, in memory:
+
+* entry counts per ``(department, priority, status)``, moved on each save /
+  delete by the queue signals;
+* the waits of entries that *started* within the last ``window`` minutes, as
+  a deque (for expiry) plus per-department minute histograms, so averages and
+  percentiles are read without touching the rows.
+
+Answering ``/api/queue/stats/?live=1`` is then O(1) in the size of the queue.
+Writes made by other processes (or ``QuerySet.update``) are not seen, so the
+counters are reseeded from the database every ``reseed_seconds`` — one grouped
+query — which bounds the drift.
+"""
+import datetime
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Que
+from .stats import PERCENTILES
+
+HISTOGRAM_MINUTES = 240  # waits above this land in the last bin
+
+
+def enabled():
+    return getattr(settings, 'QUEUE_LIVE_STATS', False)
+
+
+class _Waits:
+    """Running sum / count and a minute histogram of wait times."""
+
+    def __init__(self):
+        self.count, self.total = 0, 0.0
+        self.bins = [0] * (HISTOGRAM_MINUTES + 1)
+
+    def add(self, seconds, sign=1):
+        self.count += sign
+        self.total += sign * seconds
+        self.bins[min(int(seconds // 60), HISTOGRAM_MINUTES)] += sign
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0
+        rank, seen = fraction * (self.count - 1), 0
+        for minute, n in enumerate(self.bins):
+            seen += n
+            if seen > rank:
+                return minute
+        return HISTOGRAM_MINUTES
+
+
+class LiveQueueCounters:
+    def __init__(self, window_minutes=60, reseed_seconds=60):
+        self.window = datetime.timedelta(minutes=window_minutes)
+        self.reseed_seconds = reseed_seconds
+        self._lock = threading.Lock()
+        self._seeded_at = None
+        self._reset()
+
+    def _reset(self):
+        self.counts = Counter()
+        self.recent = deque()  # (started_at, department, seconds), oldest first
+        self.waits = {}  # department (None = all) -> _Waits
+
+    # -- maintenance ----------------------------------------------------
+
+    def _add_wait(self, started_at, department, seconds):
+        self.recent.append((started_at, department, seconds))
+        for key in (None, department):
+            self.waits.setdefault(key, _Waits()).add(seconds)
+
+    def _expire(self, now):
+        horizon = now - self.window
+        while self.recent and self.recent[0][0] < horizon:
+            _, department, seconds = self.recent.popleft()
+            for key in (None, department):
+                self.waits[key].add(seconds, sign=-1)
+
+    def reseed(self):
+        """Rebuild from the database (one grouped query + the window's waits)."""
+        now = timezone.now()
+        counts = Counter({
+            (row['department'], row['priority'], row['status']): row['n']
+            for row in Que.objects.order_by().values('department', 'priority', 'status').annotate(n=Count('id'))
+        })
+        started = (
+            Que.objects.filter(start_time__gte=now - self.window, start_time__isnull=False)
+            .order_by('start_time').values_list('start_time', 'department', 'arrival_time')
+        )
+        with self._lock:
+            self._reset()
+            self.counts = counts
+            for start, department, arrival in started:
+                self._add_wait(start, department, max((start - arrival).total_seconds(), 0))
+            self._seeded_at = time.monotonic()
+
+    def invalidate(self):
+        """Reseed on the next read (a change we couldn't apply incrementally)."""
+        self._seeded_at = None
+
+    def record(self, old, new):
+        """
+        Apply one change. ``old`` / ``new`` are ``(department, priority,
+        status, arrival_time, start_time)`` or None (created / deleted).
+        """
+        with self._lock:
+            if old:
+                self.counts[old[:3]] -= 1
+            if new:
+                self.counts[new[:3]] += 1
+                arrival, start = new[3], new[4]
+                if start and not (old and old[4]):
+                    self._add_wait(start, new[0], max((start - arrival).total_seconds(), 0))
+
+    # -- reading --------------------------------------------------------
+
+    def stats(self, department=None):
+        """Same shape as ``queue_stats``; waits cover the rolling window only."""
+        if self._seeded_at is None or time.monotonic() - self._seeded_at > self.reseed_seconds:
+            self.reseed()
+        with self._lock:
+            self._expire(timezone.now())
+            counts = {
+                key: n for key, n in self.counts.items()
+                if n and (department is None or key[0].lower() == department.lower())
+            }
+            waits = self.waits.get(None if department is None else self._department_key(department)) or _Waits()
+
+            def count_by(position, choices):
+                totals = Counter()
+                for key, n in counts.items():
+                    totals[key[position]] += n
+                return {value: totals[value] for value, _ in choices}
+
+            by_status = count_by(2, Que.STATUS_CHOICES)
+            return {
+                'total_waiting': by_status['Waiting'],
+                'average_wait_time_minutes': round(waits.total / waits.count / 60) if waits.count else 0,
+                'wait_time_percentiles_minutes': {f'p{p}': waits.percentile(p / 100) for p in PERCENTILES},
+                'filtered_queue_count': sum(counts.values()),
+                'by_department': count_by(0, Que.DEPARTMENT_CHOICES),
+                'by_priority': count_by(1, Que.PRIORITY_CHOICES),
+                'by_status': by_status,
+                'window_minutes': int(self.window.total_seconds() // 60),
+            }
+
+    def _department_key(self, department):
+        return next((key for key in self.waits if key and key.lower() == department.lower()), department)
+
+
+live_counters = LiveQueueCounters(
+    window_minutes=getattr(settings, 'QUEUE_LIVE_WINDOW_MINUTES', 60),
+    reseed_seconds=getattr(settings, 'QUEUE_LIVE_RESEED_SECONDS', 60),
+)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from queues.predictions import rebuild_service_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes per-department, per-hour service-time stats from served (completed or transferred) queue entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        buckets = rebuild_service_stats(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} service-time buckets'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queues', '0001_initial'),
+        ('visits', '0002_remove_labtestorder_ordered_by_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='que',
+            index=models.Index(fields=['arrival_time', 'id'], name='que_arrival_time_idx'),
+        ),
+    ]
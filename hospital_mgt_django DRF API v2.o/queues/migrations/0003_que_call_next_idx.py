@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queues', '0002_que_que_arrival_time_idx'),
+        ('visits', '0010_visit_patient_start_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='que',
+            index=models.Index(fields=['department', 'status', 'priority', 'arrival_time'], name='que_call_next_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queues', '0003_que_call_next_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceTimeStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(choices=[('Triage', 'Triage'), ('Internal Medicine', 'Internal Medicine'), ('General Surgery', 'General Surgery'), ('Cardiology', 'Cardiology'), ('Gynecology', 'Gynecology'), ('Orthopedics', 'Orthopedics'), ('Pediatrics', 'Pediatrics'), ('Pharmacy', 'Pharmacy'), ('Emergency', 'Emergency'), ('Ophthalmology', 'Ophthalmology'), ('Dental', 'Dental'), ('Radiology', 'Radiology'), ('Laboratory', 'Laboratory')], max_length=50)),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0.0)),
+                ('m2', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('department', 'hour'), name='unique_service_time_stat')],
+            },
+        ),
+    ]
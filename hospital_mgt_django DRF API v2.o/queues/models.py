@@ -1,5 +1,6 @@
 # queues/models.py
 from django.db import models
+from django.db.models.signals import post_save
 from visits.models import Visit
 from users.models import User
 from django.utils import timezone
@@ -48,5 +49,51 @@ class Que(models.Model):
     end_time = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination key for /api/queue/
+            models.Index(fields=['arrival_time', 'id'], name='que_arrival_time_idx'),
+            # "call next": oldest Waiting entry per priority of a department
+            models.Index(fields=['department', 'status', 'priority', 'arrival_time'], name='que_call_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.visit.patient} - {self.department} ({self.status})"
+
+    def transition(self, from_statuses, **changes):
+        """
+        Apply ``changes`` only if the row's status is still one of
+        ``from_statuses``: a conditional UPDATE, so of two concurrent callers
+        exactly one wins. Returns whether it applied; ``post_save`` is sent as
+        for ``save()`` (live counters and board events rely on it).
+        """
+        applied = Que.objects.filter(pk=self.pk, status__in=from_statuses).update(**changes)
+        if not applied:
+            return False
+        for field, value in changes.items():
+            setattr(self, field, value)
+        post_save.send(sender=Que, instance=self, created=False, update_fields=frozenset(changes),
+                       raw=False, using=self._state.db)
+        return True
+
+class ServiceTimeStat(models.Model):
+    """
+    Running service-time distribution (``end_time - start_time`` of served
+    entries) for one department and local hour of day, folded in with
+    Welford's algorithm: ``mean`` and ``m2`` (sum of squared deviations, in
+    seconds) give the variance without keeping the samples.
+    """
+    department = models.CharField(max_length=50, choices=Que.DEPARTMENT_CHOICES)
+    hour = models.PositiveSmallIntegerField()  # 0-23, local time the service started
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'hour'], name='unique_service_time_stat'),
+        ]
+
     def __str__(self):
-        return f"{self.visit.patient} - {self.department} ({self.status})"
\ No newline at end of file
+        return f"{self.department} {self.hour:02d}h: {self.mean / 60:.1f} min (n={self.count})"
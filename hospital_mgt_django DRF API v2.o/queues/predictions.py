@@ -0,0 +1,185 @@
+# queues/predictions.py
+"""
+Predicted start times for waiting patients.
+
+Service times (``end_time - start_time``) are folded, as entries are served,
+into ``ServiceTimeStat``: one running mean / variance per department and
+local hour of day (Welford), so learning never rescans history.
+
+A prediction replays the department's near future on its clinicians:
+``QUEUE_CLINICIANS[department]`` if configured, else the number of distinct
+clinicians who started a patient there in the last
+``QUEUE_CLINICIAN_WINDOW_MINUTES`` (default 60), and never fewer than are
+busy right now. Every ``In Progress`` entry occupies a clinician until its
+expected end; the rest are free now. Entries ``In Progress`` for longer than
+``QUEUE_STALE_IN_PROGRESS_MINUTES`` (default 240) were never closed and are
+ignored. The waiting entries are then taken in call order
+(``scheduler.call_order_key``), each starting on the first clinician to free
+up and taking that hour's mean service time. That is one query for the open
+entries, one for the (at most 24) stat rows per department and one for the
+observed staffing, so it is cheap enough to redo on every queue change.
+"""
+import datetime
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Que, ServiceTimeStat
+from .scheduler import call_order_key
+
+# closing statuses of an entry that was seen: a patient sent on to the next
+# department (lab, pharmacy ...) was served here as much as a discharged one
+SERVED_STATUSES = ('Completed', 'Transferred')
+# used until a department has served entries of its own
+DEFAULT_SERVICE_MINUTES = 10
+# fewer samples than this in an hour bucket: use the department-wide mean
+MIN_HOUR_SAMPLES = 5
+CLINICIAN_WINDOW_MINUTES = 60
+STALE_IN_PROGRESS_MINUTES = 240
+
+
+def default_service_seconds():
+    return getattr(settings, 'QUEUE_DEFAULT_SERVICE_MINUTES', DEFAULT_SERVICE_MINUTES) * 60
+
+
+def stale_in_progress_after():
+    return datetime.timedelta(minutes=getattr(settings, 'QUEUE_STALE_IN_PROGRESS_MINUTES', STALE_IN_PROGRESS_MINUTES))
+
+
+def clinician_counts(departments, now):
+    """``{department: clinicians}``, configured or observed (departments with neither are left out)."""
+    configured = getattr(settings, 'QUEUE_CLINICIANS', {})
+    counts = {department: configured[department] for department in departments if department in configured}
+    observed = set(departments) - set(counts)
+    if observed:
+        since = now - datetime.timedelta(
+            minutes=getattr(settings, 'QUEUE_CLINICIAN_WINDOW_MINUTES', CLINICIAN_WINDOW_MINUTES)
+        )
+        counts.update(
+            Que.objects.filter(department__in=observed, start_time__gte=since, assigned_to__isnull=False)
+            .order_by().values('department').annotate(clinicians=Count('assigned_to', distinct=True))
+            .values_list('department', 'clinicians')
+        )
+    return counts
+
+
+def fold(stat, seconds):
+    """Welford update of ``stat`` (count / mean / m2) with one sample."""
+    stat.count += 1
+    delta = seconds - stat.mean
+    stat.mean += delta / stat.count
+    stat.m2 += delta * (seconds - stat.mean)
+
+
+def record_service(department, start_time, end_time):
+    """Fold one served entry into its department / hour bucket (unless it never started)."""
+    if not (start_time and end_time) or end_time < start_time:
+        return
+    seconds = (end_time - start_time).total_seconds()
+    hour = timezone.localtime(start_time).hour
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                stat = ServiceTimeStat.objects.select_for_update().filter(department=department, hour=hour).first()
+                if stat is None:
+                    stat = ServiceTimeStat(department=department, hour=hour)
+                fold(stat, seconds)
+                stat.save()
+            return
+        except IntegrityError:
+            continue  # a concurrent writer created the bucket first; fold into theirs
+
+
+def rebuild_service_stats(chunk_size=5000):
+    """Recompute every bucket from served entries (one streaming pass)."""
+    stats = {}
+    served = (
+        Que.objects.filter(status__in=SERVED_STATUSES, start_time__isnull=False, end_time__isnull=False)
+        .order_by().values_list('department', 'start_time', 'end_time')
+    )
+    for department, start, end in served.iterator(chunk_size=chunk_size):
+        if end < start:
+            continue
+        key = (department, timezone.localtime(start).hour)
+        if key not in stats:
+            stats[key] = ServiceTimeStat(department=key[0], hour=key[1])
+        fold(stats[key], (end - start).total_seconds())
+    with transaction.atomic():
+        ServiceTimeStat.objects.all().delete()
+        ServiceTimeStat.objects.bulk_create(stats.values())
+    return len(stats)
+
+
+# -----------------------------
+# PREDICTION
+# -----------------------------
+
+class ServiceProfile:
+    """Mean service seconds of one department by hour, with fallbacks."""
+
+    def __init__(self, rows):
+        self.by_hour = {row.hour: row for row in rows}
+        total = sum(row.count for row in rows)
+        self.overall = (
+            sum(row.mean * row.count for row in rows) / total if total else default_service_seconds()
+        )
+
+    def seconds_at(self, moment):
+        row = self.by_hour.get(timezone.localtime(moment).hour)
+        if row is None or row.count < MIN_HOUR_SAMPLES:
+            return self.overall
+        return row.mean
+
+
+def predict_starts(departments, now=None):
+    """``{que_id: predicted start}`` for every Waiting entry of ``departments``."""
+    return {
+        pk: start
+        for starts in predict_department_starts(departments, now).values()
+        for pk, start in starts.items()
+    }
+
+
+def predict_department_starts(departments, now=None):
+    """``{department: {que_id: predicted start}}`` (every department given, even if empty)."""
+    departments = set(departments)
+    predictions = {department: {} for department in departments}
+    if not departments:
+        return predictions
+    now = now or timezone.now()
+    stale_before = now - stale_in_progress_after()
+
+    rows = defaultdict(list)
+    for row in ServiceTimeStat.objects.filter(department__in=departments):
+        rows[row.department].append(row)
+    open_entries = defaultdict(list)
+    for entry in (
+        Que.objects.filter(department__in=departments, status__in=('Waiting', 'In Progress'))
+        .only('id', 'department', 'priority', 'status', 'arrival_time', 'start_time')
+    ):
+        open_entries[entry.department].append(entry)
+    clinicians = clinician_counts(open_entries, now) if open_entries else {}
+
+    for department, entries in open_entries.items():
+        profile = ServiceProfile(rows[department])
+        busy = [
+            e for e in entries
+            if e.status == 'In Progress' and (e.start_time or e.arrival_time) >= stale_before
+        ]
+        # busy clinicians free up when their current patient is expected to be done
+        free_at = [
+            max(now, (e.start_time or now) + datetime.timedelta(seconds=profile.seconds_at(e.start_time or now)))
+            for e in busy
+        ]
+        capacity = max(clinicians.get(department, 1), len(busy), 1)
+        free_at += [now] * (capacity - len(busy))  # idle clinicians
+        heapq.heapify(free_at)
+        for entry in sorted((e for e in entries if e.status == 'Waiting'), key=call_order_key):
+            start = heapq.heappop(free_at)
+            predictions[department][entry.pk] = start
+            heapq.heappush(free_at, start + datetime.timedelta(seconds=profile.seconds_at(start)))
+    return predictions
@@ -0,0 +1,158 @@
+# queues/routing.py
+"""
+Patient journey routing: transfer a queue entry to the next department.
+
+A transfer closes the current entry (``Transferred``, ``end_time``) and opens
+a ``Waiting`` entry in the destination, in one transaction per patient. The
+close is a conditional update (``Que.transition``), so a double click or two
+nurses transferring the same patient produce one hop, not two.
+
+Without an explicit department the destination comes from ``QUEUE_ROUTES``,
+an ordered list of ``(from department | '*', condition | None, destination)``
+rules; the first rule that matches (and doesn't point back at the current
+department) wins. ``RETURN`` sends the patient back to the clinical
+department they came from, e.g. to their doctor after the laboratory.
+
+    Triage -> Internal Medicine -> Laboratory -> Internal Medicine -> Pharmacy
+
+Conditions are ``EXISTS`` subqueries on the visit's orders, so routing a
+whole batch is one annotated query plus one for the journeys.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from visits.models import LabTestOrder, Prescription, RadiologyOrder
+from .models import Que
+
+RETURN = 'RETURN'
+OPEN_STATUSES = ('Waiting', 'In Progress')
+# never a RETURN target: patients go back to whoever sent them there
+SERVICE_DEPARTMENTS = ('Laboratory', 'Radiology', 'Pharmacy')
+
+CONDITIONS = {
+    'pending_lab_orders': lambda: Exists(LabTestOrder.objects.filter(
+        visit_id=OuterRef('visit_id'), status__in=('pending', 'in_progress'),
+    )),
+    'pending_radiology_orders': lambda: Exists(RadiologyOrder.objects.filter(
+        visit_id=OuterRef('visit_id'), completed_at__isnull=True,
+    )),
+    'undispensed_prescriptions': lambda: Exists(Prescription.objects.filter(
+        visit_id=OuterRef('visit_id'), is_dispensed=False,
+    )),
+}
+
+DEFAULT_ROUTES = (
+    ('Laboratory', None, RETURN),
+    ('Radiology', None, RETURN),
+    ('Triage', None, 'Internal Medicine'),
+    ('*', 'pending_lab_orders', 'Laboratory'),
+    ('*', 'pending_radiology_orders', 'Radiology'),
+    ('*', 'undispensed_prescriptions', 'Pharmacy'),
+)
+
+
+class TransferError(ValueError):
+    pass
+
+
+def get_routes():
+    routes = getattr(settings, 'QUEUE_ROUTES', DEFAULT_ROUTES)
+    departments = {value for value, _ in Que.DEPARTMENT_CHOICES}
+    for source, condition, destination in routes:
+        if condition is not None and condition not in CONDITIONS:
+            raise ImproperlyConfigured(f'QUEUE_ROUTES: unknown condition "{condition}"')
+        if destination != RETURN and destination not in departments:
+            raise ImproperlyConfigured(f'QUEUE_ROUTES: unknown department "{destination}"')
+        if source != '*' and source not in departments:
+            raise ImproperlyConfigured(f'QUEUE_ROUTES: unknown department "{source}"')
+    return routes
+
+
+def _return_department(entry, journey):
+    """Most recent clinical department of the visit before ``entry``."""
+    for department, arrival_time, pk in reversed(journey):
+        if (arrival_time, pk) < (entry.arrival_time, entry.pk) and department != entry.department \
+                and department not in SERVICE_DEPARTMENTS:
+            return department
+    return None
+
+
+def resolve_routes(entries, routes=None):
+    """``{entry_id: destination | None}`` for ``entries`` (from one batch query)."""
+    routes = get_routes() if routes is None else routes
+    if not entries:
+        return {}
+    used = {condition for _, condition, _ in routes if condition}
+    flags = {
+        row['id']: row
+        for row in Que.objects.filter(pk__in=[e.pk for e in entries])
+        .annotate(**{name: CONDITIONS[name]() for name in used})
+        .values('id', *used)
+    }
+    journeys = {}
+    if any(destination == RETURN for _, _, destination in routes):
+        for visit_id, department, arrival_time, pk in (
+            Que.objects.filter(visit_id__in={e.visit_id for e in entries})
+            .order_by('arrival_time', 'id').values_list('visit_id', 'department', 'arrival_time', 'id')
+        ):
+            journeys.setdefault(visit_id, []).append((department, arrival_time, pk))
+
+    destinations = {}
+    for entry in entries:
+        destinations[entry.pk] = None
+        for source, condition, destination in routes:
+            if source not in ('*', entry.department):
+                continue
+            if condition and not flags.get(entry.pk, {}).get(condition):
+                continue
+            if destination == RETURN:
+                destination = _return_department(entry, journeys.get(entry.visit_id, []))
+            if destination and destination != entry.department:
+                destinations[entry.pk] = destination
+                break
+    return destinations
+
+
+def transfer(entry, department, priority=None, notes=None):
+    """
+    Close ``entry`` and open a Waiting entry for the same visit in
+    ``department``; returns the new entry. Raises ``TransferError`` if the
+    entry is no longer open (someone else moved or finished it).
+    """
+    if department == entry.department:
+        raise TransferError(f'Patient is already in {department}.')
+    with transaction.atomic():
+        now = timezone.now()
+        if not entry.transition(OPEN_STATUSES, status='Transferred', end_time=now):
+            raise TransferError('Queue entry is no longer waiting or in progress.')
+        return Que.objects.create(
+            visit_id=entry.visit_id,
+            department=department,
+            priority=priority or entry.priority,
+            status='Waiting',
+            arrival_time=now,
+            notes=notes if notes is not None else f'Transferred from {entry.department}',
+        )
+
+
+def transfer_many(entries, department=None):
+    """
+    Transfer every entry in ``entries`` (to ``department``, or wherever the
+    routes send it). Returns ``(moved, failed)``: ``[(old, new)]`` and
+    ``[(old, reason)]``. Each patient's hop is its own transaction.
+    """
+    destinations = {e.pk: department for e in entries} if department else resolve_routes(entries)
+    moved, failed = [], []
+    for entry in entries:
+        destination = destinations.get(entry.pk)
+        if destination is None:
+            failed.append((entry, f'No route from {entry.department}; choose a department.'))
+            continue
+        try:
+            moved.append((entry, transfer(entry, destination)))
+        except TransferError as exc:
+            failed.append((entry, str(exc)))
+    return moved, failed
@@ -0,0 +1,89 @@
+# queues/scheduler.py
+"""
+"Call next patient": pick and claim the next ``Waiting`` entry of a department.
+
+Order: any Emergency first (oldest first). Otherwise Urgent and Normal compete
+on *aged* arrival time — an Urgent entry counts as having arrived
+``QUEUE_URGENT_HEAD_START_MINUTES`` (default 60) earlier than it did, so a
+Normal patient who has waited that much longer than the oldest Urgent one is
+called first and nobody waits forever.
+
+Since the best entry of a priority is always its oldest, picking costs one
+probe per priority on the ``(department, status, priority, arrival_time)``
+index, never a scan of the queue.
+
+Claiming is atomic: a conditional ``UPDATE ... WHERE status = 'Waiting'``;
+whoever loses the race simply picks again. Where the database supports it, the
+chosen row alone is then locked with ``SELECT ... FOR UPDATE SKIP LOCKED``
+before the claim (the probes themselves take no locks, or a caller would hold
+the runner-up rows it didn't call). A row another clinician is claiming right
+now is passed over, so two clinicians calling at once get different patients
+without waiting on each other.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Que
+
+
+def urgent_head_start():
+    return datetime.timedelta(minutes=getattr(settings, 'QUEUE_URGENT_HEAD_START_MINUTES', 60))
+
+
+def canonical_department(name):
+    """Choice value for ``name`` (case-insensitive), or None if unknown or not a string."""
+    if not isinstance(name, str):
+        return None
+    return next((value for value, _ in Que.DEPARTMENT_CHOICES if value.lower() == name.strip().lower()), None)
+
+
+def call_order_key(entry):
+    """Sort key putting Waiting entries in the order ``pick_next`` calls them."""
+    if entry.priority == 'Emergency':
+        return (0, entry.arrival_time, 0, entry.pk)
+    if entry.priority == 'Urgent':
+        return (1, entry.arrival_time - urgent_head_start(), 0, entry.pk)
+    return (1, entry.arrival_time, 1, entry.pk)
+
+
+def _oldest(department, priority, exclude):
+    queryset = Que.objects.filter(department=department, status='Waiting', priority=priority)
+    if exclude:
+        queryset = queryset.exclude(pk__in=exclude)
+    return queryset.order_by('arrival_time', 'id').first()
+
+
+def pick_next(department, exclude=()):
+    """The entry that should be called next (not claimed, not locked), or None."""
+    emergency = _oldest(department, 'Emergency', exclude)
+    if emergency is not None:
+        return emergency
+    urgent = _oldest(department, 'Urgent', exclude)
+    normal = _oldest(department, 'Normal', exclude)
+    if urgent is None or normal is None:
+        return urgent or normal
+    return urgent if urgent.arrival_time - urgent_head_start() <= normal.arrival_time else normal
+
+
+def call_next(department, user):
+    """
+    Claim the next patient of ``department`` for ``user``: status
+    ``In Progress``, ``start_time`` now. Returns the entry, or None if nobody
+    is waiting.
+    """
+    lock = connection.features.has_select_for_update_skip_locked
+    passed = set()  # rows another caller holds locked (is claiming) right now
+    while True:  # a lost race means someone else claimed one; the queue is finite
+        with transaction.atomic():
+            entry = pick_next(department, exclude=passed)
+            if entry is None:
+                return None
+            claim = Que.objects.select_for_update(skip_locked=True).filter(pk=entry.pk)
+            if lock and claim.values_list('pk').first() is None:
+                passed.add(entry.pk)
+                continue
+            if entry.transition(['Waiting'], status='In Progress', start_time=timezone.now(), assigned_to=user):
+                return entry
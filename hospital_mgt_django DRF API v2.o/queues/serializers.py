@@ -1,6 +1,10 @@
 # queues/serializers.py
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Que
+from .predictions import predict_starts
+from patients.facesheets import get_face_sheets, with_age
+from users.models import User
 from users.serializers import UserSerializer
 from visits.serializers import VisitDetailSerializer
 
@@ -25,6 +29,112 @@ class QueSerializer(serializers.ModelSerializer):
         read_only_fields = ['visit', 'arrival_time']
 
 
+# 🔹 Queue board: one card per entry, read from a single joined query
+BOARD_COLUMNS = (
+    'id', 'department', 'priority', 'status', 'arrival_time', 'start_time', 'end_time',
+    'visit__id', 'visit__visit_number', 'visit__visit_type', 'visit__patient__id',
+    'visit__patient__face_sheet__data', 'assigned_to__id', 'assigned_to__email', 'assigned_to__role',
+)
+
+
+def board_queryset(queryset):
+    """Join everything a board card shows (face sheet included) and nothing else."""
+    return queryset.select_related('visit__patient__face_sheet', 'assigned_to').only(*BOARD_COLUMNS)
+
+
+class QueBoardClinicianSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'role']
+
+
+class QueBoardListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        entries = list(data.all() if hasattr(data, 'all') else data)
+        # patients registered before face sheets existed: build theirs in one batch
+        missing = [e.visit.patient_id for e in entries if not hasattr(e.visit.patient, 'face_sheet')]
+        if missing:
+            self.child.context['face_sheets'] = {sheet['id']: sheet for sheet in get_face_sheets(missing)}
+        # one estimate per department on the page, not per card
+        self.child.context['predicted_starts'] = predict_starts({e.department for e in entries if e.status == 'Waiting'})
+        return super().to_representation(entries)
+
+
+class QueBoardSerializer(serializers.ModelSerializer):
+    """
+    Compact queue card: patient face sheet, visit type, priority, status,
+    wait so far and assigned clinician. Full visit detail is only served by
+    the detail endpoint (or ``?view=full``).
+    """
+    visit_number = serializers.CharField(source='visit.visit_number', read_only=True)
+    visit_type = serializers.CharField(source='visit.visit_type', read_only=True)
+    assigned_to = QueBoardClinicianSerializer(read_only=True)
+    wait_minutes = serializers.SerializerMethodField()
+    predicted_start = serializers.SerializerMethodField()
+    patient = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Que
+        list_serializer_class = QueBoardListSerializer
+        fields = [
+            'id',
+            'visit',
+            'visit_number',
+            'visit_type',
+            'department',
+            'priority',
+            'status',
+            'arrival_time',
+            'start_time',
+            'wait_minutes',
+            'predicted_start',
+            'assigned_to',
+            'patient',
+        ]
+        read_only_fields = fields
+
+    def get_wait_minutes(self, obj):
+        # time spent waiting: until seen, or until now while still in the queue
+        until = obj.start_time or obj.end_time or timezone.now()
+        return max(int((until - obj.arrival_time).total_seconds() // 60), 0)
+
+    def get_predicted_start(self, obj):
+        if obj.status != 'Waiting':
+            return None
+        prepared = self.context.get('predicted_starts')
+        if prepared is None:
+            prepared = predict_starts({obj.department})
+        start = prepared.get(obj.pk)
+        return serializers.DateTimeField().to_representation(start) if start else None
+
+    def get_patient(self, obj):
+        patient = obj.visit.patient
+        sheet = getattr(patient, 'face_sheet', None)
+        if sheet is not None:
+            return with_age(sheet.data, timezone.localdate())
+        prepared = self.context.get('face_sheets')
+        if prepared is None or patient.pk not in prepared:
+            prepared = {s['id']: s for s in get_face_sheets([patient.pk])}
+        return prepared.get(patient.pk)
+
+
+class QueTimelineSerializer(serializers.ModelSerializer):
+    """Flat queue event for the patient timeline (no embedded visit)."""
+
+    class Meta:
+        model = Que
+        fields = [
+            'id',
+            'department',
+            'assigned_to',
+            'priority',
+            'status',
+            'arrival_time',
+            'start_time',
+            'end_time',
+        ]
+
+
 class QueWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Que
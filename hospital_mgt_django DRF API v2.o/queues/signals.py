@@ -0,0 +1,67 @@
+# queues/signals.py
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import events, live, predictions
+from .models import Que
+from .stats import register_sqlite_functions
+
+
+STATE_FIELDS = ('department', 'priority', 'status', 'arrival_time', 'start_time', 'end_time')
+UNKNOWN = object()  # loaded with some of STATE_FIELDS deferred
+
+
+def _state(que):
+    values = que.__dict__  # never trigger a deferred-field query from a signal
+    if any(field not in values for field in STATE_FIELDS):
+        return UNKNOWN
+    return tuple(values[field] for field in STATE_FIELDS)
+
+
+# 🔹 percentile_cont for queue stats on SQLite (PostgreSQL has it built in)
+@receiver(connection_created)
+def add_sqlite_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_sqlite_functions(connection.connection)
+
+
+# 🔹 Live queue counters (QUEUE_LIVE_STATS), board events (QUEUE_EVENTS), service times
+@receiver(post_init, sender=Que)
+def remember_queue_state(sender, instance, **kwargs):
+    instance._live_state = _state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Que)
+def count_queue_save(sender, instance, created=False, raw=False, **kwargs):
+    old, new = instance._live_state, _state(instance)
+    instance._live_state = new
+    served = predictions.SERVED_STATUSES
+    if not raw and UNKNOWN not in (old, new) and new[2] in served and (old is None or old[2] not in served):
+        department, start, end = new[0], new[4], new[5]
+        transaction.on_commit(lambda: predictions.record_service(department, start, end))
+    if not raw and events.enabled():
+        pk, previous = instance.pk, None if old is UNKNOWN else old
+        transaction.on_commit(lambda: events.publish_change(pk, created, previous))
+    if raw or not live.enabled():
+        return
+    if old is UNKNOWN or new is UNKNOWN:
+        transaction.on_commit(live.live_counters.invalidate)
+        return
+    transaction.on_commit(lambda: live.live_counters.record(old, new))
+
+
+@receiver(post_delete, sender=Que)
+def count_queue_delete(sender, instance, **kwargs):
+    if events.enabled():
+        # deleted rows are loaded in full by the collector, so these are not deferred
+        pk, department, status = instance.pk, instance.department, instance.status
+        transaction.on_commit(lambda: events.publish_removal(pk, department, status))
+    if not live.enabled():
+        return
+    old = instance._live_state
+    if old is UNKNOWN:
+        transaction.on_commit(live.live_counters.invalidate)
+        return
+    transaction.on_commit(lambda: live.live_counters.record(old, None))
@@ -0,0 +1,102 @@
+# queues/stats.py
+"""
+Queue dashboard statistics in one grouped query.
+
+Every count (total, per department / priority / status) is a conditional
+aggregate over the same scan, and the wait time of started entries
+(``start_time - arrival_time``) is averaged and ranked in SQL: PostgreSQL's
+``percentile_cont``, and on SQLite an aggregate of the same name registered
+on every new connection (``queues.signals``).
+"""
+import math
+
+from django.db.models import Aggregate, Avg, Count, FloatField, Func, Q
+
+from .models import Que
+
+PERCENTILES = (50, 90)
+
+
+class WaitSeconds(Func):
+    """Seconds between arrival and start of service."""
+    output_field = FloatField()
+
+    def __init__(self, **extra):
+        super().__init__('start_time', 'arrival_time', **extra)
+
+    def as_sql(self, compiler, conn, **extra):
+        return super().as_sql(compiler, conn, template='EXTRACT(EPOCH FROM (%(expressions)s))', arg_joiner=' - ', **extra)
+
+    def as_sqlite(self, compiler, conn, **extra):
+        return super().as_sql(
+            compiler, conn, template='((julianday(%(expressions)s)) * 86400.0)', arg_joiner=') - julianday(', **extra
+        )
+
+
+class Percentile(Aggregate):
+    """Continuous percentile (0-1) of an expression, e.g. ``Percentile(WaitSeconds(), 0.9)``."""
+    function = 'percentile_cont'
+    output_field = FloatField()
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+    def as_sqlite(self, compiler, conn, **extra):
+        # plain aggregate call; a template kwarg would clash with the FILTER handling
+        clone = self.copy()
+        clone.template = '%(function)s(%(expressions)s, %(fraction)s)'
+        return super(Percentile, clone).as_sql(compiler, conn, **extra)
+
+
+class _SQLitePercentile:
+    def __init__(self):
+        self.values, self.fraction = [], None
+
+    def step(self, value, fraction):
+        if value is not None:
+            self.values.append(value)
+            self.fraction = fraction
+
+    def finalize(self):
+        if not self.values:
+            return None
+        values = sorted(self.values)
+        position = (len(values) - 1) * self.fraction
+        low, high = math.floor(position), math.ceil(position)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def register_sqlite_functions(raw):
+    """Add ``percentile_cont`` to a freshly opened ``sqlite3`` connection."""
+    raw.create_aggregate('percentile_cont', 2, _SQLitePercentile)
+
+
+def queue_stats(queryset):
+    """Dashboard numbers for ``queryset`` (already filtered) from a single query."""
+    started = Q(start_time__isnull=False)
+    aggregates = {
+        'total': Count('id'),
+        'avg_wait': Avg(WaitSeconds(), filter=started),
+        **{f'p{p}_wait': Percentile(WaitSeconds(), p / 100, filter=started) for p in PERCENTILES},
+    }
+    groups = {'department': Que.DEPARTMENT_CHOICES, 'priority': Que.PRIORITY_CHOICES, 'status': Que.STATUS_CHOICES}
+    for field, choices in groups.items():
+        for index, (value, _) in enumerate(choices):
+            aggregates[f'{field}_{index}'] = Count('id', filter=Q(**{f'{field}__iexact': value}))
+
+    row = queryset.order_by().aggregate(**aggregates)
+
+    def minutes(seconds):
+        return round(seconds / 60) if seconds else 0
+
+    return {
+        'total_waiting': row[f"status_{[v for v, _ in Que.STATUS_CHOICES].index('Waiting')}"],
+        'average_wait_time_minutes': minutes(row['avg_wait']),
+        'wait_time_percentiles_minutes': {f'p{p}': minutes(row[f'p{p}_wait']) for p in PERCENTILES},
+        'filtered_queue_count': row['total'],
+        **{
+            f'by_{field}': {value: row[f'{field}_{index}'] for index, (value, _) in enumerate(choices)}
+            for field, choices in groups.items()
+        },
+    }
@@ -0,0 +1,91 @@
+# queues/streams.py
+"""
+Server-sent events stream of queue changes (see ``queues.events``).
+
+    GET /api/queue/events/?department=Triage,Pharmacy
+    Authorization: Bearer <access token>
+    Last-Event-ID: <id>                        (or ?last_event_id=, sent on reconnect)
+
+An async view, so it needs an ASGI server (``core.asgi``); each open stream
+costs a coroutine, not a worker thread. Under WSGI it is rejected.
+
+Browsers' ``EventSource`` cannot send headers. ``QUEUE_EVENTS_QUERY_TOKEN =
+True`` also accepts ``?access_token=<access token>``, but a token in the URL
+ends up in server and proxy access logs: enable it only with short-lived
+access tokens and with the query string kept out of those logs. It is off by
+default, and never accepted on any other endpoint.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from . import events
+
+HEARTBEAT_SECONDS = 15
+
+
+def _authenticate(request):
+    """The request's user (JWT from the header, or ``?access_token=`` if allowed), or None."""
+    auth = JWTAuthentication()
+    raw = None
+    header = auth.get_header(request)
+    if header is not None:
+        raw = auth.get_raw_token(header)
+    if not raw and getattr(settings, 'QUEUE_EVENTS_QUERY_TOKEN', False):
+        raw = request.GET.get('access_token')
+    if not raw:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def format_event(event):
+    return f'id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n'
+
+
+async def _stream(departments, last_event_id, heartbeat):
+    # subscribe on first iteration, so a response that is never sent holds nothing
+    subscription = events.get_broker().subscribe(departments, last_event_id)
+    try:
+        # retry: tells EventSource how long to wait before reconnecting
+        yield 'retry: 3000\n\n'
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ': keep-alive\n\n'  # comment line; keeps proxies from closing the connection
+                continue
+            yield format_event(event)
+            if event.type == events.RESET and subscription.overflowed:
+                return  # the client reconnects and reloads its board
+    finally:
+        subscription.close()
+
+
+async def queue_events(request):
+    if not events.enabled():
+        return JsonResponse({'detail': 'Live queue events are disabled (QUEUE_EVENTS).'}, status=404)
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Queue events need the ASGI server.'}, status=501)
+
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    departments = [d.strip() for d in request.GET.get('department', '').split(',') if d.strip()]
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    heartbeat = getattr(settings, 'QUEUE_EVENTS_HEARTBEAT_SECONDS', HEARTBEAT_SECONDS)
+
+    response = StreamingHttpResponse(
+        _stream(departments or None, last_event_id, heartbeat),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return response
@@ -1,3 +1,581 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import threading
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection, connections, transaction
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from patients.models import Patient, PatientFaceSheet
+from pharmacy.models import Drug
+from users.models import User
+from visits.models import Prescription, Visit
+from . import live
+from .events import RESET, InMemoryBroker, set_broker
+from .live import HISTOGRAM_MINUTES, LiveQueueCounters, _Waits
+from .models import Que, ServiceTimeStat
+from .predictions import predict_starts, rebuild_service_stats
+from .routing import resolve_routes, transfer
+from .scheduler import call_next, pick_next
+from .serializers import QueBoardSerializer, board_queryset
+from .stats import queue_stats
+from .streams import _authenticate, _stream, queue_events
+
+
+class QueueTestCase(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('queue.doctor@example.com', 'pw', role='Doctor')
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Queue', date_of_birth='1990-01-01', gender='F')
+
+    def enqueue(self, department='Triage', **fields):
+        visit = Visit.objects.create(patient=self.patient)
+        return Que.objects.create(visit=visit, department=department, **fields)
+
+
+class CallNextTests(QueueTestCase):
+    def test_call_order(self):
+        now = timezone.now()
+        normal = self.enqueue(priority='Normal', arrival_time=now - datetime.timedelta(minutes=30))
+        urgent = self.enqueue(priority='Urgent', arrival_time=now)
+        emergency = self.enqueue(priority='Emergency', arrival_time=now)
+
+        self.assertEqual(
+            [call_next('Triage', self.doctor).pk for _ in range(3)], [emergency.pk, urgent.pk, normal.pk],
+        )
+        self.assertIsNone(call_next('Triage', self.doctor))
+
+    def test_passed_over_entries_are_excluded(self):
+        first, second = self.enqueue(), self.enqueue()
+        self.assertEqual(pick_next('Triage').pk, first.pk)
+        self.assertEqual(pick_next('Triage', exclude={first.pk}).pk, second.pk)
+
+    def test_endpoint_validates_department(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        entry = self.enqueue()
+        for body in ({'department': 5}, {'department': ['Triage']}, {'department': 'Nowhere'}, {}):
+            with self.subTest(body=body):
+                self.assertEqual(client.post('/api/queue/call-next/', body, format='json').status_code, 400)
+
+        response = client.post('/api/queue/call-next/', {'department': ' triage '}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], entry.pk)
+        self.assertEqual(client.post('/api/queue/call-next/', {'department': 'Triage'}, format='json').status_code, 404)
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class CallNextLockingTests(TransactionTestCase):
+    def test_concurrent_caller_gets_the_runner_up(self):
+        doctor = User.objects.create_user('lock.doctor@example.com', 'pw', role='Doctor')
+        patient = Patient.objects.create(first_name='Ada', last_name='Lock', date_of_birth='1990-01-01', gender='F')
+        now = timezone.now()
+        # the Urgent entry is called first; the Normal one is next in line
+        urgent = Que.objects.create(visit=Visit.objects.create(patient=patient), department='Triage',
+                                    priority='Urgent', arrival_time=now)
+        normal = Que.objects.create(visit=Visit.objects.create(patient=patient), department='Triage',
+                                    priority='Normal', arrival_time=now - datetime.timedelta(minutes=10))
+        claimed, release, first = threading.Event(), threading.Event(), []
+
+        def hold_first_claim():
+            try:
+                with transaction.atomic():
+                    first.append(call_next('Triage', doctor))
+                    claimed.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        worker = threading.Thread(target=hold_first_claim)
+        worker.start()
+        try:
+            self.assertTrue(claimed.wait(10))
+            second = call_next('Triage', doctor)  # must not wait for, or lose, the uncalled Normal entry
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(first[0].pk, urgent.pk)
+        self.assertEqual(second.pk, normal.pk)
+
+
+class ServiceTimeLearningTests(QueueTestCase):
+    def test_transferred_entry_is_folded(self):
+        entry = self.enqueue()
+        called = call_next('Triage', self.doctor)
+        self.assertEqual(called.pk, entry.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer(called, 'Internal Medicine')
+
+        stat = ServiceTimeStat.objects.get(department='Triage')
+        self.assertEqual(stat.count, 1)
+
+    def test_transfer_before_start_is_not_folded(self):
+        entry = self.enqueue()
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer(entry, 'Internal Medicine')
+        self.assertFalse(ServiceTimeStat.objects.exists())
+
+    def test_rebuild_includes_transferred_entries(self):
+        start = timezone.now() - datetime.timedelta(minutes=30)
+        self.enqueue(status='Transferred', start_time=start, end_time=start + datetime.timedelta(minutes=6))
+        self.enqueue(status='Completed', start_time=start, end_time=start + datetime.timedelta(minutes=12))
+        self.enqueue(status='Transferred', end_time=start)  # never seen here
+
+        rebuild_service_stats()
+        stat = ServiceTimeStat.objects.get(department='Triage')
+        self.assertEqual(stat.count, 2)
+        self.assertAlmostEqual(stat.mean, 9 * 60)
+
+
+class PredictionCapacityTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.waiting = [
+            self.enqueue('Pediatrics', arrival_time=self.now - datetime.timedelta(minutes=30 - i)) for i in range(4)
+        ]
+
+    def predicted(self):
+        starts = predict_starts({'Pediatrics'}, now=self.now)
+        return [starts[e.pk] for e in self.waiting]
+
+    def minutes(self, *values):
+        return [self.now + datetime.timedelta(minutes=m) for m in values]
+
+    def test_single_clinician_by_default(self):
+        self.assertEqual(self.predicted(), self.minutes(0, 10, 20, 30))
+
+    @override_settings(QUEUE_CLINICIANS={'Pediatrics': 2})
+    def test_configured_clinicians(self):
+        self.assertEqual(self.predicted(), self.minutes(0, 0, 10, 10))
+
+    def test_observed_clinicians(self):
+        for n in range(3):
+            nurse = User.objects.create_user(f'queue.nurse{n}@example.com', 'pw', role='Nurse')
+            start = self.now - datetime.timedelta(minutes=40)
+            self.enqueue('Pediatrics', status='Completed', assigned_to=nurse,
+                         start_time=start, end_time=start + datetime.timedelta(minutes=5))
+        self.assertEqual(self.predicted(), self.minutes(0, 0, 0, 10))
+
+    def test_stale_in_progress_entries_are_ignored(self):
+        started = self.now - datetime.timedelta(hours=9)
+        self.enqueue('Pediatrics', status='In Progress', assigned_to=self.doctor, start_time=started)
+        self.enqueue('Pediatrics', status='In Progress', assigned_to=self.doctor, start_time=started)
+        self.assertEqual(self.predicted(), self.minutes(0, 10, 20, 30))
+
+    def test_busy_clinician_frees_up_first(self):
+        started = self.now - datetime.timedelta(minutes=4)
+        self.enqueue('Pediatrics', status='In Progress', assigned_to=self.doctor, start_time=started)
+        self.assertEqual(self.predicted(), self.minutes(6, 16, 26, 36))
+
+
+class QueueStatsTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        for minutes in (2, 4, 6, 20):
+            self.started('Triage', minutes)
+        self.started('Pharmacy', 60)
+        self.enqueue('Triage')  # waiting, no wait time yet
+
+    def started(self, department, wait_minutes, **fields):
+        return self.enqueue(department, status='In Progress', start_time=self.now,
+                            arrival_time=self.now - datetime.timedelta(minutes=wait_minutes), **fields)
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            stats = queue_stats(Que.objects.all())
+        self.assertEqual(stats['filtered_queue_count'], 6)
+        self.assertEqual(stats['total_waiting'], 1)
+        self.assertEqual(stats['by_department']['Triage'], 5)
+        self.assertEqual(stats['by_status']['In Progress'], 5)
+
+    def test_wait_times(self):
+        stats = queue_stats(Que.objects.filter(department='Triage'))
+        # waits 2, 4, 6, 20: mean 8; continuous p50 = 4 + (6 - 4) * 0.5, p90 = 6 + (20 - 6) * 0.7
+        self.assertEqual(stats['average_wait_time_minutes'], 8)
+        self.assertEqual(stats['wait_time_percentiles_minutes'], {'p50': 5, 'p90': 16})
+
+    def test_department_filter_is_case_insensitive(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        response = client.get('/api/queue/stats/', {'department': 'tRiAgE'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['filtered_queue_count'], 5)
+        self.assertEqual(response.json()['average_wait_time_minutes'], 8)
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite-only aggregate")
+    def test_percentile_on_new_connection(self):
+        # every new connection gets the aggregate, including reconnects whose
+        # raw sqlite3 object reuses a collected one's address
+        for _ in range(3):
+            conn = connections.create_connection('default')
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT percentile_cont(x, 0.5) FROM (SELECT 1 AS x UNION ALL SELECT 3)")
+                    self.assertEqual(cursor.fetchone()[0], 2.0)
+            finally:
+                conn.close()
+
+
+class LiveQueueCountersTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.counters = LiveQueueCounters(window_minutes=60, reseed_seconds=60)
+        self.counters.reseed()
+
+    def state(self, status, wait_minutes=None, department='Triage'):
+        start = self.now if wait_minutes is not None else None
+        arrival = self.now - datetime.timedelta(minutes=wait_minutes or 0)
+        return (department, 'Normal', status, arrival, start, None)
+
+    def test_record_deltas(self):
+        waiting = self.state('Waiting')
+        self.counters.record(None, waiting)
+        self.counters.record(None, self.state('Waiting', department='Pharmacy'))
+        self.assertEqual(self.counters.stats()['total_waiting'], 2)
+
+        started = self.state('In Progress', wait_minutes=12)
+        self.counters.record(waiting, started)
+        stats = self.counters.stats(department='triage')
+        self.assertEqual((stats['total_waiting'], stats['by_status']['In Progress']), (0, 1))
+        self.assertEqual(stats['average_wait_time_minutes'], 12)
+
+        self.counters.record(started, self.state('Completed', wait_minutes=12))  # start already counted
+        self.assertEqual(self.counters.stats(department='Triage')['average_wait_time_minutes'], 12)
+        self.assertEqual(self.counters.waits['Triage'].count, 1)
+
+        self.counters.record(self.state('Completed', wait_minutes=12), None)
+        self.assertEqual(self.counters.stats(department='Triage')['filtered_queue_count'], 0)
+
+    def test_expire_at_the_window_edge(self):
+        self.counters.record(None, self.state('In Progress', wait_minutes=5))
+        self.counters._expire(self.now + datetime.timedelta(minutes=60))
+        self.assertEqual(self.counters.waits[None].count, 1)
+        self.counters._expire(self.now + datetime.timedelta(minutes=60, microseconds=1))
+        self.assertEqual((self.counters.waits[None].count, self.counters.waits['Triage'].count), (0, 0))
+        self.assertEqual(self.counters.waits[None].bins, [0] * (HISTOGRAM_MINUTES + 1))
+
+    def test_histogram_percentiles(self):
+        waits = _Waits()
+        for seconds in (150, 240, 600, 10 * 3600):
+            waits.add(seconds)
+        self.assertEqual([waits.percentile(f) for f in (0, 0.5, 0.7, 1)], [2, 4, 10, HISTOGRAM_MINUTES])
+        self.assertEqual(_Waits().percentile(0.5), 0)
+
+    def test_reseed(self):
+        entry = self.enqueue(status='In Progress', start_time=self.now,
+                             arrival_time=self.now - datetime.timedelta(minutes=30))
+        self.enqueue(status='In Progress', start_time=self.now - datetime.timedelta(hours=2),
+                     arrival_time=self.now - datetime.timedelta(hours=3))  # started outside the window
+        self.counters.invalidate()
+        stats = self.counters.stats()
+        self.assertEqual((stats['by_status']['In Progress'], stats['average_wait_time_minutes']), (2, 30))
+
+        Que.objects.filter(pk=entry.pk).update(status='Completed')  # not seen until the next reseed
+        self.assertEqual(self.counters.stats()['by_status']['Completed'], 0)
+        self.counters._seeded_at -= 61
+        self.assertEqual(self.counters.stats()['by_status']['Completed'], 1)
+
+
+@override_settings(QUEUE_LIVE_STATS=True)
+class LiveStatsEndpointTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        patcher = mock.patch.object(live, 'live_counters', LiveQueueCounters())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.enqueue(priority='Urgent')
+        self.enqueue(status='Completed')
+
+    def stats(self, **params):
+        response = self.client.get('/api/queue/stats/', {'live': 1, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_live_answer(self):
+        stats = self.stats(department='triage')
+        self.assertIn('window_minutes', stats)
+        self.assertEqual(stats['filtered_queue_count'], 2)
+
+    def test_priority_and_status_filters_fall_back_to_sql(self):
+        for params, count in (({'priority': 'urgent'}, 1), ({'status': 'completed'}, 1)):
+            with self.subTest(params=params):
+                stats = self.stats(**params)
+                self.assertNotIn('window_minutes', stats)
+                self.assertEqual(stats['filtered_queue_count'], count)
+
+
+class TransferTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.visit = Visit.objects.create(patient=self.patient)
+
+    def journey(self, *departments):
+        start = timezone.now() - datetime.timedelta(hours=1)
+        entries = [
+            Que.objects.create(visit=self.visit, department=department, status='Transferred',
+                               arrival_time=start + datetime.timedelta(minutes=10 * i))
+            for i, department in enumerate(departments)
+        ]
+        Que.objects.filter(pk=entries[-1].pk).update(status='Waiting')
+        return Que.objects.get(pk=entries[-1].pk)
+
+    def post(self, entry, body=None):
+        return self.client.post(f'/api/queue/{entry.pk}/transfer/', body or {}, format='json')
+
+    def test_return_goes_back_to_the_sending_clinical_department(self):
+        entry = self.journey('Triage', 'Pediatrics', 'Radiology', 'Laboratory')
+        self.assertEqual(resolve_routes([entry]), {entry.pk: 'Pediatrics'})
+
+        response = self.post(entry)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['entry']['department'], 'Pediatrics')
+        self.assertEqual(Que.objects.get(pk=entry.pk).status, 'Transferred')
+
+    def test_condition_rules(self):
+        entry = self.journey('Triage', 'Internal Medicine')
+        self.assertEqual(resolve_routes([entry]), {entry.pk: None})
+        Prescription.objects.create(visit=self.visit, drug=Drug.objects.create(
+            name='Amoxil', generic_name='amoxicillin', strength='500mg', form='capsule',
+        ), dosage='1', frequency='tds', prescribed_by=self.doctor)
+        self.assertEqual(resolve_routes([entry]), {entry.pk: 'Pharmacy'})
+        Prescription.objects.update(is_dispensed=True)
+        self.assertEqual(resolve_routes([entry]), {entry.pk: None})
+
+    def test_no_route_is_400(self):
+        entry = self.journey('Pharmacy')
+        response = self.post(entry)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('No route from Pharmacy', response.json()['detail'])
+        self.assertEqual(Que.objects.get(pk=entry.pk).status, 'Waiting')
+
+    def test_second_transfer_is_409(self):
+        entry = self.journey('Triage')
+        self.assertEqual(self.post(entry, {'department': 'Pediatrics'}).status_code, 201)
+        response = self.post(entry, {'department': 'Dental'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Que.objects.filter(visit=self.visit, status='Waiting').get().department, 'Pediatrics')
+
+    def test_malformed_body_is_400(self):
+        entry = self.journey('Triage')
+        for body in ({'department': 7}, {'department': ['Pharmacy']}, {'department': 'Nowhere'},
+                     {'priority': ['x']}, {'priority': {'a': 1}}, {'priority': 'Whenever'}, {'notes': ['x']}):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(entry, body).status_code, 400)
+        self.assertEqual(Que.objects.get(pk=entry.pk).status, 'Waiting')
+        self.assertEqual(
+            self.client.post('/api/queue/transfer/', {'entries': [entry.pk], 'department': 7}, format='json').status_code,
+            400,
+        )
+
+    def test_explicit_priority(self):
+        entry = self.journey('Triage')
+        response = self.post(entry, {'department': 'emergency', 'priority': 'Emergency'})
+        self.assertEqual(response.status_code, 201, response.content)
+        new = Que.objects.get(pk=response.json()['entry']['id'])
+        self.assertEqual((new.department, new.priority), ('Emergency', 'Emergency'))
+
+
+class BulkTransferTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.first, self.second = self.enqueue(), self.enqueue()
+
+    def test_booleans_are_not_ids(self):
+        response = self.client.post('/api/queue/transfer/', {'entries': [True]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Que.objects.get(pk=self.first.pk).status, 'Waiting')
+
+    def test_nested_route_only_moves_its_visit(self):
+        response = self.client.post(
+            f'/api/visits/{self.first.visit_id}/queue/transfer/',
+            {'entries': [self.first.pk, self.second.pk], 'department': 'Pharmacy'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['from'] for t in response.json()['transferred']], [self.first.pk])
+        self.assertEqual(response.json()['failed'], [{'id': self.second.pk, 'detail': 'Not found.'}])
+        self.assertEqual(Que.objects.get(pk=self.second.pk).status, 'Waiting')
+
+
+class BoardCardTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.waiting = self.enqueue('Pediatrics', arrival_time=self.now - datetime.timedelta(minutes=25))
+        self.started = self.enqueue(
+            'Pediatrics', status='In Progress', assigned_to=self.doctor,
+            arrival_time=self.now - datetime.timedelta(minutes=40),
+            start_time=self.now - datetime.timedelta(minutes=28, seconds=30),
+        )
+
+    def cards(self):
+        entries = board_queryset(Que.objects.filter(pk__in=[self.waiting.pk, self.started.pk]))
+        return {card['id']: card for card in QueBoardSerializer(entries, many=True).data}
+
+    def test_wait_minutes_stop_when_seen(self):
+        cards = self.cards()
+        self.assertEqual(cards[self.waiting.pk]['wait_minutes'], 25)
+        self.assertEqual(cards[self.started.pk]['wait_minutes'], 11)
+
+    def test_predicted_start_only_while_waiting(self):
+        cards = self.cards()
+        self.assertIsNotNone(cards[self.waiting.pk]['predicted_start'])
+        self.assertIsNone(cards[self.started.pk]['predicted_start'])
+
+    def test_patients_without_stored_sheet(self):
+        expected = self.cards()[self.waiting.pk]['patient']
+        PatientFaceSheet.objects.filter(patient=self.patient).delete()
+
+        cards = self.cards()
+        for card in cards.values():
+            self.assertEqual(card['patient'], expected)
+        self.assertEqual(expected['mrn'], self.patient.mrn)
+        self.assertTrue(PatientFaceSheet.objects.filter(patient=self.patient).exists())
+
+
+class InMemoryBrokerTests(SimpleTestCase):
+    def publish(self, broker, *departments):
+        return [broker.publish('arrival', {department}, {'department': department}) for department in departments]
+
+    async def drain(self, subscription):
+        events = []
+        while (event := await subscription.get(timeout=0.05)) is not None:
+            events.append(event)
+            if event.type == RESET:
+                break
+        return events
+
+    async def test_replay_from_last_event_id(self):
+        broker = InMemoryBroker()
+        first, second, _, fourth = self.publish(broker, 'Triage', 'Triage', 'Pharmacy', 'Triage')
+        subscription = broker.subscribe(['triage'], last_event_id=first.id)
+        self.assertEqual([e.id for e in await self.drain(subscription)], [second.id, fourth.id])
+
+    async def test_unknown_epoch_resets(self):
+        broker = InMemoryBroker()
+        self.publish(broker, 'Triage')
+        subscription = broker.subscribe(['Triage'], last_event_id='0-1')
+        self.assertEqual([e.type for e in await self.drain(subscription)], [RESET])
+
+    async def test_id_older_than_the_buffer_resets(self):
+        broker = InMemoryBroker(buffer_size=2)
+        first, *_ = self.publish(broker, 'Triage', 'Triage', 'Triage', 'Triage')
+        subscription = broker.subscribe(['Triage'], last_event_id=first.id)
+        self.assertEqual([e.type for e in await self.drain(subscription)], [RESET])
+
+    async def test_live_events_are_filtered_by_department(self):
+        broker = InMemoryBroker()
+        subscription = broker.subscribe(['Triage'])
+        triage, _ = self.publish(broker, 'Triage', 'Pharmacy')
+        everything = broker.subscribe()
+        both = self.publish(broker, 'Pharmacy', 'Triage')
+        self.assertEqual([e.id for e in await self.drain(subscription)], [triage.id, both[1].id])
+        self.assertEqual([e.id for e in await self.drain(everything)], [e.id for e in both])
+
+    async def test_overflow_sends_reset_and_ends_the_stream(self):
+        broker = InMemoryBroker(max_pending=2)
+        previous = set_broker(broker)
+        self.addCleanup(set_broker, previous)
+        stream = _stream(['Triage'], None, heartbeat=0.05)
+        self.assertTrue((await stream.__anext__()).startswith('retry:'))  # subscribed now
+
+        self.publish(broker, 'Triage', 'Triage', 'Triage')  # one more than the client may lag behind
+        chunks = [chunk async for chunk in stream]
+
+        self.assertEqual([chunk.split('\n')[1] for chunk in chunks], ['event: arrival', 'event: arrival', 'event: reset'])
+        self.assertFalse(broker.subscribers)
+
+
+class QueueEventsAuthTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('events.doctor@example.com', 'pw', role='Doctor')
+        self.token = str(AccessToken.for_user(self.doctor))
+
+    def test_bearer_header(self):
+        request = RequestFactory().get('/api/queue/events/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(_authenticate(request), self.doctor)
+
+    def test_query_token_is_off_by_default(self):
+        request = RequestFactory().get('/api/queue/events/', {'access_token': self.token})
+        self.assertIsNone(_authenticate(request))
+        with self.settings(QUEUE_EVENTS_QUERY_TOKEN=True):
+            self.assertEqual(_authenticate(request), self.doctor)
+
+
+class QueueEventsViewTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('stream.doctor@example.com', 'pw', role='Doctor')
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.doctor)}'}}
+        self.broker = InMemoryBroker()
+        previous = set_broker(self.broker)
+        self.addCleanup(set_broker, previous)
+
+    async def test_disabled_by_default(self):
+        response = await queue_events(AsyncRequestFactory().get('/api/queue/events/', **self.auth))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(QUEUE_EVENTS=True)
+    async def test_rejected_requests(self):
+        self.assertEqual((await queue_events(RequestFactory().get('/api/queue/events/', **self.auth))).status_code, 501)
+        self.assertEqual((await queue_events(AsyncRequestFactory().post('/api/queue/events/'))).status_code, 405)
+        self.assertEqual((await queue_events(AsyncRequestFactory().get('/api/queue/events/'))).status_code, 401)
+
+    @override_settings(QUEUE_EVENTS=True)
+    async def test_streams_department_events(self):
+        request = AsyncRequestFactory().get('/api/queue/events/', {'department': 'Triage'}, **self.auth)
+        response = await queue_events(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['Content-Type'], response['Cache-Control']), ('text/event-stream', 'no-cache'))
+
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))  # subscribed now
+        self.broker.publish('arrival', {'Pharmacy'}, {'department': 'Pharmacy'})
+        event = self.broker.publish('arrival', {'Triage'}, {'department': 'Triage'})
+        self.assertEqual(await anext(stream), f'id: {event.id}\nevent: arrival\ndata: {event.data}\n\n'.encode())
+
+        # a client disconnect cancels the pending read; the subscription goes with it
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertFalse(self.broker.subscribers)
+
+
+class QueueQueryPlanTests(QueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.rounds = 0
+        self.add_entry()
+
+    def add_entry(self):
+        self.rounds += 1
+        patient = Patient.objects.create(first_name=f'Queue{self.rounds}', last_name='Plan',
+                                         date_of_birth='1990-01-01', gender='F')
+        clinician = User.objects.create_user(f'plan.clinician{self.rounds}@example.com', 'pw', role='Doctor')
+        Que.objects.create(visit=Visit.objects.create(patient=patient), department='Triage', assigned_to=clinician)
+
+    def test_board_and_full_lists(self):
+        for url in ('/api/queue/', '/api/queue/?view=full'):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as before:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.add_entry()
+                self.add_entry()
+                with self.assertNumQueries(len(before)):
+                    self.assertEqual(self.client.get(url).status_code, 200)
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import QueViewSet
+from .streams import queue_events
 
 router = DefaultRouter()
 router.register(r'queue', QueViewSet, basename='queue')
 
 urlpatterns = [
+    # before the router, whose detail route would read "events" as a pk
+    path('queue/events/', queue_events, name='queue-events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
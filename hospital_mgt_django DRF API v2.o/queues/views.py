@@ -1,11 +1,18 @@
+from django.utils import timezone
 from rest_framework import viewsets, serializers, permissions
 from rest_framework.response import Response
+from rest_framework import status as http_status
 from rest_framework.decorators import action
 from .models import Que
-from .serializers import QueSerializer, QueWriteSerializer
-from django.utils import timezone
+from .serializers import QueSerializer, QueBoardSerializer, QueWriteSerializer, board_queryset
+from .stats import queue_stats
+from . import live, routing, scheduler
+
+from core.fieldsets import SparseFieldsetMixin
+from core.prefetch import QueryPlanMixin
 
-class QueViewSet(viewsets.ModelViewSet):
+
+class QueViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     serializer_class = QueSerializer
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
@@ -13,8 +20,14 @@ class QueViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return QueWriteSerializer
+        if self.is_board():
+            return QueBoardSerializer
         return QueSerializer
 
+    def is_board(self):
+        """Lists render compact board cards; ``?view=full`` keeps the embedded visit."""
+        return self.action == 'list' and self.request.query_params.get('view') != 'full'
+
     def get_queryset(self):
         queryset = Que.objects.all().order_by('-arrival_time')
 
@@ -38,7 +51,11 @@ class QueViewSet(viewsets.ModelViewSet):
         if status:
             queryset = queryset.filter(status__iexact=status)
 
-        return queryset
+        if self.is_board():
+            return board_queryset(queryset)
+        if self.action in ('transfer', 'bulk_transfer'):
+            return queryset  # answered with board cards, no embedded visit to plan for
+        return self.plan_queryset(queryset)
 
     def perform_create(self, serializer):
         """
@@ -53,38 +70,114 @@ class QueViewSet(viewsets.ModelViewSet):
             assigned_to=self.request.user
         )
 
+    def perform_update(self, serializer):
+        """
+        Stamp start_time / end_time when the status moves on, so service
+        times (and the wait predictions built on them) are recorded.
+        """
+        instance, status = serializer.instance, serializer.validated_data.get('status')
+        stamps = {}
+        if status == 'In Progress' and not instance.start_time:
+            stamps['start_time'] = timezone.now()
+        if status == 'Completed' and not instance.end_time:
+            stamps['end_time'] = timezone.now()
+        serializer.save(**stamps)
+
     @action(detail=False, methods=['get'], url_path='stats')
     def stats(self, request):
         """
-        Returns filtered statistics based on current queryset
+        Returns filtered statistics based on current queryset (one query)
         Example: /api/queue/stats/?department=Triage
+        ?live=1 answers from the in-memory counters when QUEUE_LIVE_STATS is on
+        (waits over the rolling window; only the department filter applies).
         """
-        queryset = self.get_queryset()
+        params = request.query_params
+        if params.get('live') and live.enabled() and not (params.get('priority') or params.get('status') or self.kwargs.get('visit_pk')):
+            return Response(live.live_counters.stats(department=params.get('department') or None))
+        return Response(queue_stats(self.get_queryset()))
 
-        total_waiting = queryset.filter(status='Waiting').count()
-        avg_wait_time = queryset.filter(start_time__isnull=False).values_list('start_time', 'arrival_time')
+    @action(detail=False, methods=['post'], url_path='call-next')
+    def call_next(self, request):
+        """
+        Claim the next patient of a department for the caller
+        (Emergency first, then Urgent / Normal with wait-time aging).
+        Body: {"department": "Triage"}. 404 when nobody is waiting.
+        """
+        department = scheduler.canonical_department(request.data.get('department') or request.query_params.get('department'))
+        if department is None:
+            return Response({'department': ['A valid department is required.']}, status=http_status.HTTP_400_BAD_REQUEST)
 
-        average_time = None
-        if avg_wait_time.exists():
-            average_time = sum(
-                (timezone.make_naive(s[0]) - timezone.make_naive(s[1])).total_seconds()
-                for s in avg_wait_time
-            ) // avg_wait_time.count()
+        entry = scheduler.call_next(department, request.user)
+        if entry is None:
+            return Response({'detail': f'No patients waiting in {department}.'}, status=http_status.HTTP_404_NOT_FOUND)
+        entry = self.plan_queryset(Que.objects.filter(pk=entry.pk)).get()
+        return Response(self.get_serializer(entry).data)
+
+    def _board_cards(self, entries):
+        queryset = board_queryset(Que.objects.filter(pk__in=[e.pk for e in entries]))
+        cards = QueBoardSerializer(queryset, many=True, context=self.get_serializer_context()).data
+        return {card['id']: card for card in cards}
+
+    @action(detail=True, methods=['post'], url_path='transfer')
+    def transfer(self, request, pk=None, visit_pk=None):
+        """
+        Close this entry and queue the patient in the next department, in one
+        transaction. Body: {"department"?, "priority"?, "notes"?}; without a
+        department the routing rules (QUEUE_ROUTES) choose it.
+        """
+        entry = self.get_object()
+        department = request.data.get('department')
+        if department not in (None, ''):
+            department = scheduler.canonical_department(department)
+            if department is None:
+                return Response({'department': ['Unknown department.']}, status=http_status.HTTP_400_BAD_REQUEST)
+        # checked as strings first: a list or dict can't be looked up in the choices
+        priority = request.data.get('priority')
+        if priority not in (None, '') and not (isinstance(priority, str) and priority in dict(Que.PRIORITY_CHOICES)):
+            return Response({'priority': ['Unknown priority.']}, status=http_status.HTTP_400_BAD_REQUEST)
+        notes = request.data.get('notes')
+        if notes is not None and not isinstance(notes, str):
+            return Response({'notes': ['Must be a string.']}, status=http_status.HTTP_400_BAD_REQUEST)
+        if not department:
+            department = routing.resolve_routes([entry])[entry.pk]
+            if department is None:
+                return Response({'detail': f'No route from {entry.department}; choose a department.'},
+                                status=http_status.HTTP_400_BAD_REQUEST)
+
+        try:
+            new_entry = routing.transfer(entry, department, priority=priority or None, notes=notes)
+        except routing.TransferError as exc:
+            return Response({'detail': str(exc)}, status=http_status.HTTP_409_CONFLICT)
+        return Response(
+            {'from': entry.pk, 'entry': self._board_cards([new_entry])[new_entry.pk]},
+            status=http_status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=['post'], url_path='transfer', url_name='bulk-transfer')
+    def bulk_transfer(self, request, visit_pk=None):
+        """
+        Transfer many entries at once: {"entries": [ids], "department"?}.
+        Each patient moves in its own transaction; the rest still move if one fails.
+        """
+        ids = request.data.get('entries')
+        # bool is an int subclass: reject true/false rather than read them as ids 1/0
+        if not isinstance(ids, list) or not ids or not all(type(pk) is int for pk in ids):
+            return Response({'entries': ['A list of queue entry ids is required.']}, status=http_status.HTTP_400_BAD_REQUEST)
+        if len(ids) > 500:
+            return Response({'entries': ['At most 500 entries per request.']}, status=http_status.HTTP_400_BAD_REQUEST)
+        department = request.data.get('department')
+        if department not in (None, ''):
+            department = scheduler.canonical_department(department)
+            if department is None:
+                return Response({'department': ['Unknown department.']}, status=http_status.HTTP_400_BAD_REQUEST)
 
+        # only entries this route can see: nested under a visit, that visit's
+        entries = list(self.get_queryset().filter(pk__in=ids).order_by('id'))
+        moved, failed = routing.transfer_many(entries, department=department)
+        cards = self._board_cards([new for _, new in moved])
+        missing = set(ids) - {e.pk for e in entries}
         return Response({
-            "total_waiting": total_waiting,
-            "average_wait_time_minutes": round(average_time / 60) if average_time else 0,
-            "filtered_queue_count": queryset.count(),
-            "by_department": {
-                dept: queryset.filter(department__iexact=dept).count()
-                for dept in dict(Que.DEPARTMENT_CHOICES).keys()
-            },
-            "by_priority": {
-                prio: queryset.filter(priority__iexact=prio).count()
-                for prio in dict(Que.PRIORITY_CHOICES).keys()
-            },
-            "by_status": {
-                stat: queryset.filter(status__iexact=stat).count()
-                for stat in dict(Que.STATUS_CHOICES).keys()
-            }
-        })
\ No newline at end of file
+            'transferred': [{'from': old.pk, 'entry': cards[new.pk]} for old, new in moved],
+            'failed': [{'id': old.pk, 'detail': reason} for old, reason in failed]
+                      + [{'id': pk, 'detail': 'Not found.'} for pk in sorted(missing)],
+        })
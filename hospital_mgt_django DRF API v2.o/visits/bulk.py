@@ -0,0 +1,83 @@
+# visits/bulk.py
+"""
+Set-based writes for clinical data that arrives in batches
+(bedside monitors, triage tablets).
+
+``bulk_create`` bypasses ``Model.save()`` and the ``post_save`` signals, so
+anything those would have done for a single row is done here for the batch.
+"""
+from django.db import transaction
+
+from .models import (
+    Visit,
+    Encounter,
+    VitalSigns,
+    Diagnosis,
+    Prescription,
+    LabTestOrder,
+    Note,
+)
+from .rollups import add_readings
+
+BULK_BATCH_SIZE = 500
+
+
+def insert_vitals(readings):
+    """
+    Compute BMI for ``readings``, insert them, fold them into the rollups and
+    bump the owning visits' versions in one transaction.
+    """
+    VitalSigns.fill_bmi(readings)
+    with transaction.atomic():
+        created = VitalSigns.objects.bulk_create(readings, batch_size=BULK_BATCH_SIZE)
+        add_readings(created)
+        Visit.touch({reading.visit_id for reading in created})
+    return created
+
+
+def insert_encounter_bundle(visit, user, data):
+    """
+    Persist a validated ``EncounterBundleSerializer`` payload for ``visit`` in
+    one transaction: the encounter, then one ``bulk_create`` per section.
+    Returns the created ids per section.
+    """
+    with transaction.atomic():
+        encounter = Encounter.objects.create(visit=visit, provider=user, **data['encounter'])
+        owner = {'visit': visit, 'encounter': encounter}
+
+        diagnoses = Diagnosis.objects.bulk_create(
+            [Diagnosis(diagnosed_by=user, **owner, **item) for item in data.get('diagnoses', [])],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+        prescriptions = []
+        for item in data.get('prescriptions', []):
+            index = item.pop('diagnosis_index', None)
+            if index is not None:
+                item['diagnosis'] = diagnoses[index]
+            prescriptions.append(Prescription(prescribed_by=user, **owner, **item))
+        prescriptions = Prescription.objects.bulk_create(prescriptions, batch_size=BULK_BATCH_SIZE)
+
+        lab_orders = LabTestOrder.objects.bulk_create(
+            [LabTestOrder(visit=visit, patient_id=visit.patient_id, requested_by=user, **item)
+             for item in data.get('lab_orders', [])],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        notes = Note.objects.bulk_create(
+            [Note(visit=visit, author=user, **item) for item in data.get('notes', [])],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        vitals = [VitalSigns(visit=visit, recorded_by=user, **item) for item in data.get('vitals', [])]
+        if vitals:
+            vitals = insert_vitals(vitals)  # also folds rollups and bumps the version
+        else:
+            Visit.touch([visit.pk])
+
+    return {
+        'encounter': encounter.pk,
+        'vitals': [obj.pk for obj in vitals],
+        'diagnoses': [obj.pk for obj in diagnoses],
+        'prescriptions': [obj.pk for obj in prescriptions],
+        'lab_orders': [obj.pk for obj in lab_orders],
+        'notes': [obj.pk for obj in notes],
+    }
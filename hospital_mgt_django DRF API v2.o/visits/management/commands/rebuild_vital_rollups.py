@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from visits.models import VitalSigns, VitalSignsRollup
+from visits.rollups import add_readings
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds hourly/daily vitals rollups from raw VitalSigns rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visit', type=int, help='Only rebuild this visit')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        readings = VitalSigns.objects.order_by('id')
+        rollups = VitalSignsRollup.objects.all()
+        if options['visit']:
+            readings = readings.filter(visit_id=options['visit'])
+            rollups = rollups.filter(visit_id=options['visit'])
+
+        # one transaction: a crash leaves the old rollups in place, and rollup
+        # writes for readings saved meanwhile wait for the rebuild, not land in it
+        with transaction.atomic():
+            deleted, _ = rollups.delete()
+            self.stdout.write(f"ℹ️ Cleared {deleted} rollup rows. Rebuilding...")
+
+            chunk_size = options['chunk_size']
+            batch, total = [], 0
+            for reading in readings.iterator(chunk_size=chunk_size):
+                batch.append(reading)
+                if len(batch) >= chunk_size:
+                    add_readings(batch)
+                    total += len(batch)
+                    batch = []
+                    self.stdout.write(f"… {total} readings folded")
+            add_readings(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"✔ Rebuilt rollups from {total} readings."))
@@ -0,0 +1,37 @@
+from django.db.models import F, Q
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from visits.models import Visit
+from visits.snapshots import FINISHED_STATUSES, build_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Builds detail snapshots for finished visits that have none (or a stale one)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visit', type=int, help='Only warm this visit')
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--all', action='store_true', help='Rebuild fresh snapshots too')
+
+    def handle(self, *args, **options):
+        visits = Visit.objects.filter(status__in=FINISHED_STATUSES)
+        if options['visit']:
+            visits = visits.filter(pk=options['visit'])
+        if not options['all']:
+            visits = visits.filter(
+                Q(snapshot__isnull=True)
+                | ~Q(snapshot__visit_version=F('version'))
+                | ~Q(snapshot__patient_version=F('patient__version'))
+                | Q(snapshot__built_at__lt=timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0))
+            )
+
+        chunk_size = options['chunk_size']
+        ids = list(visits.order_by('id').values_list('id', flat=True))
+        self.stdout.write(f"ℹ️ {len(ids)} visits to snapshot.")
+
+        total = 0
+        for start in range(0, len(ids), chunk_size):
+            total += build_snapshots(ids[start:start + chunk_size])
+            self.stdout.write(f"… {total} snapshots built")
+
+        self.stdout.write(self.style.SUCCESS(f"✔ Warmed {total} visit snapshots."))
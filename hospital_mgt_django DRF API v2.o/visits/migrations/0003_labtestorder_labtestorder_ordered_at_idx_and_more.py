@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0002_labtestcategory_alter_labtesttype_name_and_more'),
+        ('locations', '0001_initial'),
+        ('patients', '0004_alter_patient_mrn'),
+        ('visits', '0002_remove_labtestorder_ordered_by_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='labtestorder',
+            index=models.Index(fields=['ordered_at', 'id'], name='labtestorder_ordered_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['start_time', 'id'], name='visit_start_time_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0004_alter_patient_mrn'),
+        ('visits', '0003_labtestorder_labtestorder_ordered_at_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VitalSignsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('stats', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vitalsigns',
+            index=models.Index(fields=['visit', 'recorded_at'], name='vitals_visit_recorded_idx'),
+        ),
+        migrations.AddField(
+            model_name='vitalsignsrollup',
+            name='patient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vital_rollups', to='patients.patient'),
+        ),
+        migrations.AddField(
+            model_name='vitalsignsrollup',
+            name='visit',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vital_rollups', to='visits.visit'),
+        ),
+        migrations.AddIndex(
+            model_name='vitalsignsrollup',
+            index=models.Index(fields=['patient', 'resolution', 'bucket_start'], name='vitals_rollup_patient_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vitalsignsrollup',
+            constraint=models.UniqueConstraint(fields=('visit', 'resolution', 'bucket_start'), name='unique_vitals_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0004_vitalsignsrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visit',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0005_visit_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitSnapshot',
+            fields=[
+                ('visit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='visits.visit')),
+                ('visit_version', models.PositiveIntegerField()),
+                ('patient_version', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+                ('built_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
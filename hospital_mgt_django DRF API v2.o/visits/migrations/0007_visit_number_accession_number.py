@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0006_visitsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labtestorder',
+            name='accession_number',
+            field=models.CharField(editable=False, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='visit_number',
+            field=models.CharField(editable=False, max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import F
+
+CHUNK_SIZE = 2000
+
+
+def _reserve(IdentifierSequence, name, count):
+    """Take ``count`` numbers from sequence ``name`` (created at 1); returns the first."""
+    IdentifierSequence.objects.get_or_create(name=name, defaults={'next_value': 1})
+    IdentifierSequence.objects.filter(name=name).update(next_value=F('next_value') + count)
+    return IdentifierSequence.objects.values_list('next_value', flat=True).get(name=name) - count
+
+
+def backfill(apps, schema_editor):
+    IdentifierSequence = apps.get_model('identifiers', 'IdentifierSequence')
+    for model_name, field, sequence_name, prefix in (
+        ('Visit', 'visit_number', 'visit', 'VIS'),
+        ('LabTestOrder', 'accession_number', 'accession', 'ACC'),
+    ):
+        model = apps.get_model('visits', model_name)
+        pending = model.objects.filter(**{f'{field}__isnull': True}).order_by('id')
+        while True:
+            rows = list(pending.only('id')[:CHUNK_SIZE])
+            if not rows:
+                break
+            start = _reserve(IdentifierSequence, sequence_name, len(rows))
+            for number, row in enumerate(rows, start):
+                setattr(row, field, f'{prefix}{number:07d}')
+            model.objects.bulk_update(rows, [field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('identifiers', '0001_initial'),
+        ('visits', '0007_visit_number_accession_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
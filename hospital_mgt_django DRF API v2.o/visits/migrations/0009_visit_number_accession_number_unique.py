@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+import visits.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0008_backfill_visit_and_accession_numbers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='labtestorder',
+            name='accession_number',
+            field=models.CharField(default=visits.models.generate_accession_number, editable=False, max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='visit',
+            name='visit_number',
+            field=models.CharField(default=visits.models.generate_visit_number, editable=False, max_length=20, unique=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+        ('patients', '0006_patient_search_index'),
+        ('visits', '0009_visit_number_accession_number_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['patient', 'start_time', 'id'], name='visit_patient_start_idx'),
+        ),
+    ]
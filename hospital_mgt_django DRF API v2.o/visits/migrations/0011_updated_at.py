@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+# the timestamps incremental FHIR exports filtered on before updated_at existed
+LAST_CHANGE = {
+    'Visit': Coalesce('end_time', 'start_time'),
+    'VitalSigns': 'recorded_at',
+    'Diagnosis': 'diagnosed_at',
+    'Prescription': Coalesce('dispensed_at', 'prescribed_at'),
+    'LabTestOrder': Coalesce('completed_at', 'ordered_at'),
+}
+
+
+def backfill_updated_at(apps, schema_editor):
+    # otherwise every existing row looks changed "now" and the next _since export resends it all
+    for model_name, last_change in LAST_CHANGE.items():
+        model = apps.get_model('visits', model_name)
+        value = models.F(last_change) if isinstance(last_change, str) else last_change
+        model.objects.update(updated_at=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0010_visit_patient_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diagnosis',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='labtestorder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='visit',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='vitalsigns',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 from patients.models import Patient
 from users.models import User
 from laboratory.models import LabTestType
+from identifiers.allocator import next_identifier, register_sequence
+from core.etag import VersionedModelMixin
 
 PRIORITY_CHOICES = (
     ('routine', 'Routine'),
@@ -22,7 +25,19 @@ STATUS_CHOICES = (
 # VISIT & ENCOUNTER MODELS
 # -----------------------------
 
-class Visit(models.Model):
+register_sequence('visit', prefix='VIS', width=7)
+register_sequence('accession', prefix='ACC', width=7)
+
+
+def generate_visit_number():
+    return next_identifier('visit')
+
+
+def generate_accession_number():
+    return next_identifier('accession')
+
+
+class Visit(VersionedModelMixin, models.Model):
     """
     Represents a single patient encounter (OPD, IPD, Emergency, etc.)
     """
@@ -46,6 +61,7 @@ class Visit(models.Model):
         ('discharged', 'Discharged'),
     )
 
+    visit_number = models.CharField(max_length=20, unique=True, editable=False, default=generate_visit_number)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='visits')
     start_time = models.DateTimeField(default=timezone.now)
     end_time = models.DateTimeField(null=True, blank=True)
@@ -55,10 +71,30 @@ class Visit(models.Model):
     reason_for_visit = models.TextField(blank=True, null=True)
     referring_doctor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='referrals')
     visit_notes = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # bumped on any write to the visit or its children (ETag / snapshots)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination key for /api/visits/
+            models.Index(fields=['start_time', 'id'], name='visit_start_time_idx'),
+            # latest visit per patient (patient registry list)
+            models.Index(fields=['patient', 'start_time', 'id'], name='visit_patient_start_idx'),
+        ]
 
     def __str__(self):
         return f"{self.patient} - {self.visit_type} ({self.start_time.strftime('%Y-%m-%d')})"
 
+    @classmethod
+    def touch(cls, ids):
+        """
+        Bump the version of the given visit ids (a list or a values() subquery)
+        and drop their cached detail snapshots.
+        """
+        cls.objects.filter(pk__in=ids).update(version=F('version') + 1)
+        VisitSnapshot.objects.filter(visit_id__in=ids).delete()
+
 
 class Encounter(models.Model):
     """
@@ -99,20 +135,93 @@ class VitalSigns(models.Model):
     bmi = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
     recorded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     recorded_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # per-visit time range scans (trend charts, rollup rebuilds)
+            models.Index(fields=['visit', 'recorded_at'], name='vitals_visit_recorded_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so an edit that moves a reading can fix its old rollup bucket
+        instance._loaded_recorded_at = instance.__dict__.get('recorded_at')
+        return instance
+
+    @staticmethod
+    def compute_bmi(height, weight):
+        """BMI from height (cm) and weight (kg), or None when either is missing."""
+        if height and weight and height > 0 and weight > 0:
+            height_meters = float(height) / 100
+            return round(float(weight) / (height_meters ** 2), 2)
+        return None  # Or set to 0 depending on use case
+
+    @classmethod
+    def fill_bmi(cls, readings):
+        """Compute BMI for a whole batch in one pass (bulk_create skips save())."""
+        for reading in readings:
+            reading.bmi = cls.compute_bmi(reading.height, reading.weight)
+        return readings
 
     def save(self, *args, **kwargs):
-        if self.height and self.weight and self.height > 0 and self.weight > 0:
-            height_meters = float(self.height) / 100
-            weight_kg = float(self.weight)
-            self.bmi = round(weight_kg / (height_meters ** 2), 2)
-        else:
-            self.bmi = None  # Or set to 0 depending on use case
+        self.bmi = self.compute_bmi(self.height, self.weight)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.visit} - Vitals ({self.recorded_at})"
 
 
+class VitalSignsRollup(models.Model):
+    """
+    Hourly / daily min-max-mean of a visit's vitals, maintained incrementally
+    as readings arrive (see visits/rollups.py). Charting a long admission reads
+    these rows instead of every VitalSigns row.
+
+    ``stats`` = {"heart_rate": {"n": 12, "sum": 1010.0, "min": 71, "max": 96}, ...}
+    """
+    RESOLUTION_CHOICES = (
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    )
+
+    visit = models.ForeignKey(Visit, on_delete=models.CASCADE, related_name='vital_rollups')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='vital_rollups')
+    resolution = models.CharField(max_length=4, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    stats = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['visit', 'resolution', 'bucket_start'], name='unique_vitals_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['patient', 'resolution', 'bucket_start'], name='vitals_rollup_patient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.visit_id} - {self.resolution} rollup ({self.bucket_start})"
+
+
+class VisitSnapshot(models.Model):
+    """
+    Rendered ``VisitDetailSerializer`` output of a finished visit (see
+    visits/snapshots.py). Only served while ``visit_version`` / ``patient_version``
+    still match the live rows; any write to the visit deletes it.
+    """
+    visit = models.OneToOneField(Visit, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    visit_version = models.PositiveIntegerField()
+    patient_version = models.PositiveIntegerField()
+    data = models.JSONField()
+    built_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Snapshot of visit {self.visit_id} (v{self.visit_version})"
+
+
 class Diagnosis(models.Model):
     """
     Clinical diagnosis made during a visit/encounter
@@ -125,6 +234,7 @@ class Diagnosis(models.Model):
     notes = models.TextField(blank=True, null=True)
     diagnosed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     diagnosed_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.condition} - {self.visit}"
@@ -147,6 +257,7 @@ class Prescription(models.Model):
     prescribed_at = models.DateTimeField(default=timezone.now)
     is_dispensed = models.BooleanField(default=False)
     dispensed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.drug} - {self.visit}"
@@ -159,6 +270,7 @@ class LabTestOrder(models.Model):
     visit = models.ForeignKey(Visit, on_delete=models.CASCADE, related_name='lab_orders')
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='lab_orders')
 
+    accession_number = models.CharField(max_length=20, unique=True, editable=False, default=generate_accession_number)
     test_type = models.ForeignKey(LabTestType, on_delete=models.SET_NULL, null=True)
     requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='requested_lab_tests')
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='routine')
@@ -170,6 +282,13 @@ class LabTestOrder(models.Model):
 
     result = models.TextField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # keyset pagination key for /api/lab/orders/
+            models.Index(fields=['ordered_at', 'id'], name='labtestorder_ordered_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.test_type} - {self.patient}"
@@ -0,0 +1,226 @@
+# visits/rollups.py
+"""
+Incremental hourly/daily vitals rollups and trend downsampling.
+
+New readings are folded into their buckets (count/sum/min/max per metric), so
+keeping the rollups current costs one read + one write per touched bucket,
+not a rescan. Edits and deletes can't be "subtracted" from a min/max, so the
+affected buckets are recomputed from the raw rows of that one hour/day.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import Visit, VitalSigns, VitalSignsRollup
+
+METRICS = (
+    'systolic_bp',
+    'diastolic_bp',
+    'heart_rate',
+    'respiratory_rate',
+    'oxygen_saturation',
+    'temperature',
+)
+
+RESOLUTIONS = {
+    'hour': datetime.timedelta(hours=1),
+    'day': datetime.timedelta(days=1),
+}
+
+
+def bucket_start(timestamp, resolution):
+    """Truncate to the start of the hour/day (local hospital time for days)."""
+    local = timezone.localtime(timestamp)
+    if resolution == 'day':
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def _fold(stats, metric, value):
+    value = float(value)
+    entry = stats.get(metric)
+    if entry is None:
+        stats[metric] = {'n': 1, 'sum': value, 'min': value, 'max': value}
+    else:
+        entry['n'] += 1
+        entry['sum'] += value
+        entry['min'] = min(entry['min'], value)
+        entry['max'] = max(entry['max'], value)
+
+
+def _merge(stats, other):
+    for metric, entry in other.items():
+        current = stats.get(metric)
+        if current is None:
+            stats[metric] = dict(entry)
+        else:
+            current['n'] += entry['n']
+            current['sum'] += entry['sum']
+            current['min'] = min(current['min'], entry['min'])
+            current['max'] = max(current['max'], entry['max'])
+
+
+def add_readings(readings):
+    """Fold newly inserted ``VitalSigns`` rows into their hourly/daily buckets."""
+    if not readings:
+        return
+
+    patients = dict(
+        Visit.objects.filter(id__in={r.visit_id for r in readings}).values_list('id', 'patient_id')
+    )
+    deltas = defaultdict(dict)
+    for reading in readings:
+        for resolution in RESOLUTIONS:
+            stats = deltas[(reading.visit_id, resolution, bucket_start(reading.recorded_at, resolution))]
+            for metric in METRICS:
+                value = getattr(reading, metric)
+                if value is not None:
+                    _fold(stats, metric, value)
+
+    try:
+        _apply(deltas, patients)
+    except IntegrityError:
+        # a concurrent writer created one of our buckets first; retry as updates
+        _apply(deltas, patients)
+
+
+def _apply(deltas, patients):
+    with transaction.atomic():
+        existing = {
+            (r.visit_id, r.resolution, r.bucket_start): r
+            for r in VitalSignsRollup.objects.select_for_update().filter(
+                visit_id__in={key[0] for key in deltas},
+                bucket_start__in={key[2] for key in deltas},
+            )
+        }
+        to_create, to_update = [], []
+        for key, stats in deltas.items():
+            if not stats:
+                continue
+            row = existing.get(key)
+            if row is None:
+                visit_id, resolution, start = key
+                to_create.append(VitalSignsRollup(
+                    visit_id=visit_id, patient_id=patients[visit_id],
+                    resolution=resolution, bucket_start=start, stats=stats,
+                ))
+            else:
+                _merge(row.stats, stats)
+                to_update.append(row)
+        VitalSignsRollup.objects.bulk_create(to_create)
+        VitalSignsRollup.objects.bulk_update(to_update, ['stats'])
+
+
+def rebuild_bucket(visit_id, resolution, start):
+    """Recompute one bucket from raw readings (after an edit or delete)."""
+    aggregates = {}
+    for metric in METRICS:
+        aggregates[f'{metric}__n'] = Count(metric)
+        aggregates[f'{metric}__sum'] = Sum(metric)
+        aggregates[f'{metric}__min'] = Min(metric)
+        aggregates[f'{metric}__max'] = Max(metric)
+    totals = VitalSigns.objects.filter(
+        visit_id=visit_id,
+        recorded_at__gte=start,
+        recorded_at__lt=start + RESOLUTIONS[resolution],
+    ).aggregate(**aggregates)
+
+    stats = {}
+    for metric in METRICS:
+        if totals[f'{metric}__n']:
+            stats[metric] = {
+                key: float(totals[f'{metric}__{key}']) if key != 'n' else totals[f'{metric}__n']
+                for key in ('n', 'sum', 'min', 'max')
+            }
+
+    if not stats:
+        VitalSignsRollup.objects.filter(visit_id=visit_id, resolution=resolution, bucket_start=start).delete()
+        return
+    patient_id = Visit.objects.filter(pk=visit_id).values_list('patient_id', flat=True).first()
+    if patient_id is None:
+        return
+    VitalSignsRollup.objects.update_or_create(
+        visit_id=visit_id, resolution=resolution, bucket_start=start,
+        defaults={'patient_id': patient_id, 'stats': stats},
+    )
+
+
+def rebuild_for_reading(visit_id, *timestamps):
+    """Recompute every bucket containing any of ``timestamps`` for one visit."""
+    keys = {
+        (resolution, bucket_start(ts, resolution))
+        for ts in timestamps if ts is not None
+        for resolution in RESOLUTIONS
+    }
+    for resolution, start in keys:
+        rebuild_bucket(visit_id, resolution, start)
+
+
+# -----------------------------
+# TREND SERIES
+# -----------------------------
+
+def rollup_series(rows, metric):
+    """
+    Collapse rollup rows (possibly several visits per bucket) into
+    ``[{t, n, min, max, mean}]`` ordered by time.
+    """
+    buckets = {}
+    for start, stats in rows:
+        entry = stats.get(metric)
+        if not entry:
+            continue
+        if start in buckets:
+            _merge(buckets[start], {metric: entry})
+        else:
+            buckets[start] = {metric: dict(entry)}
+    series = []
+    for start in sorted(buckets):
+        entry = buckets[start][metric]
+        series.append({
+            't': start,
+            'n': entry['n'],
+            'min': entry['min'],
+            'max': entry['max'],
+            'mean': round(entry['sum'] / entry['n'], 2),
+        })
+    return series
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of ``[(x, y, ...), ...]``
+    (x ascending) to at most ``threshold`` points, keeping the visual shape
+    (peaks/troughs). Extra tuple items ride along untouched.
+    """
+    length = len(points)
+    if threshold >= length or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (length - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # average of the next bucket is the third triangle vertex
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, length)
+        span = avg_end - avg_start or 1
+        avg_x = sum(p[0] for p in points[avg_start:avg_end]) / span
+        avg_y = sum(p[1] for p in points[avg_start:avg_end]) / span
+
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = points[a][0], points[a][1]
+        best, best_area = range_start, -1.0
+        for j in range(range_start, range_end):
+            x, y = points[j][0], points[j][1]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
@@ -37,6 +37,30 @@ class VitalSignsWriteSerializer(serializers.ModelSerializer):
         }
 
 
+class VitalSignsBulkItemSerializer(VitalSignsWriteSerializer):
+    """
+    One reading inside a bulk upload. ``visit`` is checked against the set of
+    existing visit ids passed in context (fetched once for the whole batch)
+    instead of one lookup per row.
+    """
+    visit = serializers.IntegerField()
+    recorded_at = serializers.DateTimeField(required=False)
+
+    class Meta(VitalSignsWriteSerializer.Meta):
+        exclude = ['bmi', 'recorded_by']
+
+    def validate_visit(self, value):
+        if value not in self.context['visit_ids']:
+            raise serializers.ValidationError("Visit not found.")
+        return value
+
+    def validate(self, data):
+        bmi = VitalSigns.compute_bmi(data.get('height'), data.get('weight'))
+        if bmi is not None and bmi >= 100:
+            raise serializers.ValidationError("Implausible height/weight combination.")
+        return data
+
+
 # 🔹 2. Diagnosis Serializer
 class DiagnosisSerializer(serializers.ModelSerializer):
     diagnosed_by = UserSerializer(read_only=True)
@@ -72,20 +96,21 @@ class PrescriptionWriteSerializer(serializers.ModelSerializer):
 
 # 🔹 4. Lab Test Order Serializer
 class LabTestOrderSerializer(serializers.ModelSerializer):
-    ordered_by = UserSerializer(read_only=True)
+    requested_by = UserSerializer(read_only=True)
     test_type = serializers.StringRelatedField()
 
     class Meta:
         model = LabTestOrder
         exclude = ['visit']
-        read_only_fields = ['ordered_at', 'completed_at', 'ordered_by']
+        read_only_fields = ['ordered_at', 'completed_at', 'requested_by']
 
 
 class LabTestOrderWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = LabTestOrder
         fields = '__all__'
-        read_only_fields = ['completed_at', 'result']
+        # visit / patient come from the URL, requested_by from the request
+        read_only_fields = ['visit', 'patient', 'requested_by', 'completed_at', 'result']
 
 
 # 🔹 5. Radiology Order Serializer
@@ -196,7 +221,54 @@ class EncounterWriteSerializer(serializers.ModelSerializer):
         ]
 
 
-# 🔹 11. Visit Detail Serializer
+# 🔹 10b. Encounter Bundle (one consultation in one request)
+class BundlePrescriptionSerializer(PrescriptionWriteSerializer):
+    # link to a diagnosis created in the same bundle by its position in "diagnoses"
+    diagnosis_index = serializers.IntegerField(required=False, min_value=0, write_only=True)
+
+
+class EncounterBundleSerializer(serializers.Serializer):
+    """
+    Validates a whole consultation with the existing write serializers.
+    Fields the server fills in (visit, encounter, patient, acting user) are
+    removed from every section, so clients never send them.
+    """
+    MANAGED_FIELDS = (
+        'visit', 'encounter', 'patient',
+        'recorded_by', 'diagnosed_by', 'prescribed_by', 'requested_by', 'author',
+    )
+
+    encounter = EncounterWriteSerializer()
+    vitals = VitalSignsWriteSerializer(many=True, required=False)
+    diagnoses = DiagnosisWriteSerializer(many=True, required=False)
+    prescriptions = BundlePrescriptionSerializer(many=True, required=False)
+    lab_orders = LabTestOrderWriteSerializer(many=True, required=False)
+    notes = NoteWriteSerializer(many=True, required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+            for name in self.MANAGED_FIELDS:
+                child.fields.pop(name, None)
+        return fields
+
+    def validate(self, data):
+        diagnoses = len(data.get('diagnoses', []))
+        errors = {}
+        for index, item in enumerate(data.get('prescriptions', [])):
+            if 'diagnosis_index' not in item:
+                continue
+            if item.get('diagnosis') is not None:
+                errors[index] = "Pass either diagnosis or diagnosis_index, not both."
+            elif item['diagnosis_index'] >= diagnoses:
+                errors[index] = "diagnosis_index does not refer to a diagnosis in this bundle."
+        if errors:
+            raise serializers.ValidationError({'prescriptions': errors})
+        return data
+
+
+
 class VisitDetailSerializer(serializers.ModelSerializer):
     patient = PatientSerializer(read_only=True)
     encounters = EncounterSerializer(many=True, read_only=True)
@@ -214,6 +286,7 @@ class VisitDetailSerializer(serializers.ModelSerializer):
         model = Visit
         fields = [
             'id',
+            'visit_number',
             'start_time',
             'end_time',
             'visit_type',
@@ -243,7 +316,7 @@ class VisitListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Visit
-        fields = ['id', 'patient', 'visit_type', 'status', 'start_time', 'end_time', 'location']
+        fields = ['id', 'visit_number', 'patient', 'visit_type', 'status', 'start_time', 'end_time', 'location']
         read_only_fields = ['start_time', 'end_time']
 
 
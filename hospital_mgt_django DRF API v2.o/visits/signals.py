@@ -0,0 +1,123 @@
+# visits/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from laboratory.models import LabTestCategory, LabTestType
+from locations.models import Location
+from pharmacy.models import Drug
+from radiology.models import RadiologyType
+from users.models import User
+from .models import (
+    Visit,
+    Encounter,
+    VitalSigns,
+    Diagnosis,
+    Prescription,
+    LabTestOrder,
+    RadiologyOrder,
+    Procedure,
+    Referral,
+    FollowUp,
+    Note,
+)
+from .rollups import add_readings, rebuild_for_reading
+
+# children rendered inside the visit detail; any write bumps Visit.version
+VISIT_CHILDREN = (
+    Encounter,
+    VitalSigns,
+    Diagnosis,
+    Prescription,
+    LabTestOrder,
+    RadiologyOrder,
+    Procedure,
+    Referral,
+    FollowUp,
+    Note,
+)
+
+
+# 🔹 Visit versioning (ETag)
+@receiver(post_save, sender=Visit)
+def bump_visit_version(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    Visit.touch([instance.pk])
+
+
+def bump_parent_visit_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    Visit.touch([instance.visit_id])
+
+
+for _model in VISIT_CHILDREN:
+    post_save.connect(bump_parent_visit_version, sender=_model, dispatch_uid=f'visit-version-save-{_model.__name__}')
+    post_delete.connect(bump_parent_visit_version, sender=_model, dispatch_uid=f'visit-version-delete-{_model.__name__}')
+
+
+# Rows of other apps whose text is frozen into the visit detail (and its
+# snapshot): ``{sender: ((child model, lookup to the sender), ...)}``.
+RENDERED_RELATIONS = {
+    Drug: ((Prescription, 'drug'),),
+    LabTestType: ((LabTestOrder, 'test_type'),),
+    LabTestCategory: ((LabTestOrder, 'test_type__category'),),  # part of the test type's name
+    RadiologyType: ((RadiologyOrder, 'radiology_type'),),
+    Location: ((Referral, 'to_location'),),
+    User: (
+        (Encounter, 'provider'),
+        (VitalSigns, 'recorded_by'),
+        (Diagnosis, 'diagnosed_by'),
+        (Prescription, 'prescribed_by'),
+        (LabTestOrder, 'requested_by'),
+        (RadiologyOrder, 'ordered_by'),
+        (Procedure, 'performed_by'),
+        (Referral, 'from_provider'),
+        (FollowUp, 'assigned_to'),
+        (Note, 'author'),
+    ),
+}
+# the only user fields a visit renders (UserSerializer); a login's
+# save(update_fields=['last_login']) leaves its snapshots alone
+RENDERED_USER_FIELDS = {'email', 'role', 'is_active', 'is_staff'}
+
+
+def bump_rendering_visit_versions(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Bump the visits that render ``instance``. Deletes are caught on
+    pre_delete: the foreign keys are SET_NULL, so afterwards nothing points here.
+    """
+    if raw:
+        return
+    if sender is User and update_fields and not RENDERED_USER_FIELDS.intersection(update_fields):
+        return
+    visit_ids = set()
+    for model, lookup in RENDERED_RELATIONS[sender]:
+        visit_ids.update(model.objects.filter(**{lookup: instance.pk}).values_list('visit_id', flat=True))
+    if visit_ids:
+        Visit.touch(visit_ids)
+
+
+for _model in RENDERED_RELATIONS:
+    post_save.connect(bump_rendering_visit_versions, sender=_model, dispatch_uid=f'visit-rendered-save-{_model.__name__}')
+    pre_delete.connect(bump_rendering_visit_versions, sender=_model, dispatch_uid=f'visit-rendered-delete-{_model.__name__}')
+
+
+# 🔹 Vitals rollups
+
+
+@receiver(post_save, sender=VitalSigns)
+def update_vitals_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        add_readings([instance])
+    else:
+        previous = getattr(instance, '_loaded_recorded_at', None)
+        rebuild_for_reading(instance.visit_id, instance.recorded_at, previous)
+    instance._loaded_recorded_at = instance.recorded_at
+
+
+@receiver(post_delete, sender=VitalSigns)
+def remove_from_vitals_rollups(sender, instance, **kwargs):
+    rebuild_for_reading(instance.visit_id, instance.recorded_at)
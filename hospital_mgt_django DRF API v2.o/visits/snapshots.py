@@ -0,0 +1,66 @@
+# visits/snapshots.py
+"""
+Materialized detail snapshots for finished visits.
+
+A completed / discharged / cancelled visit is read far more often than it is
+written, so its ``VisitDetailSerializer`` output is stored once as JSON and
+served from a single primary-key lookup afterwards. A snapshot is trusted only
+while the versions it was built from match the live visit and patient (see
+``Visit.touch`` and the version signals), and only on the day it was built,
+since the embedded patient ``age`` is computed.
+"""
+import json
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.prefetch import plan_queryset
+from .models import Visit, VisitSnapshot
+from .serializers import VisitDetailSerializer
+
+FINISHED_STATUSES = ('completed', 'discharged', 'cancelled')
+
+
+def to_json(data):
+    """Serializer output exactly as the API would render it."""
+    return json.loads(JSONRenderer().render(data))
+
+
+def is_fresh(visit_version, patient_version, snapshot_visit_version, snapshot_patient_version, built_at):
+    return (
+        snapshot_visit_version == visit_version
+        and snapshot_patient_version == patient_version
+        and built_at is not None
+        and timezone.localdate(built_at) == timezone.localdate()
+    )
+
+
+def store_snapshots(entries):
+    """Upsert ``[(visit_id, visit_version, patient_version, data), ...]``."""
+    now = timezone.now()
+    VisitSnapshot.objects.bulk_create(
+        [
+            VisitSnapshot(
+                visit_id=visit_id, visit_version=visit_version,
+                patient_version=patient_version, data=data, built_at=now,
+            )
+            for visit_id, visit_version, patient_version, data in entries
+        ],
+        update_conflicts=True,
+        unique_fields=['visit'],
+        update_fields=['visit_version', 'patient_version', 'data', 'built_at'],
+    )
+
+
+def build_snapshots(visit_ids):
+    """Render and store snapshots for the finished visits among ``visit_ids``; returns the count."""
+    serializer = VisitDetailSerializer()
+    queryset = plan_queryset(
+        Visit.objects.filter(pk__in=visit_ids, status__in=FINISHED_STATUSES), serializer
+    ).select_related('patient')
+    entries = [
+        (visit.pk, visit.version, visit.patient.version, to_json(VisitDetailSerializer(visit).data))
+        for visit in queryset
+    ]
+    store_snapshots(entries)
+    return len(entries)
@@ -1,3 +1,480 @@
+import datetime
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from laboratory.models import LabTestCategory, LabTestType
+from locations.models import Location
+from patients.models import Patient
+from pharmacy.models import Drug
+from radiology.models import RadiologyType
+from core.fieldsets import parse_fieldset, prune_serializer
+from core.prefetch import get_query_plan
+from users.models import User
+from .rollups import lttb
+from .models import (
+    Diagnosis, Encounter, FollowUp, LabTestOrder, Note, Prescription, Procedure, RadiologyOrder, Referral, Visit,
+    VisitSnapshot, VitalSigns, VitalSignsRollup,
+)
+
+
+class VisitETagTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('etag.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        patient = Patient.objects.create(first_name='Ada', last_name='Etag', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=patient)
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(f'/api/visits/{self.visit.pk}/', headers=headers)
+
+    def test_stale_instance_save_changes_etag(self):
+        stale = Visit.objects.get(pk=self.visit.pk)  # holds version 1
+        Visit.touch([self.visit.pk])
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+        stale.visit_notes = 'edited from an old copy'
+        stale.save()
+
+        self.assertEqual(Visit.objects.get(pk=self.visit.pk).version, 3)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_non_numeric_id_is_404(self):
+        self.assertEqual(self.client.get('/api/visits/abc/').status_code, 404)
+
+    def test_snapshot_data_only_read_for_a_body(self):
+        Visit.objects.filter(pk=self.visit.pk).update(status='completed')
+        built = self.get()
+        self.assertTrue(VisitSnapshot.objects.filter(visit=self.visit).exists())
+
+        with CaptureQueriesContext(connection) as served:
+            cached = self.get()
+        self.assertEqual(cached.data, built.data)
+        self.assertTrue(any('"data"' in q['sql'] for q in served.captured_queries))
+
+        with CaptureQueriesContext(connection) as not_modified:
+            self.assertEqual(self.get(cached['ETag']).status_code, 304)
+        self.assertFalse(any('"data"' in q['sql'] for q in not_modified.captured_queries))
+
+    def test_snapshot_rebuilt_after_rendered_rows_change(self):
+        Note.objects.create(visit=self.visit, author=self.doctor, title='t', content='c')
+        test_type = LabTestType.objects.create(name='CBC', category=LabTestCategory.objects.create(name='Haematology'))
+        LabTestOrder.objects.create(visit=self.visit, patient=self.visit.patient, test_type=test_type,
+                                    requested_by=self.doctor)
+        Visit.objects.filter(pk=self.visit.pk).update(status='completed')
+        etag = self.get()['ETag']
+        self.assertTrue(VisitSnapshot.objects.filter(visit=self.visit).exists())
+
+        self.doctor.last_login = timezone.now()
+        self.doctor.save(update_fields=['last_login'])  # not rendered: the snapshot stays
+        self.assertEqual(self.get(etag).status_code, 304)
+
+        self.doctor.email = 'renamed.doctor@example.com'
+        self.doctor.save()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['notes'][0]['author']['email'], 'renamed.doctor@example.com')
+
+        etag = response['ETag']
+        test_type.name = 'Full blood count'
+        test_type.save()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['lab_orders'][0]['test_type'], 'Haematology: Full blood count')
+
+        etag = response['ETag']
+        test_type.delete()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['lab_orders'][0]['test_type'])
+
+
+class EncounterBundleTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('bundle.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        patient = Patient.objects.create(first_name='Ada', last_name='Bundle', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=patient)
+        self.drug = Drug.objects.create(name='Amoxil', generic_name='amoxicillin', strength='500mg', form='capsule')
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(f'/api/visits/{self.visit.pk}/', headers=headers)
+
+    def post(self, body):
+        return self.client.post(f'/api/visits/{self.visit.pk}/encounter-bundle/', body, format='json')
+
+    def test_bundle_is_written_and_changes_the_etag(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+        response = self.post({
+            'encounter': {'chief_complaint': 'cough'},
+            'vitals': [{'height': 170, 'weight': 65}],
+            'diagnoses': [{'condition': 'Bronchitis'}],
+            'prescriptions': [{'drug': self.drug.pk, 'dosage': '1', 'frequency': 'tds', 'diagnosis_index': 0}],
+            'notes': [{'title': 'Plan', 'content': 'Review in a week'}],
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        prescription = Prescription.objects.get(pk=response.data['prescriptions'][0])
+        self.assertEqual(prescription.diagnosis_id, response.data['diagnoses'][0])
+        self.assertEqual((prescription.encounter_id, prescription.prescribed_by_id),
+                         (response.data['encounter'], self.doctor.pk))
+        self.assertEqual(float(VitalSigns.objects.get(pk=response.data['vitals'][0]).bmi), 22.49)
+
+        after = self.get(etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], etag)
+        self.assertEqual(len(after.data['notes']), 1)
+        self.assertEqual(self.get(after['ETag']).status_code, 304)
+
+    def test_child_row_change_bumps_the_version(self):
+        note = Note.objects.create(visit=self.visit, author=self.doctor, title='t', content='c')
+        version = Visit.objects.get(pk=self.visit.pk).version
+        etag = self.get()['ETag']
+
+        response = self.client.patch(f'/api/visits/{self.visit.pk}/notes/{note.pk}/', {'content': 'edited'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Visit.objects.get(pk=self.visit.pk).version, version + 1)
+        self.assertEqual(self.get(etag).status_code, 200)
+
+    def test_invalid_bundle_writes_nothing(self):
+        version = Visit.objects.get(pk=self.visit.pk).version
+        response = self.post({
+            'encounter': {'chief_complaint': 'cough'},
+            'diagnoses': [{'condition': 'Bronchitis'}],
+            'prescriptions': [{'drug': self.drug.pk, 'dosage': '1', 'frequency': 'tds', 'diagnosis_index': 1}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('prescriptions', response.data)
+        self.assertFalse(Encounter.objects.exists() or Diagnosis.objects.exists())
+        self.assertEqual(Visit.objects.get(pk=self.visit.pk).version, version)
+
+
+class VisitQueryPlanTests(TestCase):
+    """Planned endpoints cost the same number of queries however many rows they render."""
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('plan.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Plan', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=self.patient)
+        self.rounds = 0
+        self.add_children(self.visit)
+
+    def add_children(self, visit):
+        # every round brings its own related rows, so nothing is served from a shared join
+        self.rounds += 1
+        n = self.rounds
+        staff = User.objects.create_user(f'plan.staff{n}@example.com', 'pw', role='Doctor')
+        test_type = LabTestType.objects.create(name=f'Test {n}', category=LabTestCategory.objects.create(name=f'Cat {n}'))
+        drug = Drug.objects.create(name=f'Drug {n}', generic_name=f'generic{n}', strength='1mg', form='tablet')
+        location = Location.objects.create(name=f'Ward {n}', location_type='IPD')
+        encounter = Encounter.objects.create(visit=visit, provider=staff, chief_complaint='cough')
+        diagnosis = Diagnosis.objects.create(visit=visit, encounter=encounter, condition='Flu', diagnosed_by=staff)
+        VitalSigns.objects.create(visit=visit, recorded_by=staff, heart_rate=70)
+        Prescription.objects.create(visit=visit, encounter=encounter, diagnosis=diagnosis, drug=drug,
+                                    dosage='1', frequency='tds', prescribed_by=staff)
+        LabTestOrder.objects.create(visit=visit, patient=visit.patient, test_type=test_type, requested_by=staff)
+        RadiologyOrder.objects.create(visit=visit, radiology_type=RadiologyType.objects.create(name=f'X-ray {n}'),
+                                      ordered_by=staff)
+        Procedure.objects.create(visit=visit, name='Dressing', description='d', performed_by=staff)
+        Referral.objects.create(visit=visit, from_provider=staff, to_location=location, reason='specialist')
+        FollowUp.objects.create(visit=visit, scheduled_for='2030-01-01T00:00Z', reason='review', assigned_to=staff)
+        Note.objects.create(visit=visit, author=staff, title='t', content='c')
+
+    def assertConstantQueries(self, url, grow):
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        grow()
+        with self.assertNumQueries(len(before)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def grow_visit(self):
+        self.add_children(self.visit)
+        self.add_children(self.visit)
+
+    def grow_visits(self):
+        self.add_children(Visit.objects.create(patient=self.patient))
+        self.add_children(Visit.objects.create(patient=self.patient))
+
+    def test_visit_list(self):
+        self.assertConstantQueries('/api/visits/', self.grow_visits)
+
+    def test_visit_detail(self):
+        self.assertConstantQueries(f'/api/visits/{self.visit.pk}/', self.grow_visit)
+
+    def test_nested_lists(self):
+        for child in ('encounters', 'vitals', 'diagnoses', 'prescriptions', 'lab-orders', 'radiology-orders',
+                      'procedures', 'referrals', 'followups', 'notes'):
+            with self.subTest(child=child):
+                self.assertConstantQueries(f'/api/visits/{self.visit.pk}/{child}/', self.grow_visit)
+
+    def test_nested_lab_order_create(self):
+        test_type = LabTestType.objects.first()
+        response = self.client.post(f'/api/visits/{self.visit.pk}/lab-orders/', {'test_type': test_type.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        order = LabTestOrder.objects.get(pk=response.json()['id'])
+        self.assertEqual((order.patient_id, order.requested_by_id), (self.patient.pk, self.doctor.pk))
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user('sparse.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Sparse', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=self.patient)
+        self.encounter = Encounter.objects.create(visit=self.visit, provider=self.doctor, chief_complaint='cough')
+
+    def get(self, **params):
+        response = self.client.get(f'/api/visits/{self.visit.pk}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_nested_pruning(self):
+        self.assertEqual(
+            self.get(fields='id,patient.first_name,encounters.chief_complaint'),
+            {'id': self.visit.pk, 'patient': {'first_name': 'Ada'}, 'encounters': [{'chief_complaint': 'cough'}]},
+        )
+
+    def test_unexpanded_relations_collapse_to_ids(self):
+        self.assertEqual(
+            self.get(fields='id,patient,encounters'),
+            {'id': self.visit.pk, 'patient': self.patient.pk, 'encounters': [self.encounter.pk]},
+        )
+        expanded = self.get(fields='id', expand='patient')
+        self.assertEqual(set(expanded), {'id', 'patient'})
+        self.assertEqual(expanded['patient']['last_name'], 'Sparse')
+
+    def test_list(self):
+        response = self.client.get('/api/visits/', {'fields': 'id,patient'})
+        self.assertEqual(response.json()['results'], [{'id': self.visit.pk, 'patient': self.patient.pk}])
+
+    def test_writes_ignore_the_params(self):
+        response = self.client.patch(
+            f'/api/visits/{self.visit.pk}/?fields=id&expand=patient', {'visit_notes': 'seen'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['visit_notes'], 'seen')
+        self.assertEqual(response.json()['patient'], self.patient.pk)
+
+    def test_unknown_names_are_400(self):
+        cases = {
+            'nonexistent': ('fields', 'nonexistent'),
+            'id,patient.nope': ('fields', 'patient.nope'),
+            'id,encounters.chief_complaint,encounters.nope': ('fields', 'encounters.nope'),
+            'id.value': ('fields', 'id.value'),
+        }
+        for fields, (param, name) in cases.items():
+            with self.subTest(fields=fields):
+                response = self.client.get(f'/api/visits/{self.visit.pk}/', {'fields': fields})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(name, response.json()[param])
+        response = self.client.get('/api/visits/', {'fields': 'id', 'expand': 'patient,nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'expand': 'Unknown field(s): nope.'})
+
+    def test_source_star_serializer_is_not_collapsed(self):
+        class SummarySerializer(serializers.Serializer):
+            status = serializers.CharField()
+            visit_type = serializers.CharField()
+
+        class VisitRowSerializer(serializers.ModelSerializer):
+            summary = SummarySerializer(source='*', read_only=True)
+
+            class Meta:
+                model = Visit
+                fields = ['id', 'summary']
+
+        serializer = prune_serializer(VisitRowSerializer(self.visit), parse_fieldset('id,summary'))
+        self.assertEqual(serializer.data['summary'], {'status': self.visit.status, 'visit_type': self.visit.visit_type})
+
+
+class QueryPlanSourceTests(TestCase):
+    def test_dotted_sources_and_declared_lookups(self):
+        class DiagnosisRowSerializer(serializers.ModelSerializer):
+            mrn = serializers.CharField(source='visit.patient.mrn')
+            complaint = serializers.CharField(source='encounter.chief_complaint')
+            patient_id = serializers.PrimaryKeyRelatedField(source='visit.patient', read_only=True)
+            prescriptions = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Diagnosis
+                fields = ['id', 'mrn', 'complaint', 'patient_id', 'prescriptions']
+                plan_prefetch_related = ['prescriptions__drug']
+
+        select, prefetch = get_query_plan(DiagnosisRowSerializer)
+        self.assertEqual(select, ['visit__patient', 'encounter', 'visit'])
+        self.assertEqual(prefetch, ['prescriptions__drug'])
+
+
+class VitalSignsBulkTests(TestCase):
+    def setUp(self):
+        self.nurse = User.objects.create_user('bulk.nurse@example.com', 'pw', role='Nurse')
+        self.client = APIClient()
+        self.client.force_authenticate(self.nurse)
+        patient = Patient.objects.create(first_name='Ada', last_name='Bulk', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=patient)
+
+    def post(self, readings):
+        return self.client.post('/api/vitals/bulk/', readings, format='json')
+
+    def test_fills_bmi_and_bumps_visit_version(self):
+        response = self.post([
+            {'visit': self.visit.pk, 'height': 180, 'weight': 81},
+            {'visit': str(self.visit.pk), 'heart_rate': 88},
+        ])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['created'], response.data['errors']), (2, []))
+        bmis = dict(VitalSigns.objects.filter(pk__in=response.data['ids']).values_list('heart_rate', 'bmi'))
+        self.assertEqual(float(bmis[None]), 25.0)
+        self.assertIsNone(bmis[88])
+        self.assertTrue(all(v.recorded_by_id == self.nurse.pk for v in VitalSigns.objects.all()))
+        self.assertGreater(Visit.objects.get(pk=self.visit.pk).version, self.visit.version)
+
+    def test_malformed_items_are_reported_by_index(self):
+        response = self.post([
+            {'visit': [self.visit.pk]},
+            {'visit': {'id': self.visit.pk}},
+            'not a reading',
+            {'visit': True, 'heart_rate': 70},
+            {'visit': '\u00b2', 'heart_rate': 70},  # a digit to str.isdigit(), not to int()
+            {'visit': '\u0663', 'heart_rate': 70},  # Arabic-Indic three
+            {'visit': self.visit.pk, 'heart_rate': 70},
+        ])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([e['index'] for e in response.data['errors']], [0, 1, 2, 3, 4, 5])
+
+    def test_unknown_visit_is_rejected(self):
+        response = self.post([{'visit': self.visit.pk + 1000, 'heart_rate': 70}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['index'], 0)
+        self.assertIn('visit', response.data['errors'][0]['errors'])
+        self.assertFalse(VitalSigns.objects.exists())
+
+    def test_requires_nurse_or_doctor(self):
+        self.client.force_authenticate(User.objects.create_user('bulk.desk@example.com', 'pw', role='Receptionist'))
+        self.assertEqual(self.post([{'visit': self.visit.pk, 'heart_rate': 70}]).status_code, 403)
+        self.assertFalse(VitalSigns.objects.exists())
+
+    def test_batch_limit(self):
+        response = self.post([{'visit': self.visit.pk}] * 5001)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('5000', response.data['detail'])
+        self.assertEqual(self.post({'visit': self.visit.pk}).status_code, 400)
+
+
+class RebuildVitalRollupsTests(TestCase):
+    def setUp(self):
+        patient = Patient.objects.create(first_name='Ada', last_name='Rollup', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=patient)
+        for heart_rate in (60, 80, 100):
+            VitalSigns.objects.create(visit=self.visit, heart_rate=heart_rate)
+
+    def stats(self):
+        return {row.resolution: row.stats['heart_rate'] for row in VitalSignsRollup.objects.all()}
+
+    def test_rebuild_matches_incremental_rollups(self):
+        incremental = self.stats()
+        self.assertEqual(incremental['hour'], {'n': 3, 'sum': 240.0, 'min': 60.0, 'max': 100.0})
+        call_command('rebuild_vital_rollups', chunk_size=2, stdout=io.StringIO())
+        self.assertEqual(self.stats(), incremental)
+
+    def test_failed_rebuild_keeps_old_rollups(self):
+        before = self.stats()
+        with mock.patch('visits.management.commands.rebuild_vital_rollups.add_readings',
+                        side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                call_command('rebuild_vital_rollups', stdout=io.StringIO())
+        self.assertEqual(self.stats(), before)
+
+
+class VitalSignsTrendTests(TestCase):
+    def setUp(self):
+        doctor = User.objects.create_user('trend.doctor@example.com', 'pw', role='Doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(doctor)
+        self.patient = Patient.objects.create(first_name='Ada', last_name='Trend', date_of_birth='1990-01-01', gender='F')
+        self.visit = Visit.objects.create(patient=self.patient)
+        other = Visit.objects.create(patient=self.patient)
+        self.day = timezone.make_aware(datetime.datetime(2024, 3, 10))
+        for visit, minutes, heart_rate in ((self.visit, 550, 60), (self.visit, 580, 80), (self.visit, 615, 100),
+                                           (other, 560, 90)):
+            VitalSigns.objects.create(visit=visit, heart_rate=heart_rate,
+                                      recorded_at=self.day + datetime.timedelta(minutes=minutes))
+
+    def get(self, **params):
+        params = {'metric': 'heart_rate', 'start': self.day.isoformat(),
+                  'end': (self.day + datetime.timedelta(days=1)).isoformat(), **params}
+        return self.client.get('/api/vitals/trend/', params)
+
+    def summary(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(p['n'], p['min'], p['max'], p['mean']) for p in response.json()['points']]
+
+    def test_hourly_buckets_for_a_visit(self):
+        self.assertEqual(self.summary(self.get(visit=self.visit.pk)), [(2, 60, 80, 70), (1, 100, 100, 100)])
+
+    def test_patient_scope_merges_visits(self):
+        self.assertEqual(self.summary(self.get(patient=self.patient.pk)), [(3, 60, 90, 76.67), (1, 100, 100, 100)])
+        self.assertEqual(self.summary(self.get(patient=self.patient.pk, resolution='day')), [(4, 60, 100, 82.5)])
+
+    def test_raw_readings_in_order(self):
+        response = self.get(visit=self.visit.pk, resolution='raw')
+        self.assertEqual([p['value'] for p in response.json()['points']], [60, 80, 100])
+
+    def test_point_cap_downsamples(self):
+        visit = Visit.objects.create(patient=self.patient)
+        for hour in range(20):
+            VitalSigns.objects.create(visit=visit, heart_rate=60 + (40 if hour == 7 else hour),
+                                      recorded_at=self.day + datetime.timedelta(hours=hour, minutes=5))
+        raw = self.get(visit=visit.pk, resolution='raw', points=5).json()['points']
+        self.assertEqual(len(raw), 5)
+        self.assertEqual((raw[0]['value'], raw[-1]['value']), (60, 79))
+        self.assertIn(100, [p['value'] for p in raw])  # the spike survives
+        self.assertEqual(len(self.get(visit=visit.pk, points=4).json()['points']), 4)
+        # fewer than three points is never useful: the floor is 3
+        self.assertEqual(len(self.get(visit=visit.pk, points=1).json()['points']), 3)
+
+    def test_invalid_parameters_are_400(self):
+        cases = [
+            {},
+            {'visit': 'abc'},
+            {'visit': '\u00b2'},
+            {'patient': '-1'},
+            {'visit': self.visit.pk, 'metric': 'mood'},
+            {'visit': self.visit.pk, 'resolution': 'week'},
+            {'visit': self.visit.pk, 'points': 'many'},
+            {'visit': self.visit.pk, 'start': 'yesterday'},
+            {'visit': self.visit.pk, 'start': '2024-13-45T00:00'},
+            {'visit': self.visit.pk, 'end': '2024-02-30T10:00:00Z'},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
 
-# Create your tests here.
+    def test_lttb(self):
+        points = [(x, y) for x, y in enumerate([0, 1, 0, 9, 0, 1, 0, 1, 0, 2])]
+        self.assertEqual(lttb(points, 20), points)
+        self.assertEqual(lttb(points, 2), points)
+        sampled = lttb(points, 4)
+        self.assertEqual(len(sampled), 4)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertIn((3, 9), sampled)
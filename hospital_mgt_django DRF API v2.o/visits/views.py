@@ -1,7 +1,16 @@
+import datetime
+
 from rest_framework import viewsets, permissions, status, serializers, generics
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
+from rest_framework.views import APIView
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.etag import ConditionalRetrieveMixin
+from core.fieldsets import SparseFieldsetMixin
+from core.prefetch import QueryPlanMixin
 
 # 🔹 Import Models
 from .models import (
@@ -16,7 +25,8 @@ from .models import (
     Procedure,
     Referral,
     FollowUp,
-    Note
+    Note,
+    VisitSnapshot,
 )
 
 # 🔹 Import Serializers
@@ -39,6 +49,8 @@ from .serializers import (
     # Write Serializers
     EncounterWriteSerializer,
     VitalSignsWriteSerializer,
+    VitalSignsBulkItemSerializer,
+    EncounterBundleSerializer,
     DiagnosisWriteSerializer,
     PrescriptionWriteSerializer,
     LabTestOrderWriteSerializer,
@@ -49,6 +61,12 @@ from .serializers import (
     NoteWriteSerializer
 )
 
+from .bulk import insert_encounter_bundle, insert_vitals
+from pharmacy.allergens import patient_conflicts
+from .models import VitalSignsRollup
+from .rollups import METRICS, RESOLUTIONS, lttb, rollup_series
+from .snapshots import FINISHED_STATUSES, is_fresh, store_snapshots, to_json
+
 # 🔹 Import Custom Permissions from users app
 from users.permissions import (
     IsDoctor,
@@ -64,7 +82,7 @@ from users.permissions import (
 
 
 # 🧱 Base ViewSet With Debug Print
-class BaseViewSet(viewsets.ModelViewSet):
+class BaseViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     def get_serializer_class(self):
         # Override to return appropriate serializer based on action
         if self.action in ['create', 'update', 'partial_update']:
@@ -77,11 +95,14 @@ class BaseViewSet(viewsets.ModelViewSet):
         return perms
 
 
-class VisitViewSet(BaseViewSet):
+class VisitViewSet(ConditionalRetrieveMixin, SparseFieldsetMixin, BaseViewSet):
     """
     ViewSet for managing visits.
     Supports filtering via ?patient=<id>
+    and sparse responses via ?fields=<a,b.c>&expand=<relation>
+    Detail reads carry an ETag and honour If-None-Match (304).
     """
+    etag_resource = 'visit'
     serializer_class = VisitDetailSerializer
     serializer_classes = {
         'list': VisitListSerializer,
@@ -94,7 +115,7 @@ class VisitViewSet(BaseViewSet):
     def get_serializer_class(self):
         return self.serializer_classes.get(self.action, self.serializer_class)
 
-    def get_queryset(self):
+    def get_visible_visits(self):
         user = self.request.user
 
         # 🔁 Base queryset
@@ -114,17 +135,55 @@ class VisitViewSet(BaseViewSet):
         if user.role == 'Receptionist':
             queryset = queryset.filter(status='scheduled')
 
-        return queryset.select_related('patient').prefetch_related(
-            'vitals',
-            'diagnoses',
-            'prescriptions',
-            'lab_orders',
-            'radiology_orders',
-            'procedures',
-            'referrals',
-            'followups',
-            'notes'
-        ).order_by('-start_time')
+        return queryset
+
+    def get_queryset(self):
+        # 🔗 Joins/prefetches are derived from the serializer being rendered
+        return self.plan_queryset(self.get_visible_visits()).order_by('-start_time')
+
+    def get_resource_version(self, pk):
+        # one primary-key lookup, joined to the patient (embedded in the detail)
+        # and to the cached snapshot's versions; its data is only read when a
+        # body is served, never for a 304
+        row = self.get_visible_visits().filter(pk=pk).values_list(
+            'version', 'patient__version', 'status',
+            'snapshot__visit_version', 'snapshot__patient_version', 'snapshot__built_at',
+        ).first()
+        self.snapshot_row = row
+        return row[:2] if row else None
+
+    def build_retrieve_response(self, request, *args, **kwargs):
+        version, patient_version, visit_status, *snapshot = self.snapshot_row
+        sparse = self.fields_query_param in request.query_params or self.expand_query_param in request.query_params
+        if visit_status not in FINISHED_STATUSES or sparse:
+            return super().build_retrieve_response(request, *args, **kwargs)
+
+        # 📦 Finished visit: serve the stored snapshot, or build it lazily
+        if is_fresh(version, patient_version, *snapshot):
+            data = VisitSnapshot.objects.filter(
+                visit_id=kwargs['pk'], visit_version=version, patient_version=patient_version,
+            ).values_list('data', flat=True).first()
+            if data is not None:  # None: rebuilt or invalidated since the version check
+                return Response(data)
+        response = super().build_retrieve_response(request, *args, **kwargs)
+        store_snapshots([(int(kwargs['pk']), version, patient_version, to_json(response.data))])
+        return response
+
+    @action(detail=True, methods=['post'], url_path='encounter-bundle', permission_classes=[IsDoctor])
+    def encounter_bundle(self, request, pk=None):
+        """
+        Record a whole consultation in one request and one transaction:
+        {"encounter": {...}, "vitals": [...], "diagnoses": [...],
+         "prescriptions": [{..., "diagnosis_index": 0}], "lab_orders": [...], "notes": [...]}
+        """
+        visit = generics.get_object_or_404(Visit.objects.only('id', 'patient_id'), pk=pk)
+        serializer = EncounterBundleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        drug_ids = [item['drug'].pk for item in serializer.validated_data.get('prescriptions', []) if item.get('drug')]
+        created = insert_encounter_bundle(visit, request.user, serializer.validated_data)
+        # ⚠️ flagged, not blocked: the prescriber may have already weighed the allergy
+        created['allergy_conflicts'] = patient_conflicts(visit.patient_id, drug_ids) if drug_ids else []
+        return Response(created, status=status.HTTP_201_CREATED)
     
 # 🔹 2. Encounter ViewSet
 class EncounterViewSet(BaseViewSet):
@@ -135,7 +194,7 @@ class EncounterViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return Encounter.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(Encounter.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         serializer.save(provider=self.request.user, visit_id=self.kwargs['visit_pk'])
@@ -153,7 +212,7 @@ class VitalSignsViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return VitalSigns.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(VitalSigns.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
@@ -164,6 +223,132 @@ class VitalSignsViewSet(BaseViewSet):
         obj = generics.get_object_or_404(queryset, pk=self.kwargs['pk'])
         return obj
 
+# 🔹 3b. Bulk Vital Signs Upload (monitors / triage tablets)
+class VitalSignsBulkView(APIView):
+    """
+    POST /api/vitals/bulk/
+    [{"visit": 3, "heart_rate": 88, "recorded_at": "..."}, ...]
+
+    Rows are validated in one pass (a single query resolves every visit id),
+    valid rows are inserted with bulk_create in one transaction and invalid
+    rows are reported by index.
+    """
+    permission_classes = [IsNurse | IsDoctor]
+    max_batch_size = 5000
+
+    def post(self, request):
+        readings = request.data
+        if not isinstance(readings, list):
+            return Response({"detail": "Expected a list of readings."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(readings) > self.max_batch_size:
+            return Response(
+                {"detail": f"At most {self.max_batch_size} readings per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # filtered before hashing: a list or dict "visit" is left for its row's serializer to reject
+        requested = {
+            v for r in readings if isinstance(r, dict)
+            and (type(v := r.get('visit')) is int or (isinstance(v, str) and v.isascii() and v.isdigit()))
+        }
+        context = {'visit_ids': set(Visit.objects.filter(id__in=requested).values_list('id', flat=True))}
+
+        objs, errors = [], []
+        for index, reading in enumerate(readings):
+            serializer = VitalSignsBulkItemSerializer(data=reading, context=context)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            objs.append(VitalSigns(visit_id=data.pop('visit'), recorded_by=request.user, **data))
+
+        if not objs:
+            return Response({'created': 0, 'ids': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = insert_vitals(objs)
+        return Response(
+            {'created': len(created), 'ids': [v.pk for v in created], 'errors': errors},
+            status=status.HTTP_201_CREATED
+        )
+
+
+# 🔹 3c. Vital Signs Trend (charting)
+class VitalSignsTrendView(APIView):
+    """
+    GET /api/vitals/trend/?visit=<id>|patient=<id>&metric=heart_rate
+        &resolution=hour|day|raw&start=<iso>&end=<iso>&points=300
+
+    hour/day read the rollup table (one indexed range scan); raw reads the
+    readings in range and LTTB-downsamples them. Either way at most
+    ``points`` points are returned. Defaults to the last 14 days, hourly.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_window = datetime.timedelta(days=14)
+    max_points = 2000
+
+    def _param_datetime(self, name, default):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:  # well formed but out of range, e.g. month 13
+            parsed = None
+        if parsed is None:
+            raise serializers.ValidationError({name: "Invalid datetime."})
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+    def get(self, request):
+        params = request.query_params
+        metric = params.get('metric')
+        if metric not in METRICS:
+            raise serializers.ValidationError({'metric': f"One of: {', '.join(METRICS)}."})
+        resolution = params.get('resolution', 'hour')
+        if resolution not in RESOLUTIONS and resolution != 'raw':
+            raise serializers.ValidationError({'resolution': "One of: raw, hour, day."})
+
+        visit, patient = params.get('visit', ''), params.get('patient', '')
+        if visit.isascii() and visit.isdigit():
+            scope = {'visit_id': int(visit)}
+        elif patient.isascii() and patient.isdigit():
+            scope = {'patient_id': int(patient)}
+        else:
+            raise serializers.ValidationError({'detail': "Pass ?visit=<id> or ?patient=<id>."})
+
+        end = self._param_datetime('end', timezone.now())
+        start = self._param_datetime('start', end - self.default_window)
+        try:
+            points = max(3, min(int(params.get('points', 300)), self.max_points))
+        except ValueError:
+            raise serializers.ValidationError({'points': "Must be an integer."})
+
+        if resolution == 'raw':
+            readings = VitalSigns.objects.filter(
+                recorded_at__gte=start, recorded_at__lte=end, **{f'{metric}__isnull': False},
+                **({'visit_id': scope['visit_id']} if 'visit_id' in scope
+                   else {'visit__patient_id': scope['patient_id']})
+            ).order_by('recorded_at').values_list('recorded_at', metric)
+            series = [(ts.timestamp(), float(value), ts) for ts, value in readings.iterator()]
+            data = [{'t': ts, 'value': value} for _, value, ts in lttb(series, points)]
+        else:
+            rows = VitalSignsRollup.objects.filter(
+                resolution=resolution, bucket_start__gte=start, bucket_start__lte=end, **scope
+            ).order_by('bucket_start').values_list('bucket_start', 'stats')
+            buckets = rollup_series(rows, metric)
+            if len(buckets) > points:
+                sampled = lttb([(b['t'].timestamp(), b['mean'], b) for b in buckets], points)
+                buckets = [b for _, _, b in sampled]
+            data = buckets
+
+        return Response({
+            'metric': metric,
+            'resolution': resolution,
+            'start': start,
+            'end': end,
+            'points': data,
+        })
+
+
 # 🔹 4. Diagnosis ViewSet
 class DiagnosisViewSet(BaseViewSet):
     serializer_class = DiagnosisSerializer
@@ -172,7 +357,7 @@ class DiagnosisViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return Diagnosis.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(Diagnosis.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
@@ -191,7 +376,7 @@ class PrescriptionViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return Prescription.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(Prescription.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
@@ -202,6 +387,21 @@ class PrescriptionViewSet(BaseViewSet):
         obj = generics.get_object_or_404(queryset, pk=self.kwargs['pk'])
         return obj
 
+    def with_allergy_conflicts(self, response):
+        # ⚠️ checked against the patient's allergies after the write; flagged, not blocked
+        prescription = Prescription.objects.filter(pk=response.data['id']).values('drug_id', 'visit__patient_id').first()
+        response.data['allergy_conflicts'] = (
+            patient_conflicts(prescription['visit__patient_id'], [prescription['drug_id']])
+            if prescription and prescription['drug_id'] else []
+        )
+        return response
+
+    def create(self, request, *args, **kwargs):
+        return self.with_allergy_conflicts(super().create(request, *args, **kwargs))
+
+    def update(self, request, *args, **kwargs):
+        return self.with_allergy_conflicts(super().update(request, *args, **kwargs))
+
 # 🔹 6. Lab Test Order ViewSet
 class LabTestOrderViewSet(BaseViewSet):
     serializer_class = LabTestOrderSerializer
@@ -210,13 +410,13 @@ class LabTestOrderViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return LabTestOrder.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(LabTestOrder.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         if self.request.user.role != 'Doctor':
             raise serializers.ValidationError("Only doctors can order lab tests.")
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
-        serializer.save(visit=visit, ordered_by=self.request.user)
+        serializer.save(visit=visit, patient_id=visit.patient_id, requested_by=self.request.user)
 
     def get_object(self):
         queryset = self.get_queryset()
@@ -231,7 +431,7 @@ class RadiologyOrderViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return RadiologyOrder.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(RadiologyOrder.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
@@ -250,7 +450,7 @@ class ProcedureViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return Procedure.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(Procedure.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
@@ -269,7 +469,7 @@ class ReferralViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return Referral.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(Referral.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
@@ -288,7 +488,7 @@ class FollowUpViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return FollowUp.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(FollowUp.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         visit = Visit.objects.get(id=self.kwargs['visit_pk'])
@@ -307,7 +507,7 @@ class NoteViewSet(BaseViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
     def get_queryset(self):
-        return Note.objects.filter(visit_id=self.kwargs['visit_pk'])
+        return self.plan_queryset(Note.objects.filter(visit_id=self.kwargs['visit_pk']))
 
     def perform_create(self, serializer):
         if self.request.user.role not in ['Doctor', 'Nurse']: